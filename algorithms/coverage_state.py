@@ -0,0 +1,167 @@
+import tempfile
+from typing import Iterator
+
+import numpy as np
+
+from dataset.packed_upa import (
+    PackedUPA,
+    get_byte_weights,
+    iter_row_chunks,
+    popcount,
+    weighted_popcount,
+)
+from dataset.sparse_upa import SparseUPA
+
+
+class CoverageState:
+    """
+    Uncovered cells of a UPA while RMP runs, updated in place.
+
+    For a PackedUPA `uncovered` is a bit plane shaped like its words, for a
+    SparseUPA it holds one flag per assignment in CSR order. The uncovered
+    count of every user and the total are kept up to date by cover(), so
+    each step only touches the users holding the chosen role.
+
+    For an out-of-core PackedUPA (one with `max_chunk_bytes`) the bit plane
+    is memory-mapped from a temporary file and read in row chunks.
+
+    The rows and columns of a reduced PackedUPA stand for groups of merged
+    users and permissions. With `user_weights` and `permission_weights`
+    (the sizes of these groups) every count is the one of the original UPA.
+    """
+
+    def __init__(
+        self,
+        upa: PackedUPA | SparseUPA,
+        uncovered: np.ndarray | None = None,
+        user_weights: np.ndarray | None = None,
+        permission_weights: np.ndarray | None = None,
+    ):
+        # `uncovered` restores a state, e.g. from an array shared between processes
+        self.upa = upa
+        self.user_weights = user_weights
+        self.permission_weights = permission_weights
+        self._byte_weights = (
+            get_byte_weights(permission_weights)
+            if permission_weights is not None
+            else None
+        )
+        if uncovered is not None:
+            self.uncovered = uncovered
+        elif isinstance(upa, PackedUPA):
+            if upa.max_chunk_bytes is None or upa.words.size == 0:
+                self.uncovered = upa.uncovered_words().copy()
+            else:
+                self.uncovered = _map_uncovered_words(upa)
+        else:
+            self.uncovered = (
+                ~upa.covered
+                if upa.covered is not None
+                else np.ones(upa.nnz, dtype=bool)
+            )
+
+        if isinstance(upa, PackedUPA):
+            self.uncovered_row_counts = np.concatenate(
+                [self._count(self.uncovered[rows]) for rows in upa.iter_row_chunks()]
+            )
+            row_counts = np.concatenate(
+                [self._count(upa.words[rows]) for rows in upa.iter_row_chunks()]
+            )
+        else:
+            self.uncovered_row_counts = np.bincount(
+                upa.row_ids()[self.uncovered], minlength=upa.shape[0]
+            )
+            row_counts = upa.row_counts()
+        users = np.arange(upa.shape[0])
+        self.num_of_assignments = self._weigh(users, row_counts)
+        self.num_of_uncovered = self._weigh(users, self.uncovered_row_counts)
+
+    def _count(self, words: np.ndarray) -> np.ndarray:
+        # Set bits along the last axis, counted once per original permission
+        if self._byte_weights is None:
+            return popcount(words)
+        return weighted_popcount(words, self._byte_weights)
+
+    def _weigh(self, users: np.ndarray, counts: np.ndarray) -> int:
+        # Total of per-user counts, counted once per original user
+        if self.user_weights is None:
+            return int(counts.sum())
+        return int(np.dot(self.user_weights[users], counts))
+
+    def count_uncovered(self) -> int:
+        return self.num_of_uncovered
+
+    def count_cells_sum(self) -> int:
+        # Same as summing a dense UPA, where covered cells hold 2
+        return 2 * self.num_of_assignments - self.num_of_uncovered
+
+    def dense_row(self, role: np.ndarray) -> np.ndarray:
+        return self.upa.dense_row(role)
+
+    def get_role_cover_area(self, role: np.ndarray) -> int:
+        # Uncovered role cells of the users holding the whole role
+        if isinstance(self.upa, PackedUPA):
+            users = np.flatnonzero(self.upa.get_superset_rows(role))
+            return sum(
+                self._weigh(
+                    chunk, self._count(np.bitwise_and(self.uncovered[chunk], role))
+                )
+                for chunk in self._iter_user_chunks(users)
+            )
+
+        rows, positions = self.upa.gather_columns(role)
+        valid_cells = self.upa.get_superset_rows(role)[rows]
+        return int(np.count_nonzero(self.uncovered[positions[valid_cells]]))
+
+    def _iter_user_chunks(self, users: np.ndarray) -> Iterator[np.ndarray]:
+        # Users whose uncovered words fit in the working set of the UPA
+        for chunk in iter_row_chunks(
+            len(users), self.uncovered.shape[1] * 8, self.upa.max_chunk_bytes
+        ):
+            yield users[chunk]
+
+    def cover(self, role: np.ndarray) -> np.ndarray:
+        """
+        Covers the role cells of every user holding the role that still has
+        uncovered cells, and returns these users.
+        """
+        holders = self.upa.get_superset_rows(role)
+        users = np.flatnonzero(holders)
+        users = users[self.uncovered_row_counts[users] > 0]
+
+        if isinstance(self.upa, PackedUPA):
+            newly_covered = np.zeros(len(users), dtype=np.int64)
+            for chunk in iter_row_chunks(
+                len(users), self.uncovered.shape[1] * 8, self.upa.max_chunk_bytes
+            ):
+                rows = users[chunk]
+                newly_covered[chunk] = self._count(
+                    np.bitwise_and(self.uncovered[rows], role)
+                )
+                self.uncovered[rows] &= np.invert(role)
+        else:
+            rows, positions = self.upa.gather_columns(role)
+            assigned = np.zeros(len(holders), dtype=bool)
+            assigned[users] = True
+            cells = assigned[rows] & self.uncovered[positions]
+            self.uncovered[positions[cells]] = False
+            newly_covered = np.bincount(
+                np.searchsorted(users, rows[cells]), minlength=len(users)
+            )
+
+        self.uncovered_row_counts[users] -= newly_covered
+        self.num_of_uncovered -= self._weigh(users, newly_covered)
+        return users
+
+
+def _map_uncovered_words(upa: PackedUPA) -> np.memmap:
+    # Writable copy of the uncovered words in an anonymous temporary file,
+    # deleted as soon as the map is released
+    uncovered = np.memmap(
+        tempfile.TemporaryFile(), dtype=np.uint64, mode="w+", shape=upa.words.shape
+    )
+    for rows in upa.iter_row_chunks():
+        uncovered[rows] = upa.words[rows]
+        if upa.covered is not None:
+            uncovered[rows] &= np.invert(upa.covered[rows])
+    return uncovered
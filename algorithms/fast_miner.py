@@ -1,38 +1,159 @@
 import time
-from typing import Dict, Tuple
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Tuple
 
 import numpy as np
 
 from algorithms.miner_utils import (
-    get_fm_candidate_roles_total_count,
+    get_fm_candidate_roles_support,
     get_fm_gen_roles,
     get_init_roles,
-    get_role_label_with_cache,
 )
+from algorithms.parallel import ParallelExecutor
+from algorithms.role_registry import RoleRegistry, as_role_words
+from dataset.packed_upa import PackedUPA
+from dataset.reduced_upa import ReducedUPA, reduce_upa
+from dataset.sparse_upa import SparseUPA
 
 
-def get_fast_miner_result_with_metadata(upa: np.ndarray) -> Tuple[Dict, float]:
-    start_time = time.time()
-    result = {}
-    init_roles, original_count = get_init_roles(upa)
-    gen_roles = get_fm_gen_roles(init_roles)
-    if gen_roles is not None:
-        total_count = get_fm_candidate_roles_total_count(upa, gen_roles)
-
-        for candidate in gen_roles:
-            result[tuple(candidate)] = {
-                "label": get_role_label_with_cache(candidate),
-                "original_count": original_count.get(tuple(candidate), 0),
-                "total_count": total_count[tuple(candidate)],
+class FastMinerResult:
+    """
+    FastMiner candidates in candidate order with their counts. The ID of a
+    candidate in `roles` is its position: original_count[i] is the number of
+    users whose row is candidate i, total_count[i] the number of users holding
+    all of its permissions. Labels are built for the rows asked for only.
+    """
+
+    def __init__(
+        self, roles: RoleRegistry, original_count: np.ndarray, total_count: np.ndarray
+    ):
+        self.roles = roles
+        self.original_count = original_count
+        self.total_count = total_count
+
+    def __len__(self) -> int:
+        return len(self.roles)
+
+    def __eq__(self, other) -> bool:
+        # Same candidates, in the same order, with the same counts
+        return (
+            isinstance(other, FastMinerResult)
+            and self.roles.num_of_permissions == other.roles.num_of_permissions
+            and np.array_equal(self.roles.words, other.roles.words)
+            and np.array_equal(self.original_count, other.original_count)
+            and np.array_equal(self.total_count, other.total_count)
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    @property
+    def nbytes(self) -> int:
+        return self.roles.nbytes + self.original_count.nbytes + self.total_count.nbytes
+
+    def matches(self, other: "FastMinerResult") -> bool:
+        # Same candidates with the same counts, in any candidate order
+        if len(self) != len(other) or (
+            self.roles.num_of_permissions != other.roles.num_of_permissions
+        ):
+            return False
+        ids = other.roles.get_ids(self.roles.words)
+        return bool(
+            np.all(ids >= 0)
+            and np.array_equal(other.original_count[ids], self.original_count)
+            and np.array_equal(other.total_count[ids], self.total_count)
+        )
+
+    def get_rows(self, role_ids: np.ndarray) -> List[Dict]:
+        return [
+            {
+                "label": self.roles.get_label(i),
+                "original_count": int(self.original_count[i]),
+                "total_count": int(self.total_count[i]),
             }
+            for i in np.asarray(role_ids).tolist()
+        ]
+
+    def to_dict(self) -> Dict[tuple, Dict]:
+        # Rows keyed by dense role tuples, for small UPAs only
+        roles = self.roles.as_upa().to_dense().tolist()
+        rows = self.get_rows(np.arange(len(self)))
+        return {tuple(role): row for role, row in zip(roles, rows)}
+
+
+def _get_init_roles(
+    upa: np.ndarray | PackedUPA | SparseUPA,
+) -> Tuple[Any, np.ndarray, ReducedUPA | None]:
+    # With duplicate users or permissions, the init roles are the rows of the
+    # reduced UPA and their candidates are expanded back by _expand_gen_roles.
+    # Original counts are in init role order.
+    reduction = reduce_upa(upa)
+    if reduction is None:
+        init_roles, original_count = get_init_roles(upa)
+        return init_roles, original_count, None
+    return reduction.upa, reduction.user_weights.astype(np.int64), reduction
+
+
+def _expand_gen_roles(gen_roles, reduction: ReducedUPA | None, like) -> Any:
+    if gen_roles is None or reduction is None:
+        return gen_roles
+    gen_roles = reduction.expand_roles(gen_roles)
+    return gen_roles.to_dense() if isinstance(like, np.ndarray) else gen_roles
+
+
+def get_fast_miner_result_with_metadata(
+    upa: np.ndarray | PackedUPA | SparseUPA,
+    num_of_workers: int = 1,
+    progress: Callable[..., None] | None = None,
+) -> Tuple[FastMinerResult, float]:
+    # progress, if given, is called with the name of every stage that starts
+    report = progress or (lambda **_: None)
+    start_time = time.time()
+    report(stage="init_roles")
+    init_roles, original_count, reduction = _get_init_roles(upa)
+    # With several workers, candidates and their supports are computed by
+    # worker processes, the result is the same for any number of workers
+    executor = ParallelExecutor(num_of_workers) if num_of_workers > 1 else None
+    with executor or nullcontext():
+        report(stage="candidates", num_of_init_roles=len(original_count))
+        gen_roles = _expand_gen_roles(
+            get_fm_gen_roles(init_roles, executor=executor), reduction, upa
+        )
+        if gen_roles is not None:
+            report(stage="supports", num_of_candidates=len(gen_roles))
+            # Supports in candidate order, which is the ID order of the registry
+            total_count = get_fm_candidate_roles_support(
+                upa, gen_roles, executor=executor
+            )
+    if gen_roles is None:
+        roles = RoleRegistry(upa.shape[1])
+        total_count = np.zeros(0, dtype=np.int64)
+    else:
+        # Candidates are distinct, their IDs are their positions
+        roles = RoleRegistry(upa.shape[1], as_role_words(gen_roles).words)
+
+    # Every init role is a candidate, the other candidates are no user's row
+    candidate_counts = np.zeros(len(roles), dtype=np.int64)
+    if len(original_count):
+        init_words = as_role_words(_expand_gen_roles(init_roles, reduction, None))
+        candidate_counts[roles.get_ids(init_words.words)] = original_count
 
-    return result, time.time() - start_time
+    return (
+        FastMinerResult(roles, candidate_counts, total_count),
+        time.time() - start_time,
+    )
 
 
-def get_fast_miner_result(upa: np.ndarray) -> np.ndarray | None:
-    init_roles, _ = get_init_roles(upa)
-    gen_roles = get_fm_gen_roles(init_roles)
-    return gen_roles
+def get_fast_miner_result(
+    upa: np.ndarray | PackedUPA | SparseUPA,
+    num_of_workers: int = 1,
+) -> np.ndarray | PackedUPA | SparseUPA | None:
+    init_roles, _, reduction = _get_init_roles(upa)
+    if num_of_workers > 1:
+        with ParallelExecutor(num_of_workers) as executor:
+            gen_roles = get_fm_gen_roles(init_roles, executor=executor)
+    else:
+        gen_roles = get_fm_gen_roles(init_roles)
+    return _expand_gen_roles(gen_roles, reduction, upa)
 
 
 if __name__ == "__main__":
@@ -40,6 +161,6 @@ if __name__ == "__main__":
 
     upa = load_upa_from_one2one_file("dataset/test_datasets/simple_dataset.txt")
     result, runtime = get_fast_miner_result_with_metadata(upa)
-    for k, v in result.items():
-        print(f"{k}: {v}")
+    for row in result.get_rows(np.arange(len(result))):
+        print(row)
     print(f"Time in seconds: {runtime}")
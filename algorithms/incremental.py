@@ -0,0 +1,350 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from algorithms.fast_miner import FastMinerResult, get_fast_miner_result_with_metadata
+from algorithms.miner_utils import FM_TILE_BYTES, get_roles_support
+from algorithms.role_registry import RoleRegistry, get_permissions_label
+from dataset.packed_upa import (
+    WORD_BITS,
+    PackedUPA,
+    as_packed_upa,
+    get_num_of_words,
+    get_unique_rows,
+    popcount,
+)
+from dataset.permission_index import with_permission_index
+from dataset.sparse_upa import SparseUPA
+
+
+def _as_words(keys: Iterable[bytes], num_of_words: int) -> np.ndarray:
+    # Packed keys are the bytes of the words of a row
+    return np.frombuffer(b"".join(keys), dtype=np.uint64).reshape(-1, num_of_words)
+
+
+def _as_pairs(pairs: np.ndarray | Iterable | None) -> np.ndarray:
+    # Zero-based (user, permission) pairs as an (n, 2) array
+    if pairs is None:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    if np.any(pairs < 0):
+        raise ValueError("User and permission indices must be non-negative")
+    return pairs
+
+
+def _get_nonzero_intersections(role: np.ndarray, others: np.ndarray) -> np.ndarray:
+    intersections = np.bitwise_and(others, role)
+    return intersections[np.any(intersections, axis=1)]
+
+
+class IncrementalMiner:
+    """
+    FastMiner result of a UPA, and optionally an RMP result computed on it,
+    kept up to date while assignments are added and removed.
+
+    Candidates are the distinct user rows and their non-empty pairwise
+    intersections. Each one is kept with the number of distinct rows and row
+    pairs generating it, so a changed row only intersects the distinct rows
+    once and a candidate is dropped when its last generator is gone. Supports
+    of the kept candidates are shifted by the changed users only.
+
+    The RMP result (pa_matrix, ua_matrix of basic_rmp with delta_factor 0) is
+    repaired locally: a changed user keeps its roles that still fit its row,
+    and the rest of the row is covered by existing roles, or by a new role.
+    """
+
+    def __init__(
+        self,
+        upa: np.ndarray | PackedUPA | SparseUPA,
+        rmp_result: Tuple[Dict, Dict] | None = None,
+    ):
+        if isinstance(upa, SparseUPA):
+            packed = PackedUPA.from_assignments(upa.row_ids(), upa.indices, upa.shape)
+        else:
+            packed = as_packed_upa(upa)
+        # Own writable words, without coverage or a permission index to update
+        self.upa = PackedUPA(np.array(packed.words), packed.num_of_permissions)
+
+        first_rows, counts = get_unique_rows(self.upa.words)
+        rows = self.upa.words[first_rows]
+        # Distinct rows with their number of users, by packed key
+        self._row_counts: Dict[bytes, int] = {
+            row.tobytes(): int(count) for row, count in zip(rows, counts)
+        }
+        # Candidates with their number of generating rows and row pairs
+        self._generators: Dict[bytes, int] = dict.fromkeys(self._row_counts, 1)
+        self._count_pair_intersections(rows)
+        candidates = list(self._generators)
+        support = get_roles_support(self._get_indexed_upa(), self._as_upa(candidates))
+        self._total_count: Dict[bytes, int] = dict(zip(candidates, support.tolist()))
+
+        self._roles: Dict[str, bytes] | None = None
+        self._user_roles: Dict[int, List[str]] = {}
+        if rmp_result is not None:
+            self._load_rmp_result(*rmp_result)
+
+    @property
+    def num_of_words(self) -> int:
+        return self.upa.words.shape[1]
+
+    def _as_upa(self, keys: Iterable[bytes]) -> PackedUPA:
+        return PackedUPA(
+            _as_words(keys, self.num_of_words), self.upa.num_of_permissions
+        )
+
+    def _get_indexed_upa(self) -> PackedUPA:
+        # Indexed view for full support counts, the index is not kept up to date
+        return with_permission_index(
+            PackedUPA(self.upa.words, self.upa.num_of_permissions)
+        )
+
+    def _add_generators(self, intersections: np.ndarray, sign: int) -> None:
+        if len(intersections) == 0:
+            return
+        first, counts = get_unique_rows(intersections)
+        for role, count in zip(intersections[first], counts.tolist()):
+            key = role.tobytes()
+            self._generators[key] = self._generators.get(key, 0) + sign * count
+
+    def _count_pair_intersections(self, rows: np.ndarray) -> None:
+        # Upper triangle of row pairs, one tile of pairs at a time
+        num_of_rows = len(rows)
+        block_size = max(1, int(np.sqrt(FM_TILE_BYTES / (max(rows.shape[1], 1) * 8))))
+        for i_start in range(0, num_of_rows, block_size):
+            i_roles = np.arange(i_start, min(i_start + block_size, num_of_rows))
+            for j_start in range(i_start, num_of_rows, block_size):
+                j_roles = np.arange(j_start, min(j_start + block_size, num_of_rows))
+                tile = np.bitwise_and(rows[i_roles, None, :], rows[None, j_roles, :])
+                keep = (j_roles[None, :] > i_roles[:, None]) & np.any(tile, axis=2)
+                self._add_generators(tile[keep], 1)
+
+    def _resize(self, num_of_users: int, num_of_permissions: int) -> None:
+        # New users start without permissions, new permission words are zero
+        if num_of_users <= len(self.upa) and (
+            num_of_permissions <= self.upa.num_of_permissions
+        ):
+            return
+        num_of_words = get_num_of_words(num_of_permissions)
+        extra_words = num_of_words - self.num_of_words
+        if extra_words > 0:
+            padding = bytes(8 * extra_words)
+            self._row_counts = {k + padding: v for k, v in self._row_counts.items()}
+            self._generators = {k + padding: v for k, v in self._generators.items()}
+            self._total_count = {k + padding: v for k, v in self._total_count.items()}
+            if self._roles is not None:
+                self._roles = {n: k + padding for n, k in self._roles.items()}
+
+        words = np.zeros(
+            (max(num_of_users, len(self.upa)), max(num_of_words, self.num_of_words)),
+            dtype=np.uint64,
+        )
+        words[: len(self.upa), : self.num_of_words] = self.upa.words
+        self.upa = PackedUPA(
+            words, max(num_of_permissions, self.upa.num_of_permissions)
+        )
+
+    def apply_delta(
+        self,
+        added: np.ndarray | Iterable | None = None,
+        removed: np.ndarray | Iterable | None = None,
+    ) -> None:
+        """
+        Applies zero-based (user, permission) pairs removed from and added to
+        the UPA, removals first. Users and permissions past the current shape
+        extend the UPA, removing a missing assignment does nothing.
+        """
+        added, removed = _as_pairs(added), _as_pairs(removed)
+        pairs = np.concatenate([added, removed])
+        num_of_users = len(self.upa)
+        if len(pairs):
+            self._resize(int(pairs[:, 0].max()) + 1, int(pairs[:, 1].max()) + 1)
+
+        # Users of the deltas, and the ones created by extending the UPA
+        changed_users = np.union1d(pairs[:, 0], np.arange(num_of_users, len(self.upa)))
+        existed = changed_users < num_of_users
+        old_rows = self.upa.words[changed_users].copy()
+
+        for pairs, set_bits in ((removed, False), (added, True)):
+            users, permissions = pairs[:, 0], pairs[:, 1].astype(np.uint64)
+            words = (permissions // np.uint64(WORD_BITS)).astype(np.intp)
+            bits = np.left_shift(np.uint64(1), permissions % np.uint64(WORD_BITS))
+            if set_bits:
+                np.bitwise_or.at(self.upa.words, (users, words), bits)
+            else:
+                np.bitwise_and.at(self.upa.words, (users, words), np.invert(bits))
+        new_rows = self.upa.words[changed_users]
+
+        old_candidates = set(self._generators)
+        self._update_rows(old_rows[existed], new_rows)
+
+        # Supports of the kept candidates move with the changed users only,
+        # the new candidates are counted on the whole UPA
+        kept = [key for key in self._generators if key in old_candidates]
+        if kept:
+            kept_roles = self._as_upa(kept)
+            shift = get_roles_support(
+                PackedUPA(new_rows, self.upa.num_of_permissions), kept_roles
+            ) - get_roles_support(
+                PackedUPA(old_rows[existed], self.upa.num_of_permissions), kept_roles
+            )
+            for key, count in zip(kept, shift.tolist()):
+                self._total_count[key] += count
+        for key in old_candidates - self._generators.keys():
+            del self._total_count[key]
+        new = [key for key in self._generators if key not in old_candidates]
+        if new:
+            support = get_roles_support(self.upa, self._as_upa(new))
+            self._total_count.update(zip(new, support.tolist()))
+
+        if self._roles is not None:
+            self._repair_rmp_result(changed_users)
+
+    def _update_rows(self, old_rows: np.ndarray, new_rows: np.ndarray) -> None:
+        # Distinct rows that disappear or appear, and the candidates they generate
+        before = set(self._row_counts)
+        for row in old_rows:
+            key = row.tobytes()
+            self._row_counts[key] -= 1
+            if self._row_counts[key] == 0:
+                del self._row_counts[key]
+        for row in new_rows:
+            key = row.tobytes()
+            self._row_counts[key] = self._row_counts.get(key, 0) + 1
+        vanished = [key for key in before if key not in self._row_counts]
+        appeared = [key for key in self._row_counts if key not in before]
+
+        # A pair is counted while both of its rows are distinct rows: vanished
+        # rows leave one at a time, then appeared rows join one at a time
+        stable = _as_words(
+            (key for key in self._row_counts if key in before), self.num_of_words
+        )
+        for keys, sign in ((vanished, -1), (appeared, 1)):
+            rows = _as_words(keys, self.num_of_words)
+            for i, row in enumerate(rows):
+                self._generators[keys[i]] = self._generators.get(keys[i], 0) + sign
+                others = np.concatenate([stable, rows[i + 1 :]])
+                self._add_generators(_get_nonzero_intersections(row, others), sign)
+
+        self._generators = {k: v for k, v in self._generators.items() if v > 0}
+
+    def _load_rmp_result(self, pa_matrix: Dict, ua_matrix: Dict) -> None:
+        self._roles = {}
+        for name, permissions in pa_matrix.items():
+            role = np.zeros(self.upa.num_of_permissions, dtype=np.uint8)
+            role[[int(p[1:]) - 1 for p in permissions if p]] = 1
+            self._roles[name] = PackedUPA.from_dense(role[None]).words[0].tobytes()
+        # User labels are one-based
+        self._user_roles = {int(u[1:]) - 1: list(r) for u, r in ua_matrix.items()}
+
+    def _repair_rmp_result(self, users: np.ndarray) -> None:
+        assert self._roles is not None
+        names = list(self._roles)
+        roles = _as_words(self._roles.values(), self.num_of_words)
+        positions = {name: i for i, name in enumerate(names)}
+        numbers = [int(name[1:]) for name in names if name[1:].isdigit()]
+        next_number = max(numbers, default=0) + 1
+
+        for user in users.tolist():
+            row = self.upa.words[user]
+            fitting = np.flatnonzero(
+                ~np.any(np.bitwise_and(roles, np.invert(row)), axis=1)
+            )
+
+            # Kept roles, then the existing role covering most of the rest
+            kept = set(fitting.tolist())
+            user_roles = [
+                r for r in self._user_roles.get(user, []) if positions[r] in kept
+            ]
+            uncovered = row.copy()
+            for name in user_roles:
+                uncovered &= np.invert(roles[positions[name]])
+            while np.any(uncovered) and len(fitting):
+                gains = popcount(np.bitwise_and(roles[fitting], uncovered))
+                best = int(np.argmax(gains))
+                if gains[best] == 0:
+                    break
+                user_roles.append(names[fitting[best]])
+                uncovered &= np.invert(roles[fitting[best]])
+
+            if np.any(uncovered):
+                # The rest of the row becomes a new role
+                name = f"R{next_number}"
+                next_number += 1
+                self._roles[name] = uncovered.tobytes()
+                positions[name] = len(names)
+                names.append(name)
+                roles = np.concatenate([roles, uncovered[None]])
+                user_roles.append(name)
+
+            if user_roles:
+                self._user_roles[user] = user_roles
+            else:
+                self._user_roles.pop(user, None)
+
+        # Roles no user holds anymore are dropped
+        used = {name for names in self._user_roles.values() for name in names}
+        self._roles = {n: k for n, k in self._roles.items() if n in used}
+
+    @property
+    def original_count(self) -> np.ndarray:
+        # Counts in the order of gen_roles
+        return np.array(
+            [self._row_counts.get(key, 0) for key in self._generators], dtype=np.int64
+        )
+
+    @property
+    def total_count(self) -> np.ndarray:
+        return np.array(
+            [self._total_count[key] for key in self._generators], dtype=np.int64
+        )
+
+    @property
+    def gen_roles(self) -> PackedUPA | None:
+        # Candidates in FastMiner order, followed by the ones found by deltas
+        if not self._generators:
+            return None
+        return self._as_upa(self._generators)
+
+    def get_fast_miner_result(self) -> FastMinerResult:
+        # Same layout as get_fast_miner_result_with_metadata
+        roles = RoleRegistry(
+            self.upa.num_of_permissions,
+            _as_words(self._generators, self.num_of_words),
+        )
+        return FastMinerResult(roles, self.original_count, self.total_count)
+
+    def get_rmp_result(self) -> Tuple[Dict, Dict]:
+        # Same layout as basic_rmp, user and role names are kept across deltas
+        if self._roles is None:
+            raise ValueError("No RMP result is tracked")
+        pa_matrix = {
+            name: get_permissions_label(
+                np.flatnonzero(
+                    self.upa.dense_row(np.frombuffer(key, dtype=np.uint64))
+                ).tolist()
+            ).split(",")
+            for name, key in self._roles.items()
+        }
+        ua_matrix = {f"U{u + 1}": r for u, r in sorted(self._user_roles.items())}
+        return pa_matrix, ua_matrix
+
+    def verify(self) -> bool:
+        """
+        Checks the state against a full recompute on the current UPA: the
+        FastMiner result must be equal (candidate order aside), and the RMP
+        roles of every user must rebuild its row exactly.
+        """
+        expected, _ = get_fast_miner_result_with_metadata(self._get_indexed_upa())
+        if not expected.matches(self.get_fast_miner_result()):
+            return False
+        if self._roles is None:
+            return True
+
+        words = np.zeros_like(self.upa.words)
+        for user, names in self._user_roles.items():
+            for name in names:
+                role = np.frombuffer(self._roles[name], dtype=np.uint64)
+                if np.any(role & np.invert(self.upa.words[user])):
+                    return False
+                words[user] |= role
+        return bool(np.array_equal(words, self.upa.words))
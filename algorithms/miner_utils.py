@@ -1,103 +1,395 @@
+import heapq
 from collections import defaultdict
-from functools import lru_cache
-from typing import Dict, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Tuple
 
 import numpy as np
 
-from algorithms.utils_func import sort_dict_by_value
+from algorithms.coverage_state import CoverageState
+from dataset.packed_upa import (
+    PackedUPA,
+    as_packed_upa,
+    get_unique_rows,
+    popcount,
+    unpack_rows,
+)
+from dataset.permission_index import PermissionIndex
+from dataset.sparse_upa import SparseUPA, as_sparse_upa, gather_slices
 from dataset.upa_matrix import load_upa_from_one2one_file
 
+if TYPE_CHECKING:
+    from algorithms.parallel import ParallelExecutor
+
+# Memory of one tile of pairwise role intersections in get_fm_gen_roles
+FM_TILE_BYTES = 16 * 2**20
+
+# Memory of one chunk of roles in get_roles_support
+SUPPORT_CHUNK_BYTES = 64 * 2**20
+
 
 class FastMinerException(Exception):
     pass
 
 
-@lru_cache(maxsize=None)  # Cache with unlimited size
-def get_role_label(role: tuple) -> str:
-    return ",".join(f"P{i+1}" for i, p in enumerate(role) if p)
+def as_mining_upa(
+    upa: np.ndarray | PackedUPA | SparseUPA, like=None
+) -> PackedUPA | SparseUPA:
+    # Sparse UPAs (and roles mined from them) stay sparse, anything else is packed
+    if isinstance(like if like is not None else upa, SparseUPA):
+        return as_sparse_upa(upa)
+    return as_packed_upa(upa)
 
 
-def get_role_label_with_cache(role: np.ndarray) -> str:
-    role_tuple = tuple(role)
-    return get_role_label(role_tuple)
+def _restore_input_type(result: PackedUPA | SparseUPA, like) -> Any:
+    # Mining results are returned dense when the input was dense
+    if isinstance(like, np.ndarray):
+        return result.to_dense()
+    return result
 
 
 # region: Fast Miner Utils functions
-def get_init_roles(upa: np.ndarray) -> Tuple[np.ndarray | None, Dict]:
+def get_init_roles(
+    upa: np.ndarray | PackedUPA | SparseUPA,
+) -> Tuple[Any, np.ndarray]:
+    # Distinct user rows in order of their first user, and the number of
+    # users holding each of them
     num_of_users, num_of_permissions = upa.shape
 
     if num_of_users == 0 or num_of_permissions == 0:
         raise FastMinerException("UPA must have non-zero dimensions")
 
-    roles_set = set()
-    original_count: Dict[Tuple[int], int] = defaultdict(int)
-    unique_roles = []
+    mining_upa = as_mining_upa(upa)
 
-    for u in upa:
-        u_label = tuple(u)
-        original_count[u_label] += 1
+    if isinstance(mining_upa, PackedUPA):
+        # Rows are deduplicated in bulk as fixed-width packed keys
+        first_users, row_counts = get_unique_rows(
+            mining_upa.words, mining_upa.max_chunk_bytes
+        )
+    else:
+        # Index of the first user holding each distinct row, keyed by the row bytes
+        first_users_by_key: Dict[bytes, int] = {}
+        counts_by_key: Dict[bytes, int] = defaultdict(int)
+
+        for i, u in enumerate(mining_upa.iter_rows()):
+            u_key = u.tobytes()
+            counts_by_key[u_key] += 1
+
+            if u_key not in first_users_by_key:
+                first_users_by_key[u_key] = i
+
+        first_users = np.fromiter(first_users_by_key.values(), dtype=np.intp)
+        row_counts = np.fromiter(counts_by_key.values(), dtype=np.int64)
+
+    if len(first_users) == 0:
+        return None, np.zeros(0, dtype=np.int64)
+
+    init_roles = mining_upa[first_users]
+    return _restore_input_type(init_roles, upa), row_counts.astype(np.int64)
+
+
+def _get_sparse_intersections(
+    init_roles: SparseUPA, i: int, candidate_role: np.ndarray
+) -> list[np.ndarray]:
+    # Non-empty intersections of the candidate role with the roles after it,
+    # in role order: every role holding one of the candidate permissions is
+    # found through the CSC arrays instead of scanning the full rows
+    col_indptr, col_row_ids, _ = init_roles.get_csc()
+    positions, owners = gather_slices(col_indptr, candidate_role)
+    other_roles = col_row_ids[positions]
+    later = other_roles > i
+    other_roles, permissions = other_roles[later], candidate_role[owners[later]]
+    if other_roles.size == 0:
+        return []
+
+    order = np.argsort(other_roles, kind="stable")
+    other_roles, permissions = other_roles[order], permissions[order]
+    return np.split(permissions, np.flatnonzero(np.diff(other_roles)) + 1)
+
+
+def get_sparse_fm_role_range(
+    init_roles: SparseUPA, start: int, end: int
+) -> list[np.ndarray]:
+    """
+    Generated roles of the init roles start to end - 1 (each one, then its
+    non-empty intersections with the roles after it), each role once in
+    generation order.
+    """
+    # Use a set to track unique roles by their row bytes for fast lookups.
+    roles_set = set()
+    gen_roles = []
 
-        if u_label not in roles_set:
-            roles_set.add(u_label)
-            unique_roles.append(u)
+    # Iterate over the roles in the initial array.
+    for i in range(start, end):
+        candidate_role = init_roles.row(i)
+        # The role itself, then its non-empty intersections with the remaining roles
+        for role in [candidate_role] + _get_sparse_intersections(
+            init_roles, i, candidate_role
+        ):
+            # Add the new unique roles to the generated roles list and the roles_set.
+            role_key = role.tobytes()
+            if role_key not in roles_set:
+                gen_roles.append(role)
+                roles_set.add(role_key)
 
-    init_roles_set = np.array(unique_roles) if unique_roles else None
+    return gen_roles
 
-    return init_roles_set, dict(original_count)
 
+def _get_sparse_fm_gen_roles(
+    init_roles: SparseUPA, executor: "ParallelExecutor | None" = None
+) -> SparseUPA:
+    if executor is not None:
+        role_ranges = executor.iter_sparse_fm_role_ranges(init_roles)
+    else:
+        role_ranges = iter([get_sparse_fm_role_range(init_roles, 0, len(init_roles))])
 
-def get_fm_gen_roles(init_roles: np.ndarray) -> np.ndarray | None:
-    # Use a set to track unique roles as tuples for fast lookups.
+    # Ranges come in generation order, the first occurrence of a role is kept
     roles_set = set()
     gen_roles = []
-
-    # Iterate over the roles in the initial array.
-    for i, candidate_role in enumerate(init_roles):
-        role_tuple = tuple(candidate_role)
-        if role_tuple not in roles_set:
-            gen_roles.append(candidate_role)
-            roles_set.add(role_tuple)
-
-        # Calculate the intersection (bitwise AND) of the candidate role with the remaining roles.
-        intersections = np.bitwise_and(init_roles[i + 1 :], candidate_role)
-
-        # Filter out zero-sum intersections and duplicates.
-        non_zero_intersections = intersections[np.any(intersections, axis=1)]
-        new_roles = [
-            role for role in non_zero_intersections if tuple(role) not in roles_set
+    for role_range in role_ranges:
+        for role in role_range:
+            role_key = role.tobytes()
+            if role_key not in roles_set:
+                gen_roles.append(role)
+                roles_set.add(role_key)
+
+    return SparseUPA.from_rows(gen_roles, init_roles.num_of_permissions)
+
+
+def get_packed_fm_block_row(
+    words: np.ndarray, i_start: int, block_size: int
+) -> np.ndarray:
+    """
+    Generated roles of the block row of init roles i_start to
+    i_start + block_size - 1, each role once in generation order. A pair (i, j)
+    gets the generation order i * n + j, which is the position of the
+    intersection in the role-by-role loop (the diagonal holds the init roles
+    themselves).
+    """
+    num_of_roles = words.shape[0]
+    i_end = min(i_start + block_size, num_of_roles)
+    i_roles = np.arange(i_start, i_end)[:, None]
+    roles, orders = [], []
+
+    for j_start in range(i_start, num_of_roles, block_size):
+        j_end = min(j_start + block_size, num_of_roles)
+        j_roles = np.arange(j_start, j_end)[None, :]
+
+        # Intersections of every pair of the tile
+        tile = np.bitwise_and(
+            words[i_start:i_end, None, :], words[None, j_start:j_end, :]
+        )
+        keep = (j_roles == i_roles) | ((j_roles > i_roles) & np.any(tile, axis=2))
+
+        # Tile rows are in generation order, so the first occurrence of a
+        # role is its smallest order in the tile
+        tile_roles = tile[keep]
+        first, _ = get_unique_rows(tile_roles)
+        roles.append(tile_roles[first])
+        orders.append((i_roles * num_of_roles + j_roles)[keep][first])
+
+    # Merge the tiles of this block row, keeping the smallest order of a role
+    by_order = np.argsort(np.concatenate(orders), kind="stable")
+    all_roles = np.concatenate(roles)[by_order]
+    first, _ = get_unique_rows(all_roles)
+    return all_roles[first]
+
+
+def _get_packed_fm_gen_roles(
+    words: np.ndarray,
+    block_size: int,
+    executor: "ParallelExecutor | None" = None,
+) -> np.ndarray:
+    # Generates the FastMiner roles tile by tile over the upper triangle of
+    # init role pairs, one block row of tiles at a time
+    if executor is not None:
+        block_rows = executor.iter_packed_fm_block_rows(words, block_size)
+    else:
+        block_rows = (
+            get_packed_fm_block_row(words, i_start, block_size)
+            for i_start in range(0, words.shape[0], block_size)
+        )
+
+    # All the orders of a block row are above the ones of the rows before it,
+    # so merging in row order keeps the smallest order of every role
+    merged_roles = np.zeros((0, words.shape[1]), dtype=np.uint64)
+    for block_row in block_rows:
+        all_roles = np.concatenate([merged_roles, block_row])
+        first, _ = get_unique_rows(all_roles)
+        merged_roles = all_roles[first]
+    return merged_roles
+
+
+def get_fm_gen_roles(
+    init_roles: np.ndarray | PackedUPA | SparseUPA,
+    block_size: int | None = None,
+    executor: "ParallelExecutor | None" = None,
+) -> Any:
+    """
+    FastMiner candidate roles: the init roles and all their non-empty pairwise
+    intersections, each role once, in the order of the role-by-role loop.
+    block_size is the number of init roles per side of a tile of pairs.
+    With an executor, block rows (or ranges of sparse roles) are generated by
+    its workers, the result does not depend on the number of workers.
+    """
+    mining_init_roles = as_mining_upa(init_roles)
+
+    mining_gen_roles: PackedUPA | SparseUPA
+    if isinstance(mining_init_roles, SparseUPA):
+        mining_gen_roles = _get_sparse_fm_gen_roles(mining_init_roles, executor)
+    else:
+        num_of_roles, num_of_words = mining_init_roles.words.shape
+        if block_size is None:
+            block_size = max(1, int(np.sqrt(FM_TILE_BYTES / (num_of_words * 8))))
+            if executor is not None:
+                # Enough block rows to keep every worker busy
+                block_size = max(
+                    1, min(block_size, -(-num_of_roles // executor.num_of_tasks))
+                )
+        mining_gen_roles = PackedUPA(
+            _get_packed_fm_gen_roles(mining_init_roles.words, block_size, executor),
+            mining_init_roles.num_of_permissions,
+        )
+
+    if len(mining_gen_roles) == 0:
+        return None
+    return _restore_input_type(mining_gen_roles, init_roles)
+
+
+def _get_packed_roles_support(
+    upa: PackedUPA, roles: PackedUPA, max_chunk_bytes: int
+) -> np.ndarray:
+    # Identical users are counted once and weighted by their multiplicity
+    first_users, user_counts = get_unique_rows(upa.words, upa.max_chunk_bytes)
+    num_of_permissions = upa.num_of_permissions
+    role_sizes = popcount(roles.words)
+
+    # Unpacked users take up to half of a chunk, the other half holds the
+    # unpacked roles and their products with these users
+    user_chunk_size = max(1, max_chunk_bytes // (8 * num_of_permissions))
+    support = np.zeros(len(roles), dtype=np.int64)
+    for user_start in range(0, len(first_users), user_chunk_size):
+        user_end = user_start + user_chunk_size
+        users = unpack_rows(
+            upa.words[first_users[user_start:user_end]], num_of_permissions
+        ).astype(np.float32)
+        counts = user_counts[user_start:user_end]
+
+        chunk_size = max(1, max_chunk_bytes // (8 * (len(users) + num_of_permissions)))
+        for start in range(0, len(roles), chunk_size):
+            end = start + chunk_size
+            chunk = unpack_rows(roles.words[start:end], roles.num_of_permissions)
+            # Number of permissions of each role held by each user, exact in float32
+            shared = users @ chunk.astype(np.float32).T
+            support[start:end] += counts @ (shared == role_sizes[start:end])
+    return support
+
+
+def _get_sparse_roles_support(
+    upa: SparseUPA, roles: SparseUPA, max_chunk_bytes: int
+) -> np.ndarray:
+    col_indptr, col_row_ids, _ = upa.get_csc()
+    num_of_users = upa.shape[0]
+    role_sizes = roles.row_counts()
+    role_ids = roles.row_ids()
+
+    # A chunk holds one counter per (role, user) pair
+    chunk_size = max(1, max_chunk_bytes // (8 * max(num_of_users, 1)))
+    support = np.zeros(len(roles), dtype=np.int64)
+    for start in range(0, len(roles), chunk_size):
+        end = min(start + chunk_size, len(roles))
+        perms = slice(roles.indptr[start], roles.indptr[end])
+        positions, owners = gather_slices(col_indptr, roles.indices[perms])
+        pairs = (role_ids[perms][owners] - start) * num_of_users + col_row_ids[
+            positions
         ]
+        shared = np.bincount(pairs, minlength=(end - start) * num_of_users)
+        shared = shared.reshape(end - start, num_of_users)
+        support[start:end] = np.count_nonzero(
+            shared == role_sizes[start:end, None], axis=1
+        )
+    return support
+
+
+def _get_indexed_roles_support(
+    index: PermissionIndex, roles: PackedUPA | SparseUPA
+) -> np.ndarray:
+    # One AND of the user bitsets of its permissions per role
+    support = np.zeros(len(roles), dtype=np.int64)
+    for i, role in enumerate(roles.iter_rows()):
+        if isinstance(roles, PackedUPA):
+            role = np.flatnonzero(roles.dense_row(role))
+        support[i] = index.count_superset_rows(role)
+    return support
+
+
+def get_roles_support(
+    upa: PackedUPA | SparseUPA,
+    roles: PackedUPA | SparseUPA,
+    max_chunk_bytes: int = SUPPORT_CHUNK_BYTES,
+) -> np.ndarray:
+    """
+    Number of users holding every permission of each role.
+    The permission index of the UPA answers the queries when one is attached,
+    otherwise supports are computed in chunks of roles whose peak memory is
+    bounded by max_chunk_bytes.
+    """
+    if upa.permission_index is not None:
+        return _get_indexed_roles_support(upa.permission_index, roles)
+    if isinstance(upa, SparseUPA):
+        return _get_sparse_roles_support(upa, roles, max_chunk_bytes)
+    return _get_packed_roles_support(upa, roles, max_chunk_bytes)
+
+
+def get_fm_candidate_roles_support(
+    upa: np.ndarray | PackedUPA | SparseUPA,
+    gen_roles: np.ndarray | PackedUPA | SparseUPA,
+    max_chunk_bytes: int = SUPPORT_CHUNK_BYTES,
+    executor: "ParallelExecutor | None" = None,
+) -> np.ndarray:
+    # Total count of every candidate in list order. Supports are split across
+    # the worker processes of the executor if given.
+    mining_upa = as_mining_upa(upa)
+    mining_gen_roles = as_mining_upa(gen_roles, like=mining_upa)
+
+    if executor is not None:
+        return executor.get_roles_support(mining_upa, mining_gen_roles, max_chunk_bytes)
+    return get_roles_support(mining_upa, mining_gen_roles, max_chunk_bytes)
 
-        # Add the new unique roles to the generated roles list and the roles_set.
-        for new_role in new_roles:
-            gen_roles.append(new_role)
-            roles_set.add(tuple(new_role))
 
-    return np.array(gen_roles) if gen_roles else None
+# endregion
 
+# TODO: tests
 
-def get_fm_candidate_roles_total_count(
-    upa: np.ndarray, gen_roles: np.ndarray
-) -> Dict[Tuple, int]:
-    # Initialize the defaultdict to store counts
-    total_count: Dict[Tuple, int] = defaultdict(int)
 
-    # Iterate through each generated role
-    for r in gen_roles:
-        # Use broadcasting and vectorization to apply bitwise_and across all rows in upa
-        mask = np.all(np.bitwise_and(upa, r) == r, axis=1)
+def get_role_cover_area(
+    upa: np.ndarray | PackedUPA | SparseUPA | CoverageState, role: np.ndarray
+) -> tuple[tuple, int]:
+    if isinstance(upa, CoverageState):
+        return tuple(role), upa.get_role_cover_area(role)
 
-        # Count the occurrences of rows that satisfy the condition
-        total_count[tuple(r)] += np.sum(mask)
+    if isinstance(upa, PackedUPA):
+        # Rows holding the role, whether their cells are already covered or not
+        valid_rows = np.flatnonzero(upa.get_superset_rows(role))
 
-    return sort_dict_by_value(total_count)
+        # Count the uncovered cells of the role in valid rows, all their role
+        # cells are assigned so only the covered ones are subtracted
+        count = len(valid_rows) * popcount(role)
+        if upa.covered is not None:
+            count -= popcount(np.bitwise_and(upa.covered[valid_rows], role)).sum()
 
+        return tuple(role), int(count)
 
-# endregion
+    if isinstance(upa, SparseUPA):
+        # Role cells of every user, and the users holding all of them
+        rows, positions = upa.gather_columns(role)
+        valid_cells = upa.get_superset_rows(role)[rows]
 
-# TODO: tests
+        # Count the uncovered cells of the role in valid rows
+        count = np.count_nonzero(valid_cells)
+        if upa.covered is not None:
+            count -= np.count_nonzero(upa.covered[positions[valid_cells]])
 
+        return tuple(role), int(count)
 
-def get_role_cover_area(upa: np.ndarray, role: np.ndarray) -> tuple[tuple, int]:
     # Convert role to a boolean mask
     role_mask = role == 1
 
@@ -114,75 +406,107 @@ def roles_subtraction(a: Tuple[int, ...], b: Tuple[int, ...]) -> Tuple[int, ...]
     return tuple(0 if x == 1 and y == 1 else x for x, y in zip(a, b))
 
 
-def process_row(i, row, max_cover_role_array, max_cover_role) -> tuple:
-    ua_dict_local = defaultdict(list)
+def cover_with_role(
+    upa: PackedUPA | SparseUPA | CoverageState, role: np.ndarray
+) -> Tuple[tuple, PackedUPA | SparseUPA | CoverageState, dict[int, list]]:
+    max_cover_role = tuple(upa.dense_row(role).tolist())
+
+    if isinstance(upa, CoverageState):
+        # Covered in place, only the users holding the role are touched
+        assigned_users = upa.cover(role)
+        return (
+            max_cover_role,
+            upa,
+            {int(i) + 1: [max_cover_role] for i in assigned_users},
+        )
+
+    # Users holding the role that still have uncovered cells get the role,
+    # and all the role cells of these users become covered
+    assigned_users = np.flatnonzero(
+        upa.get_superset_rows(role) & (upa.uncovered_row_counts() > 0)
+    )
+    _updated_upa = upa.cover(assigned_users, role)
 
-    # Determine if the row should be updated
-    if np.any(row == 1) and np.all((row >= 1) | (max_cover_role_array != 1)):
-        # Update ua_dict_local and the row
-        ua_dict_local[i + 1].append(max_cover_role)
-        updated_row = np.where(max_cover_role_array == 1, 2, row)
-    else:
-        updated_row = row
+    ua_dict: dict[int, list] = {int(i) + 1: [max_cover_role] for i in assigned_users}
 
-    return i, ua_dict_local, updated_row
+    return max_cover_role, _updated_upa, ua_dict
 
 
 def get_max_cover_role(
-    upa: np.ndarray,
-    list_of_roles: np.ndarray,
+    upa: np.ndarray | PackedUPA | SparseUPA,
+    list_of_roles: np.ndarray | PackedUPA | SparseUPA,
     prev_covered_areas: dict,
     delta_factor: int = 0,
+    executor: "ParallelExecutor | None" = None,
 ):
+    if isinstance(upa, np.ndarray):
+        # Dense UPA: run on the packed representation and unpack the results
+        max_cover_role, _updated_upa, updated_list_of_roles, ua_dict, _ = (
+            get_max_cover_role(
+                PackedUPA.from_dense(upa),
+                as_packed_upa(list_of_roles),
+                prev_covered_areas,
+                delta_factor,
+                executor,
+            )
+        )
+        return (
+            max_cover_role,
+            _updated_upa.to_dense(),
+            updated_list_of_roles.to_dense(),
+            ua_dict,
+            prev_covered_areas,
+        )
+
+    list_of_roles = as_mining_upa(list_of_roles, like=upa)
     covered_area = 0
-    max_cover_role = None
-    max_area = np.sum(upa)
-
-    for role in list_of_roles:
-        role_key = tuple(role)
-
-        # Skip roles that have already been processed with worse or equal coverage
-        if (
-            role_key in prev_covered_areas
-            and prev_covered_areas[role_key] <= covered_area
-        ):
-            continue
-
-        # Compute the cover area for the current role
-        _role, _covered_area = get_role_cover_area(upa, role)
+    max_cover_role_row = None
+    max_area = upa.count_cells_sum()
+
+    if executor is not None:
+        # All areas are computed in the workers, then reduced to the role the
+        # scan below would choose
+        roles = list(list_of_roles.iter_rows())
+        areas = executor.get_cover_areas(upa, list_of_roles)
+        prev_covered_areas.update(
+            zip((role.tobytes() for role in roles), areas.tolist())
+        )
+        reached = np.flatnonzero((areas >= max_area - delta_factor) & (areas > 0))
+        if len(reached):
+            max_cover_role_row = roles[reached[0]]
+        elif len(areas) and areas.max() > 0:
+            max_cover_role_row = roles[int(np.argmax(areas))]
+    else:
+        for role in list_of_roles.iter_rows():
+            # Areas are keyed by the bytes of the packed (or sparse) role
+            role_key = role.tobytes()
 
-        # Store the covered area for this role
-        prev_covered_areas[role_key] = _covered_area
+            # Skip roles already processed with worse or equal coverage
+            if (
+                role_key in prev_covered_areas
+                and prev_covered_areas[role_key] <= covered_area
+            ):
+                continue
 
-        # Update the max cover role if the current one is better
-        if _covered_area > covered_area:
-            max_cover_role = _role
-            covered_area = _covered_area
+            # Compute the cover area for the current role
+            _, _covered_area = get_role_cover_area(upa, role)
 
-        # Early exit if the current covered area is sufficient
-        if covered_area >= max_area - delta_factor:
-            break
+            # Store the covered area for this role
+            prev_covered_areas[role_key] = _covered_area
 
-    # Convert max_cover_role to a numpy array
-    max_cover_role_array = np.array(max_cover_role)
+            # Update the max cover role if the current one is better
+            if _covered_area > covered_area:
+                max_cover_role_row = role
+                covered_area = _covered_area
 
-    # Update UPA without parallel processing
-    _updated_upa = upa.copy()
+            # Early exit if the current covered area is sufficient
+            if covered_area >= max_area - delta_factor:
+                break
 
-    ua_dict: dict[tuple, list] = defaultdict(list)
-    for i in range(_updated_upa.shape[0]):
-        # Process each row and update UPA
-        local_dict, updated_row = process_row(
-            i, _updated_upa[i], max_cover_role_array, max_cover_role
-        )[1:]
-        ua_dict.update(local_dict)
-        _updated_upa[i] = updated_row
+    max_cover_role, _updated_upa, ua_dict = cover_with_role(upa, max_cover_role_row)
 
     # Filter out the max cover role from the list of roles
-    mask = ~np.all(
-        (list_of_roles == max_cover_role_array),
-        axis=1,
-    )
+    mask = ~list_of_roles.find_rows(max_cover_role_row)
     updated_list_of_roles = list_of_roles[mask]
 
     return (
@@ -194,6 +518,97 @@ def get_max_cover_role(
     )
 
 
+class LazyGreedySelector:
+    """
+    Lazy-greedy (CELF) version of the role choice of get_max_cover_role.
+
+    Cover areas only shrink as cells get covered, so the last computed area
+    of a role bounds its current one. Roles wait in a max-heap of these
+    bounds and an area is recomputed only when its role reaches the top.
+    The choice is the same as the scan of get_max_cover_role: the first role
+    in list order whose area reaches max_area - delta_factor, otherwise the
+    first role with the largest area.
+
+    With an executor, the areas of the first choice (all of them) are
+    computed by its worker processes.
+    """
+
+    def __init__(
+        self,
+        list_of_roles: PackedUPA | SparseUPA,
+        executor: "ParallelExecutor | None" = None,
+    ):
+        self.list_of_roles = list_of_roles
+        self.executor = executor
+        self.roles = list(list_of_roles.iter_rows())
+        self.removed = np.zeros(len(self.roles), dtype=bool)
+        # Roles never evaluated have no bound yet
+        self.bounds = np.full(len(self.roles), np.iinfo(np.int64).max)
+        self.heap = [(-int(bound), i) for i, bound in enumerate(self.bounds)]
+        self.num_of_evaluations = 0
+
+    def _evaluate(self, upa: PackedUPA | SparseUPA | CoverageState, i: int) -> int:
+        _, area = get_role_cover_area(upa, self.roles[i])
+        self.bounds[i] = area
+        self.num_of_evaluations += 1
+        heapq.heappush(self.heap, (-area, i))
+        return area
+
+    def _get_threshold_role(
+        self,
+        upa: PackedUPA | SparseUPA | CoverageState,
+        threshold: int,
+        evaluated: set[int],
+    ) -> int | None:
+        # Only roles whose bound reaches the threshold can reach it
+        for i in np.flatnonzero(~self.removed & (self.bounds >= threshold)):
+            area = self.bounds[i] if i in evaluated else self._evaluate(upa, i)
+            evaluated.add(int(i))
+            if area >= threshold:
+                return int(i)
+        return None
+
+    def _get_first_max_role(
+        self, upa: PackedUPA | SparseUPA | CoverageState, evaluated: set[int]
+    ) -> int | None:
+        while self.heap:
+            negative_bound, i = self.heap[0]
+            if self.removed[i] or -negative_bound != self.bounds[i]:
+                # Entry of a removed role or an outdated bound
+                heapq.heappop(self.heap)
+            elif i in evaluated or self.bounds[i] == 0:
+                # Equal areas are ordered by list position in the heap
+                return i if self.bounds[i] > 0 else None
+            else:
+                heapq.heappop(self.heap)
+                self._evaluate(upa, i)
+                evaluated.add(i)
+        return None
+
+    def pop_max_cover_role(
+        self, upa: PackedUPA | SparseUPA | CoverageState, delta_factor: int = 0
+    ) -> np.ndarray:
+        # Areas computed in this call are exact, the other ones are bounds
+        evaluated: set[int] = set()
+        if self.executor is not None and self.num_of_evaluations == 0:
+            self.bounds = self.executor.get_cover_areas(upa, self.list_of_roles)
+            self.num_of_evaluations = len(self.bounds)
+            self.heap = [(-int(area), i) for i, area in enumerate(self.bounds)]
+            heapq.heapify(self.heap)
+            evaluated.update(range(len(self.bounds)))
+        threshold = upa.count_cells_sum() - delta_factor
+        i = self._get_threshold_role(upa, threshold, evaluated)
+        if i is None:
+            i = self._get_first_max_role(upa, evaluated)
+        if i is None:
+            raise FastMinerException("No candidate role covers an uncovered cell")
+
+        # The role and its duplicates leave the list
+        role = self.roles[i]
+        self.removed |= self.list_of_roles.find_rows(role)
+        return role
+
+
 if __name__ == "__main__":
     num_of_roles = 4
     upa = load_upa_from_one2one_file("dataset/test_datasets/simple_dataset.txt")
@@ -211,7 +626,7 @@ if __name__ == "__main__":
     gen_roles: np.ndarray = get_fm_gen_roles(init_roles)
     print("GEN_ROLES")
     print(gen_roles)
-    total_count = get_fm_candidate_roles_total_count(upa, gen_roles)
+    total_count = get_fm_candidate_roles_support(upa, gen_roles)
     print("Total count")
     print(total_count)
 
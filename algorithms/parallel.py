@@ -0,0 +1,301 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from algorithms.coverage_state import CoverageState
+from algorithms.miner_utils import (
+    SUPPORT_CHUNK_BYTES,
+    get_packed_fm_block_row,
+    get_role_cover_area,
+    get_roles_support,
+    get_sparse_fm_role_range,
+)
+from dataset.packed_upa import PackedUPA
+from dataset.permission_index import PermissionIndex
+from dataset.sparse_upa import SparseUPA
+
+# Role ranges per worker, smaller ranges balance uneven role sizes
+TASKS_PER_WORKER = 4
+
+# (shared memory name, shape, dtype) of an array mapped by the workers
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+
+def _attach_array(spec: ArraySpec, blocks: list) -> np.ndarray:
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _close_blocks(blocks: list) -> None:
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            # An array of the block is still referenced, e.g. by a traceback
+            pass
+
+
+def _attach_upa(spec: Dict[str, Any], blocks: list) -> PackedUPA | SparseUPA:
+    arrays = {
+        name: _attach_array(array_spec, blocks)
+        for name, array_spec in spec["arrays"].items()
+    }
+    upa: PackedUPA | SparseUPA
+    if spec["kind"] == "packed":
+        upa = PackedUPA(arrays["words"], spec["num_of_permissions"])
+    else:
+        csc = None
+        if "col_indptr" in arrays:
+            csc = (arrays["col_indptr"], arrays["col_row_ids"], arrays["col_positions"])
+        upa = SparseUPA(
+            arrays["indptr"], arrays["indices"], spec["num_of_permissions"], csc=csc
+        )
+    if "user_words" in arrays:
+        upa.permission_index = PermissionIndex(arrays["user_words"], upa.shape[0])
+    return upa
+
+
+def _compute_roles_support(
+    blocks: list,
+    upa_spec: dict,
+    roles_spec: dict,
+    max_chunk_bytes: int,
+    start: int,
+    end: int,
+) -> np.ndarray:
+    upa = _attach_upa(upa_spec, blocks)
+    roles = _attach_upa(roles_spec, blocks)[start:end]
+    return get_roles_support(upa, roles, max_chunk_bytes)
+
+
+def _compute_cover_areas(
+    blocks: list,
+    upa_spec: dict,
+    roles_spec: dict,
+    uncovered_spec: ArraySpec,
+    weights: Tuple[np.ndarray | None, np.ndarray | None],
+    start: int,
+    end: int,
+) -> np.ndarray:
+    coverage = CoverageState(
+        _attach_upa(upa_spec, blocks), _attach_array(uncovered_spec, blocks), *weights
+    )
+    roles = _attach_upa(roles_spec, blocks)[start:end]
+    return np.array(
+        [get_role_cover_area(coverage, role)[1] for role in roles.iter_rows()],
+        dtype=np.int64,
+    )
+
+
+def _compute_packed_fm_block_row(
+    blocks: list, words_spec: ArraySpec, block_size: int, i_start: int
+) -> np.ndarray:
+    words = _attach_array(words_spec, blocks)
+    return get_packed_fm_block_row(words, i_start, block_size)
+
+
+def _compute_sparse_fm_role_range(
+    blocks: list, init_roles_spec: dict, start: int, end: int
+) -> List[np.ndarray]:
+    init_roles = _attach_upa(init_roles_spec, blocks)
+    # Rows of the shared arrays are copied, they outlive the blocks
+    return [role.copy() for role in get_sparse_fm_role_range(init_roles, start, end)]
+
+
+def _run_task(compute, *args) -> Any:
+    # The shared blocks are closed once the arrays mapping them are released
+    blocks: list = []
+    try:
+        return compute(blocks, *args)
+    finally:
+        _close_blocks(blocks)
+
+
+class ParallelExecutor:
+    """
+    Process pool scoring candidate roles in parallel.
+
+    The UPA, its permission index and the candidate roles are copied to shared
+    memory once, the workers map them instead of receiving pickled copies.
+    Roles are split in contiguous ranges and the results are concatenated in
+    list order, so they equal the serial ones for any number of workers.
+    """
+
+    def __init__(self, num_of_workers: int | None = None):
+        self.num_of_workers = num_of_workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(self.num_of_workers)
+        # Shared copies by id of the source array, which is kept alive with them
+        self._shared: Dict[
+            int, Tuple[np.ndarray, shared_memory.SharedMemory, ArraySpec]
+        ] = {}
+
+    @property
+    def num_of_tasks(self) -> int:
+        return self.num_of_workers * TASKS_PER_WORKER
+
+    def __enter__(self) -> "ParallelExecutor":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        # Tasks not started yet are dropped when the caller failed or was
+        # cancelled
+        self.close(cancel_futures=exc_type is not None)
+
+    def close(self, cancel_futures: bool = False) -> None:
+        self._pool.shutdown(cancel_futures=cancel_futures)
+        for _, block, _ in self._shared.values():
+            block.close()
+            block.unlink()
+        self._shared.clear()
+
+    def _share_array(
+        self, array: np.ndarray, temporary: list | None = None
+    ) -> ArraySpec:
+        # Arrays added to `temporary` are released at the end of the call
+        if id(array) not in self._shared:
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            spec = (block.name, array.shape, array.dtype.str)
+            self._shared[id(array)] = (array, block, spec)
+            if temporary is not None:
+                temporary.append(array)
+        return self._shared[id(array)][2]
+
+    def _release_arrays(self, arrays: list) -> None:
+        for array in arrays:
+            _, block, _ = self._shared.pop(id(array))
+            block.close()
+            block.unlink()
+
+    def _share_upa(
+        self, upa: PackedUPA | SparseUPA, temporary: list | None = None
+    ) -> Dict[str, Any]:
+        arrays: Dict[str, np.ndarray]
+        if isinstance(upa, PackedUPA):
+            arrays = {"words": upa.words}
+        else:
+            col_indptr, col_row_ids, col_positions = upa.get_csc()
+            arrays = {
+                "indptr": upa.indptr,
+                "indices": upa.indices,
+                "col_indptr": col_indptr,
+                "col_row_ids": col_row_ids,
+                "col_positions": col_positions,
+            }
+        if upa.permission_index is not None:
+            arrays["user_words"] = upa.permission_index.user_words
+        return {
+            "kind": "packed" if isinstance(upa, PackedUPA) else "sparse",
+            "num_of_permissions": upa.num_of_permissions,
+            "arrays": {
+                name: self._share_array(array, temporary)
+                for name, array in arrays.items()
+            },
+        }
+
+    def _submit_ranges(self, compute, num_of_roles: int, *args) -> list:
+        # Contiguous role ranges, their results come back in list order
+        num_of_tasks = max(1, min(num_of_roles, self.num_of_tasks))
+        bounds = np.linspace(0, num_of_roles, num_of_tasks + 1).astype(int).tolist()
+        return [
+            self._pool.submit(_run_task, compute, *args, start, end)
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def _map(self, compute, num_of_roles: int, *args) -> np.ndarray:
+        futures = self._submit_ranges(compute, num_of_roles, *args)
+        return np.concatenate([future.result() for future in futures])
+
+    def get_roles_support(
+        self,
+        upa: PackedUPA | SparseUPA,
+        roles: PackedUPA | SparseUPA,
+        max_chunk_bytes: int = SUPPORT_CHUNK_BYTES,
+    ) -> np.ndarray:
+        # Same as get_roles_support, each worker holding one chunk at a time.
+        # The UPA stays shared, the roles are shared for this call only.
+        temporary: list = []
+        try:
+            return self._map(
+                _compute_roles_support,
+                len(roles),
+                self._share_upa(upa),
+                self._share_upa(roles, temporary),
+                max_chunk_bytes,
+            )
+        finally:
+            self._release_arrays(temporary)
+
+    def get_cover_areas(
+        self,
+        upa: PackedUPA | SparseUPA | CoverageState,
+        roles: PackedUPA | SparseUPA,
+    ) -> np.ndarray:
+        # Cover areas of all the roles, as get_role_cover_area computes them.
+        # A greedy loop passes a new UPA and new uncovered cells at every step,
+        # they are shared per call unless already shared, e.g. by
+        # get_roles_support.
+        coverage = upa if isinstance(upa, CoverageState) else CoverageState(upa)
+        temporary: list = []
+        try:
+            return self._map(
+                _compute_cover_areas,
+                len(roles),
+                self._share_upa(coverage.upa, temporary),
+                self._share_upa(roles, temporary),
+                self._share_array(coverage.uncovered, temporary),
+                # Weights of a reduced UPA are small, they are sent with the task
+                (coverage.user_weights, coverage.permission_weights),
+            )
+        finally:
+            self._release_arrays(temporary)
+
+    def map_tasks(self, compute: Callable, tasks: List[tuple]) -> Iterator[Any]:
+        # Results of compute(*task) for independent tasks whose arguments are
+        # small enough to be pickled, in task order
+        futures = [self._pool.submit(compute, *task) for task in tasks]
+        for future in futures:
+            yield future.result()
+
+    def iter_packed_fm_block_rows(
+        self, words: np.ndarray, block_size: int
+    ) -> Iterator[np.ndarray]:
+        # Same as get_packed_fm_block_row for every block row, in row order
+        temporary: list = []
+        try:
+            words_spec = self._share_array(words, temporary)
+            futures = [
+                self._pool.submit(
+                    _run_task,
+                    _compute_packed_fm_block_row,
+                    words_spec,
+                    block_size,
+                    i_start,
+                )
+                for i_start in range(0, len(words), block_size)
+            ]
+            for future in futures:
+                yield future.result()
+        finally:
+            self._release_arrays(temporary)
+
+    def iter_sparse_fm_role_ranges(
+        self, init_roles: SparseUPA
+    ) -> Iterator[List[np.ndarray]]:
+        # Same as get_sparse_fm_role_range for contiguous ranges, in role order
+        temporary: list = []
+        try:
+            futures = self._submit_ranges(
+                _compute_sparse_fm_role_range,
+                len(init_roles),
+                self._share_upa(init_roles, temporary),
+            )
+            for future in futures:
+                yield future.result()
+        finally:
+            self._release_arrays(temporary)
@@ -1,58 +1,347 @@
+import heapq
 import os
 import time
-from collections import defaultdict
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple
 
 import numpy as np
 
+from algorithms.coverage_state import CoverageState
 from algorithms.fast_miner import get_fast_miner_result
-from algorithms.miner_utils import get_max_cover_role, get_role_label_with_cache
+from algorithms.miner_utils import FastMinerException, LazyGreedySelector, as_mining_upa
+from algorithms.parallel import ParallelExecutor
+from algorithms.rmp_result import RMPResult
+from algorithms.role_registry import get_permissions_label
+from dataset.packed_upa import PackedUPA, pack_rows
+from dataset.permission_index import with_permission_index
+from dataset.reduced_upa import ReducedUPA, reduce_upa
+from dataset.sparse_upa import SparseUPA
+from dataset.upa_components import UPAComponent, get_assignments, split_upa
 
+# The zero-based permissions and users of a chosen role, and the number of
+# cells left uncovered after it
+RMPChoice = Tuple[np.ndarray, np.ndarray, int]
 
-def basic_rmp(upa: np.ndarray, delta_factor: int = 0):
+
+class RMPStep(NamedTuple):
+    # A chosen role is final, so every step can be shown as soon as it is made
+    # Index of the role in choice order
+    role: int
+    # Zero-based permissions of the role
+    permissions: np.ndarray
+    # One-based users that got the role in this step
+    users: List[int]
+    num_of_uncovered: int
+
+    @property
+    def role_name(self) -> str:
+        return f"R{self.role + 1}"
+
+    @property
+    def role_label(self) -> str:
+        return get_permissions_label(self.permissions.tolist())
+
+
+def _reduce_rmp_input(
+    upa: PackedUPA | SparseUPA,
+    gen_roles_list: np.ndarray | PackedUPA | SparseUPA | None,
+) -> Tuple[PackedUPA | SparseUPA, Any, ReducedUPA | None]:
+    # Duplicate users and permissions are merged when the given candidates
+    # (if any) hold whole groups of merged permissions
+    reduction = reduce_upa(upa)
+    if reduction is None:
+        return upa, gen_roles_list, None
+    if gen_roles_list is not None:
+        reduced_roles = reduction.reduce_roles(as_mining_upa(gen_roles_list, like=upa))
+        if reduced_roles is None:
+            return upa, gen_roles_list, None
+        gen_roles_list = reduced_roles
+    return reduction.upa, gen_roles_list, reduction
+
+
+def _iter_rmp_choices(
+    upa: PackedUPA | SparseUPA,
+    delta_factor: int,
+    gen_roles_list: np.ndarray | PackedUPA | SparseUPA | None,
+    num_of_workers: int = 1,
+    verbose: bool = True,
+) -> Iterator[RMPChoice]:
     start_time = time.time()
-    gen_roles_list = get_fast_miner_result(upa)
-    print()
-    print(f"\tFastMiner calc time: {time.time() - start_time} seconds")
-
-    updated_upa = upa.copy()
-    pa_list = []
-    ua_dict = defaultdict(list)
-
-    # Cache roles_label_mapping within the loop to avoid re-computation
-    roles_label_mapping = {}
-
-    # Main loop
-    roles_cover_map: dict[tuple, int] = {}
-    while np.sum(updated_upa == 1) > delta_factor:
-        role, updated_upa, gen_roles_list, users_list, roles_cover_map = (
-            get_max_cover_role(
-                updated_upa, gen_roles_list, roles_cover_map, delta_factor
+    # All RMP iterations run on bitsets or on the sparse assignment arrays.
+    # Covered copies share the permission index, except out of core where
+    # the index would be as large as the matrix.
+    updated_upa, gen_roles_list, reduction = _reduce_rmp_input(upa, gen_roles_list)
+    if not isinstance(updated_upa, PackedUPA) or updated_upa.max_chunk_bytes is None:
+        updated_upa = with_permission_index(updated_upa)
+    # FastMiner candidates can be passed in when they were already computed
+    if gen_roles_list is None:
+        gen_roles_list = get_fast_miner_result(updated_upa, num_of_workers)
+    if verbose:
+        print()
+        print(f"\tFastMiner calc time: {time.time() - start_time} seconds")
+
+    # Main loop, cover areas are recomputed lazily from their stale bounds
+    # and the coverage is updated in place. With several workers, the first
+    # choice scores all the candidates in parallel.
+    executor = ParallelExecutor(num_of_workers) if num_of_workers > 1 else None
+    with executor or nullcontext():
+        selector = LazyGreedySelector(
+            as_mining_upa(gen_roles_list, like=updated_upa), executor
+        )
+        coverage = (
+            CoverageState(updated_upa)
+            if reduction is None
+            else CoverageState(
+                updated_upa,
+                user_weights=reduction.user_weights,
+                permission_weights=reduction.permission_weights,
+            )
+        )
+        while coverage.count_uncovered() > delta_factor:
+            role_row = selector.pop_max_cover_role(coverage, delta_factor)
+            users = coverage.cover(role_row)
+            role = coverage.dense_row(role_row)
+            if reduction is not None:
+                role = reduction.expand_role(role)
+                users = reduction.expand_users(users)
+            yield np.flatnonzero(role), users, coverage.count_uncovered()
+
+
+def _get_component_choices(
+    upa: PackedUPA | SparseUPA, gen_roles_list: PackedUPA | SparseUPA | None
+) -> List[RMPChoice]:
+    """
+    RMP of one part of the connected components down to full coverage, as
+    the choices with permissions and users local to the part. Runs in a
+    worker process. When the given candidates cannot cover the rest, the
+    choices stop there and the merge raises only if it needs more of them.
+    """
+    choices: List[RMPChoice] = []
+    try:
+        for choice in _iter_rmp_choices(upa, 0, gen_roles_list, verbose=False):
+            choices.append(choice)
+    except FastMinerException:
+        pass
+    return choices
+
+
+def _split_rmp_input(
+    upa: PackedUPA | SparseUPA,
+    delta_factor: int,
+    gen_roles_list: np.ndarray | PackedUPA | SparseUPA | None,
+    num_of_workers: int,
+) -> Tuple[List[UPAComponent], List[Any], List[np.ndarray | None]] | None:
+    """
+    Connected components of the UPA packed in one part per worker, with the
+    given candidates (if any) of every part and their positions in the
+    list. None when the UPA
+    does not split, or when the result could differ from the one of the
+    whole matrix: a candidate spans several components, or a role could
+    reach the delta threshold, which is checked against all the components.
+    """
+    if upa.covered is not None or (
+        isinstance(upa, PackedUPA) and upa.max_chunk_bytes is not None
+    ):
+        return None
+    components = split_upa(upa, num_of_workers)
+    if len(components) < 2:
+        return None
+    sizes = [int(component.upa.row_counts().sum()) for component in components]
+    if delta_factor >= sum(sizes) - max(sizes):
+        return None
+    if gen_roles_list is None:
+        return components, [None] * len(components), [None] * len(components)
+
+    # Component of every candidate, from the components of its permissions
+    roles = as_mining_upa(gen_roles_list, like=upa)
+    role_ids, permissions = get_assignments(roles)
+    permission_components = np.full(upa.shape[1], -1)
+    for k, component in enumerate(components):
+        permission_components[component.permissions] = k
+    first = np.full(len(roles), len(components))
+    last = np.full(len(roles), -1)
+    np.minimum.at(first, role_ids, permission_components[permissions])
+    np.maximum.at(last, role_ids, permission_components[permissions])
+    if np.any(first != last):
+        return None
+
+    component_roles, positions = [], []
+    for k, component in enumerate(components):
+        role_positions = np.flatnonzero(first == k)
+        cells = first[role_ids] == k
+        component_roles.append(
+            type(component.upa).from_assignments(
+                np.searchsorted(role_positions, role_ids[cells]),
+                np.searchsorted(component.permissions, permissions[cells]),
+                (len(role_positions), len(component.permissions)),
             )
         )
-        role_label = get_role_label_with_cache(role)
+        positions.append(role_positions)
+    return components, component_roles, positions
+
+
+def _get_choice_key(
+    component: UPAComponent,
+    permissions: np.ndarray,
+    gen_roles_list: PackedUPA | SparseUPA | None,
+    positions: np.ndarray | None,
+) -> tuple:
+    """
+    Position of a chosen role in the candidate list of the whole matrix,
+    which breaks ties between components as RMP on the whole matrix does.
+    Given candidates keep their list position. FastMiner candidates come in
+    the order of the first pair of init roles intersecting in them, that is
+    the first pair of users (u, v), u <= v, whose rows intersect in the role.
+    """
+    upa = component.upa
+    role = np.zeros(upa.shape[1], dtype=np.uint8)
+    role[permissions] = 1
+    role_words = pack_rows(role)[0]
+    role_row = role_words if isinstance(upa, PackedUPA) else permissions
+    if gen_roles_list is not None:
+        return (int(positions[np.argmax(gen_roles_list.find_rows(role_row))]),)
+
+    holders = upa.get_superset_rows(role_row)
+    rows = (
+        upa.words[holders]
+        if isinstance(upa, PackedUPA)
+        else pack_rows(upa[holders].to_dense())
+    )
+    users = component.users[holders]
+    for k in range(len(rows)):
+        pairs = np.all(np.bitwise_and(rows[k:], rows[k]) == role_words, axis=1)
+        if np.any(pairs):
+            return int(users[k]), int(users[k + np.argmax(pairs)])
+    raise FastMinerException("The role is not a FastMiner candidate")
+
+
+def _iter_component_choices(
+    upa: PackedUPA | SparseUPA,
+    delta_factor: int,
+    split: Tuple[List[UPAComponent], List[Any], List[np.ndarray | None]],
+    num_of_workers: int,
+) -> Iterator[RMPChoice]:
+    """
+    Runs RMP on every part of the connected components in parallel, the
+    largest first, then merges the choices into the ones of the whole matrix.
+    A role never spans two components and covering it leaves the other
+    components unchanged, so the whole-matrix RMP takes the best next choice
+    of some component: the one with the largest area, ties going to the first
+    candidate in list order.
+    """
+    components, component_roles, positions = split
+    uncovered = [int(component.upa.row_counts().sum()) for component in components]
+    num_of_uncovered = sum(uncovered)
+
+    # The largest components start first, they decide the wall time
+    by_size = sorted(range(len(components)), key=lambda k: -uncovered[k])
+    tasks = [(components[k].upa, component_roles[k]) for k in by_size]
+    runs: List[Any] = [None] * len(components)
+    with ParallelExecutor(num_of_workers) as executor:
+        for k, run in zip(by_size, executor.map_tasks(_get_component_choices, tasks)):
+            runs[k] = run
+
+    heap: List[Tuple[int, tuple, int, int]] = []
+
+    def push(k: int, i: int) -> None:
+        choices = runs[k]
+        if i < len(choices):
+            permissions, _, component_uncovered = choices[i]
+            area = uncovered[k] - component_uncovered
+            key = _get_choice_key(
+                components[k], permissions, component_roles[k], positions[k]
+            )
+            heapq.heappush(heap, (-area, key, k, i))
+
+    for k in range(len(components)):
+        push(k, 0)
+    while num_of_uncovered > delta_factor:
+        if not heap:
+            raise FastMinerException("No candidate role covers an uncovered cell")
+        negative_area, _, k, i = heapq.heappop(heap)
+        permissions, users, uncovered[k] = runs[k][i]
+        num_of_uncovered += negative_area
+        yield (
+            components[k].permissions[permissions],
+            components[k].users[users],
+            num_of_uncovered,
+        )
+        push(k, i + 1)
+
+
+def iter_basic_rmp(
+    upa: np.ndarray | PackedUPA | SparseUPA,
+    delta_factor: int = 0,
+    gen_roles_list: np.ndarray | PackedUPA | SparseUPA | None = None,
+    num_of_workers: int = 1,
+) -> Iterator[RMPStep]:
+    """
+    Runs basic RMP one greedy choice at a time, yielding every chosen role
+    with the users it is assigned to.
+
+    When users or permissions are duplicated, RMP runs on the reduced matrix
+    with cover areas weighted by the sizes of the merged groups, and every
+    step is expanded back to the original users and permissions.
+
+    With several workers, when the user-permission graph splits into
+    connected components, every worker mines some of them on its own and
+    their choices are merged, the roles being the same as on the whole matrix.
+    """
+    # Dense input is packed once
+    mining_upa = as_mining_upa(upa)
+    split = (
+        _split_rmp_input(mining_upa, delta_factor, gen_roles_list, num_of_workers)
+        if num_of_workers > 1
+        else None
+    )
+    choices = (
+        _iter_rmp_choices(mining_upa, delta_factor, gen_roles_list, num_of_workers)
+        if split is None
+        else _iter_component_choices(mining_upa, delta_factor, split, num_of_workers)
+    )
+
+    # A role is chosen once, its index is its position in choice order
+    for role, (permissions, users, num_of_uncovered) in enumerate(choices):
+        yield RMPStep(role, permissions, (users + 1).tolist(), num_of_uncovered)
 
-        # Add the role to pa_list and update mapping
-        pa_list.append(role_label)
 
-        # Ensure roles_label_mapping is populated only once per role
-        if role_label not in roles_label_mapping:
-            roles_label_mapping[role_label] = f"R{len(pa_list)}"
+def get_rmp_result(steps: Iterable[RMPStep], shape: Tuple[int, int]) -> RMPResult:
+    return RMPResult.from_choices(
+        shape, ((step.permissions, np.array(step.users) - 1) for step in steps)
+    )
 
-        # Update ua_dict efficiently with batched list extensions
-        for k, v in users_list.items():
-            ua_dict[k].extend([get_role_label_with_cache(r) for r in v])
 
-    # Create pa_matrix from pa_list and roles_label_mapping
-    pa_matrix = {roles_label_mapping[r]: r.split(",") for r in pa_list}
+def basic_rmp_result(
+    upa: np.ndarray | PackedUPA | SparseUPA,
+    delta_factor: int = 0,
+    gen_roles_list: np.ndarray | PackedUPA | SparseUPA | None = None,
+    num_of_workers: int = 1,
+    progress: Callable[..., None] | None = None,
+) -> RMPResult:
+    # progress, if given, is called after every chosen role with the number
+    # of roles and of cells still uncovered
+    steps = []
+    for step in iter_basic_rmp(upa, delta_factor, gen_roles_list, num_of_workers):
+        steps.append(step)
+        if progress is not None:
+            progress(num_of_roles=len(steps), num_of_uncovered=step.num_of_uncovered)
 
-    # Sort ua_dict once and create ua_matrix
-    ua_matrix = {
-        f"U{k}": [roles_label_mapping[r] for r in v] for k, v in sorted(ua_dict.items())
-    }
+    result = get_rmp_result(steps, upa.shape)
+    print(f"\tNumber of roles: {result.num_of_roles}")
+    return result
 
-    print(f"\tNumber of roles: {len(pa_matrix.keys())}")
 
-    return pa_matrix, ua_matrix
+def basic_rmp(
+    upa: np.ndarray | PackedUPA | SparseUPA,
+    delta_factor: int = 0,
+    gen_roles_list: np.ndarray | PackedUPA | SparseUPA | None = None,
+    num_of_workers: int = 1,
+    progress: Callable[..., None] | None = None,
+) -> Tuple[Dict, Dict]:
+    # PA and UA as dicts of labels, basic_rmp_result keeps them as arrays
+    return basic_rmp_result(
+        upa, delta_factor, gen_roles_list, num_of_workers, progress
+    ).to_matrices()
 
 
 if __name__ == "__main__":
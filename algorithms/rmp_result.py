@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+
+import numpy as np
+
+from algorithms.role_registry import get_permissions_label
+
+# Number of role labels kept by the label cache of an RMPResult
+LABEL_CACHE_SIZE = 1024
+
+
+class LabelCache:
+    """
+    LRU cache of labels bounded by its number of entries, a maxsize of 0
+    disables it.
+    """
+
+    def __init__(self, maxsize: int = LABEL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._labels: OrderedDict[Hashable, str] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def get(self, key: Hashable, build: Callable[[], str]) -> str:
+        if key in self._labels:
+            self._labels.move_to_end(key)
+            return self._labels[key]
+        label = build()
+        if self.maxsize > 0:
+            self._labels[key] = label
+            if len(self._labels) > self.maxsize:
+                self._labels.popitem(last=False)
+        return label
+
+    def clear(self) -> None:
+        self._labels.clear()
+
+
+class RMPResult:
+    """
+    PA and UA of an RMP run as integer CSR arrays. Role r, named R{r + 1},
+    holds the zero-based permissions pa_indices[pa_indptr[r]:pa_indptr[r + 1]]
+    and user u, named U{u + 1}, the roles ua_indices[ua_indptr[u]:ua_indptr[u + 1]]
+    in the order they were chosen.
+
+    Labels are built only for the rows asked for, the ones of roles are kept
+    in a cache bounded by label_cache_size and cleared with clear_label_cache.
+    """
+
+    def __init__(
+        self,
+        shape: Tuple[int, int],
+        pa_indptr: np.ndarray,
+        pa_indices: np.ndarray,
+        ua_indptr: np.ndarray,
+        ua_indices: np.ndarray,
+        label_cache_size: int = LABEL_CACHE_SIZE,
+    ):
+        self.shape = shape
+        self.pa_indptr = pa_indptr
+        self.pa_indices = pa_indices
+        self.ua_indptr = ua_indptr
+        self.ua_indices = ua_indices
+        self.label_cache = LabelCache(label_cache_size)
+
+    @classmethod
+    def from_choices(
+        cls,
+        shape: Tuple[int, int],
+        choices: Iterable[Tuple[np.ndarray, np.ndarray]],
+        label_cache_size: int = LABEL_CACHE_SIZE,
+    ) -> "RMPResult":
+        # Zero-based permissions and users of every chosen role, in choice order
+        permissions, users = [], []
+        for role_permissions, role_users in choices:
+            permissions.append(np.asarray(role_permissions, dtype=np.int64))
+            users.append(np.asarray(role_users, dtype=np.int64))
+        role_sizes = np.array([len(p) for p in permissions], dtype=np.int64)
+        pa_indptr = np.concatenate(([0], np.cumsum(role_sizes)))
+        pa_indices = np.concatenate([np.zeros(0, np.int64), *permissions])
+
+        # Assignments grouped by user, the roles of a user stay in choice order
+        all_users = np.concatenate([np.zeros(0, np.int64), *users])
+        roles = np.repeat(np.arange(len(users)), [len(u) for u in users])
+        order = np.argsort(all_users, kind="stable")
+        ua_indptr = np.concatenate(
+            ([0], np.cumsum(np.bincount(all_users, minlength=shape[0])))
+        )
+        return cls(
+            shape,
+            pa_indptr,
+            pa_indices,
+            ua_indptr,
+            roles[order].astype(np.int64),
+            label_cache_size,
+        )
+
+    @property
+    def num_of_roles(self) -> int:
+        return len(self.pa_indptr) - 1
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.pa_indptr, self.pa_indices, self.ua_indptr, self.ua_indices)
+        return sum(array.nbytes for array in arrays)
+
+    def __getstate__(self) -> dict:
+        # Labels are not sent to other processes
+        return {**vars(self), "label_cache": LabelCache(self.label_cache.maxsize)}
+
+    def get_role_permissions(self, role: int) -> np.ndarray:
+        return self.pa_indices[self.pa_indptr[role] : self.pa_indptr[role + 1]]
+
+    def get_user_roles(self, user: int) -> np.ndarray:
+        return self.ua_indices[self.ua_indptr[user] : self.ua_indptr[user + 1]]
+
+    def get_role_sizes(self) -> np.ndarray:
+        return np.diff(self.pa_indptr)
+
+    def get_user_sizes(self) -> np.ndarray:
+        return np.diff(self.ua_indptr)
+
+    def get_users(self) -> np.ndarray:
+        # Zero-based users holding at least one role
+        return np.flatnonzero(self.get_user_sizes())
+
+    def get_role_label(self, role: int) -> str:
+        return self.label_cache.get(
+            role,
+            lambda: get_permissions_label(self.get_role_permissions(role).tolist()),
+        )
+
+    def clear_label_cache(self) -> None:
+        self.label_cache.clear()
+
+    def get_pa_rows(self, roles: Iterable[int]) -> List[Dict]:
+        return [
+            {
+                "Role": f"R{r + 1}",
+                "Permissions": self.get_role_label(r).replace(",", ", "),
+            }
+            for r in np.asarray(roles).tolist()
+        ]
+
+    def get_ua_rows(self, users: Iterable[int]) -> List[Dict]:
+        return [
+            {
+                "User": f"U{u + 1}",
+                "Roles": ", ".join(f"R{r + 1}" for r in self.get_user_roles(u)),
+            }
+            for u in np.asarray(users).tolist()
+        ]
+
+    def to_matrices(self) -> Tuple[Dict, Dict]:
+        # pa_matrix and ua_matrix of basic_rmp, labels of every row are built
+        pa_matrix = {
+            f"R{r + 1}": get_permissions_label(
+                self.get_role_permissions(r).tolist()
+            ).split(",")
+            for r in range(self.num_of_roles)
+        }
+        ua_matrix = {
+            f"U{u + 1}": [f"R{r + 1}" for r in self.get_user_roles(u).tolist()]
+            for u in self.get_users().tolist()
+        }
+        return pa_matrix, ua_matrix
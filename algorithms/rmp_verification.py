@@ -0,0 +1,114 @@
+from typing import Iterator, NamedTuple, Tuple
+
+import numpy as np
+
+from algorithms.rmp_result import RMPResult
+from algorithms.role_registry import as_role_words
+from dataset.packed_upa import PackedUPA, get_num_of_words, iter_row_chunks, unpack_rows
+from dataset.sparse_upa import SparseUPA
+
+# Memory of the original, rebuilt and difference words of one chunk of users
+VERIFY_CHUNK_BYTES = 64 * 2**20
+
+
+class RMPVerification(NamedTuple):
+    # Assigned cells that no role of their user grants
+    num_of_missed: int
+    # Cells granted by a role of their user that are not assigned
+    num_of_over_granted: int
+    # Zero-based (user, permission) pairs of these cells, in row-major order
+    missed: np.ndarray
+    over_granted: np.ndarray
+
+    @property
+    def is_exact(self) -> bool:
+        return self.num_of_missed == 0 and self.num_of_over_granted == 0
+
+
+def get_pa_words(result: RMPResult) -> np.ndarray:
+    # Packed rows of the PA matrix, one per role
+    roles = np.repeat(np.arange(result.num_of_roles), result.get_role_sizes())
+    return PackedUPA.from_assignments(
+        roles, result.pa_indices, (result.num_of_roles, result.shape[1])
+    ).words
+
+
+def reconstruct_rows(
+    result: RMPResult, pa_words: np.ndarray, users: slice
+) -> np.ndarray:
+    """
+    Packed rows of UA x PA for a slice of users: the boolean product is the
+    OR of the PA rows of the roles of each user, one reduceat per slice.
+    """
+    start, stop, _ = users.indices(result.shape[0])
+    rows = np.zeros((stop - start, pa_words.shape[1]), dtype=np.uint64)
+    sizes = result.get_user_sizes()[start:stop]
+    holders = np.flatnonzero(sizes)
+    if len(holders):
+        first = result.ua_indptr[start]
+        roles = result.ua_indices[first : result.ua_indptr[stop]]
+        offsets = result.ua_indptr[start:stop][holders] - first
+        rows[holders] = np.bitwise_or.reduceat(pa_words[roles], offsets, axis=0)
+    return rows
+
+
+def reconstruct_upa(result: RMPResult) -> PackedUPA:
+    # UA x PA as a packed UPA
+    rows = reconstruct_rows(result, get_pa_words(result), slice(None))
+    return PackedUPA(rows, result.shape[1])
+
+
+def _get_positions(
+    words: np.ndarray, num_of_permissions: int, start: int
+) -> np.ndarray:
+    # (user, permission) pairs of the set bits, only the rows holding some
+    # are unpacked
+    rows = np.flatnonzero(np.any(words, axis=1))
+    users, permissions = np.nonzero(unpack_rows(words[rows], num_of_permissions))
+    return np.stack([rows[users] + start, permissions], axis=1)
+
+
+def _iter_upa_chunks(
+    upa: np.ndarray | PackedUPA | SparseUPA, max_chunk_bytes: int
+) -> Iterator[Tuple[slice, np.ndarray]]:
+    # Packed words of the UPA one chunk of users at a time
+    row_nbytes = 3 * get_num_of_words(upa.shape[1]) * 8
+    for users in iter_row_chunks(upa.shape[0], row_nbytes, max_chunk_bytes):
+        if isinstance(upa, PackedUPA):
+            yield users, upa.words[users]
+        else:
+            yield users, as_role_words(upa[users]).words
+
+
+def verify_rmp_result(
+    upa: np.ndarray | PackedUPA | SparseUPA,
+    result: RMPResult,
+    max_chunk_bytes: int = VERIFY_CHUNK_BYTES,
+) -> RMPVerification:
+    """
+    Compares UA x PA with the UPA, the product being computed on packed rows
+    one chunk of users at a time. Cells the RMP was allowed to leave
+    uncovered (delta_factor) are the missed ones, a basic RMP result never
+    grants a cell outside the UPA.
+    """
+    if result.shape != upa.shape:
+        raise ValueError(
+            f"RMP result of shape {result.shape} does not match the UPA {upa.shape}"
+        )
+    num_of_permissions = upa.shape[1]
+    pa_words = get_pa_words(result)
+    missed, over_granted = [], []
+    for users, words in _iter_upa_chunks(upa, max_chunk_bytes):
+        rebuilt = reconstruct_rows(result, pa_words, users)
+        missed.append(_get_positions(words & ~rebuilt, num_of_permissions, users.start))
+        over_granted.append(
+            _get_positions(rebuilt & ~words, num_of_permissions, users.start)
+        )
+
+    missed_cells, over_granted_cells = (
+        np.concatenate(missed),
+        np.concatenate(over_granted),
+    )
+    return RMPVerification(
+        len(missed_cells), len(over_granted_cells), missed_cells, over_granted_cells
+    )
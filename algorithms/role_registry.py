@@ -0,0 +1,121 @@
+from typing import Dict, Iterable, Iterator
+
+import numpy as np
+
+from dataset.packed_upa import (
+    PackedUPA,
+    get_num_of_words,
+    get_unique_rows,
+    popcount,
+    unpack_rows,
+)
+from dataset.sparse_upa import SparseUPA
+
+# Memory of the unpacked roles of one chunk in RoleRegistry.iter_labels
+LABEL_CHUNK_BYTES = 16 * 2**20
+
+
+def get_permissions_label(permissions: Iterable[int]) -> str:
+    # Zero-based permissions as a "P1,P5,..." label
+    return ",".join(f"P{p + 1}" for p in permissions)
+
+
+def as_role_words(roles: np.ndarray | PackedUPA | SparseUPA) -> PackedUPA:
+    # Roles as packed rows, whatever their representation
+    if isinstance(roles, PackedUPA):
+        return roles
+    if isinstance(roles, SparseUPA):
+        return PackedUPA.from_assignments(roles.row_ids(), roles.indices, roles.shape)
+    return PackedUPA.from_dense(roles)
+
+
+class RoleRegistry:
+    """
+    Distinct roles interned once: every role is stored as packed words and
+    gets a dense integer ID, its position in the registry. The bytes of its
+    words are the key of a role, so counts and caches of roles are NumPy
+    arrays indexed by ID instead of dicts keyed by dense tuples, and labels
+    are built only for the roles that are shown.
+
+    The key-to-ID dict is built on the first lookup and is not pickled.
+    """
+
+    def __init__(self, num_of_permissions: int, words: np.ndarray | None = None):
+        # The rows of words must be distinct, their IDs are their positions
+        self.num_of_permissions = num_of_permissions
+        if words is None:
+            words = np.zeros((0, get_num_of_words(num_of_permissions)), np.uint64)
+        self.words = words
+        self._ids: Dict[bytes, int] | None = None
+
+    @classmethod
+    def from_roles(cls, roles: np.ndarray | PackedUPA | SparseUPA) -> "RoleRegistry":
+        # IDs follow the first occurrence of every role
+        packed = as_role_words(roles)
+        registry = cls(packed.num_of_permissions)
+        registry.add_rows(packed.words)
+        return registry
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __getstate__(self) -> dict:
+        return {**vars(self), "_ids": None}
+
+    @property
+    def nbytes(self) -> int:
+        return self.words.nbytes
+
+    def _get_ids(self) -> Dict[bytes, int]:
+        if self._ids is None:
+            self._ids = {row.tobytes(): i for i, row in enumerate(self.words)}
+        return self._ids
+
+    def get_ids(self, words: np.ndarray) -> np.ndarray:
+        # ID of every packed row, -1 for the ones not in the registry
+        ids = self._get_ids()
+        return np.fromiter(
+            (ids.get(row.tobytes(), -1) for row in words),
+            dtype=np.intp,
+            count=len(words),
+        )
+
+    def add_rows(self, words: np.ndarray) -> np.ndarray:
+        """
+        Interns the packed rows and returns their IDs, new roles get the next
+        IDs in the order of their first occurrence.
+        """
+        ids = self.get_ids(words)
+        new = np.flatnonzero(ids < 0)
+        if len(new):
+            first, _ = get_unique_rows(words[new])
+            self.words = np.concatenate([self.words, words[new[first]]])
+            self._ids = None
+            ids[new] = self.get_ids(words[new])
+        return ids
+
+    def get_sizes(self) -> np.ndarray:
+        # Number of permissions of every role
+        return popcount(self.words)
+
+    def get_permissions(self, role_id: int) -> np.ndarray:
+        # Zero-based permissions of a role
+        return np.flatnonzero(unpack_rows(self.words[role_id], self.num_of_permissions))
+
+    def get_label(self, role_id: int) -> str:
+        return get_permissions_label(self.get_permissions(role_id).tolist())
+
+    def iter_labels(self) -> Iterator[str]:
+        # Labels of all the roles in ID order, unpacked one chunk at a time
+        chunk_size = max(1, LABEL_CHUNK_BYTES // max(self.num_of_permissions, 1))
+        for start in range(0, len(self), chunk_size):
+            chunk = unpack_rows(
+                self.words[start : start + chunk_size], self.num_of_permissions
+            )
+            _, permissions = np.nonzero(chunk)
+            ends = np.cumsum(np.count_nonzero(chunk, axis=1))
+            for role_permissions in np.split(permissions, ends[:-1]):
+                yield get_permissions_label(role_permissions.tolist())
+
+    def as_upa(self) -> PackedUPA:
+        return PackedUPA(self.words, self.num_of_permissions)
@@ -0,0 +1,323 @@
+from typing import TYPE_CHECKING, Iterator, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from dataset.permission_index import PermissionIndex
+
+WORD_BITS = 64
+
+# Number of set bits for every possible byte value
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def get_num_of_words(num_of_permissions: int) -> int:
+    return -(-num_of_permissions // WORD_BITS)
+
+
+def pack_rows(matrix: np.ndarray) -> np.ndarray:
+    # Bit j of a row is stored in word j // 64 at position j % 64
+    matrix = np.atleast_2d(matrix)
+    num_of_rows, num_of_columns = matrix.shape
+    num_of_words = get_num_of_words(num_of_columns)
+
+    packed_bytes = np.packbits(matrix != 0, axis=1, bitorder="little")
+    padded = np.zeros((num_of_rows, num_of_words * 8), dtype=np.uint8)
+    padded[:, : packed_bytes.shape[1]] = packed_bytes
+
+    return padded.view("<u8").astype(np.uint64, copy=False)
+
+
+def unpack_rows(words: np.ndarray, num_of_columns: int) -> np.ndarray:
+    words = np.atleast_2d(words)
+    as_bytes = np.ascontiguousarray(words, dtype="<u8").view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1, count=num_of_columns, bitorder="little")
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    # Total number of set bits along the last axis (the words of a row)
+    as_bytes = np.ascontiguousarray(words, dtype="<u8").view(np.uint8)
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def get_byte_weights(column_weights: np.ndarray) -> np.ndarray:
+    # Row b holds the summed weight of the columns of byte b for every byte value
+    num_of_bytes = get_num_of_words(len(column_weights)) * 8
+    padded = np.zeros(num_of_bytes * 8, dtype=np.int64)
+    padded[: len(column_weights)] = column_weights
+    byte_bits = np.unpackbits(
+        np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little"
+    )
+    return padded.reshape(num_of_bytes, 8) @ byte_bits.T.astype(np.int64)
+
+
+def weighted_popcount(words: np.ndarray, byte_weights: np.ndarray) -> np.ndarray:
+    # Summed column weights of the set bits along the last axis, byte_weights
+    # comes from get_byte_weights
+    as_bytes = np.ascontiguousarray(words, dtype="<u8").view(np.uint8)
+    positions = np.arange(as_bytes.shape[-1])
+    return byte_weights[positions, as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def iter_row_chunks(
+    num_of_rows: int, row_nbytes: int, max_chunk_bytes: int | None
+) -> Iterator[slice]:
+    # Slices of rows whose temporaries fit in max_chunk_bytes, one slice when
+    # the working set is not bounded
+    chunk_rows = num_of_rows
+    if max_chunk_bytes is not None:
+        chunk_rows = max(1, max_chunk_bytes // max(row_nbytes, 1))
+    for start in range(0, max(num_of_rows, 1), max(chunk_rows, 1)):
+        yield slice(start, start + chunk_rows)
+
+
+def is_subset(rows: np.ndarray, role: np.ndarray) -> np.ndarray:
+    # True for every row that holds all the bits of the role
+    return np.all(np.bitwise_and(rows, role) == role, axis=-1)
+
+
+def as_row_keys(words: np.ndarray) -> np.ndarray:
+    # One fixed-width bytes key per row, comparable and sortable by NumPy
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    return words.view(np.dtype((np.void, words.shape[1] * 8))).ravel()
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, every input bit affects every output bit
+    values = values ^ (values >> np.uint64(30))
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+def get_row_hashes(words: np.ndarray, max_chunk_bytes: int | None = None) -> np.ndarray:
+    # 64-bit hash of every row: each word is mixed with a per-position seed
+    seeds = np.random.default_rng(0x5EED).integers(
+        0, 2**63, size=words.shape[-1], dtype=np.uint64
+    )
+    hashes = np.empty(len(words), dtype=np.uint64)
+    for rows in iter_row_chunks(len(words), words.shape[1] * 16, max_chunk_bytes):
+        hashes[rows] = _mix64(_mix64(words[rows] ^ seeds).sum(axis=-1, dtype=np.uint64))
+    return hashes
+
+
+def get_unique_rows(
+    words: np.ndarray, max_chunk_bytes: int | None = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the distinct rows in bulk, deduplicating on a 64-bit hash of every
+    row and checking that rows sharing a hash are really equal (on a hash
+    collision the rows are compared as whole fixed-width keys instead).
+    Returns the index of the first occurrence of every distinct row, in
+    first-occurrence order, and the number of rows equal to it.
+    Rows are hashed and compared in chunks of at most max_chunk_bytes.
+    """
+    hashes = get_row_hashes(words, max_chunk_bytes)
+
+    # An unstable sort is enough, the first row of a group is its minimum index
+    by_hash = np.argsort(hashes)
+    sorted_hashes = hashes[by_hash]
+    group_starts = np.flatnonzero(
+        np.concatenate(([True], sorted_hashes[1:] != sorted_hashes[:-1]))
+    )
+    first_rows = np.minimum.reduceat(by_hash, group_starts) if len(words) else by_hash
+    counts = np.diff(np.append(group_starts, len(words)))
+
+    groups = np.empty(len(words), dtype=np.intp)
+    groups[by_hash] = np.repeat(np.arange(len(group_starts)), counts)
+    if not all(
+        np.array_equal(words[rows], words[first_rows[groups[rows]]])
+        for rows in iter_row_chunks(len(words), words.shape[1] * 16, max_chunk_bytes)
+    ):
+        _, first_rows, counts = np.unique(
+            as_row_keys(words), return_index=True, return_counts=True
+        )
+
+    order = np.argsort(first_rows)
+    return first_rows[order], counts[order]
+
+
+class PackedUPA:
+    """
+    UPA matrix stored as bitsets, one row of uint64 words per user.
+
+    While RMP runs, the optional `covered` plane marks the cells that are
+    already covered by a chosen role (the cells holding 2 in a dense UPA).
+    Superset queries use the `permission_index` once one is attached.
+
+    With `max_chunk_bytes`, e.g. for words memory-mapped from disk, row scans
+    go through the matrix in chunks whose temporaries fit in that budget.
+    """
+
+    def __init__(
+        self,
+        words: np.ndarray,
+        num_of_permissions: int,
+        covered: np.ndarray | None = None,
+        max_chunk_bytes: int | None = None,
+    ):
+        self.words = words
+        self.num_of_permissions = num_of_permissions
+        self.covered = covered
+        self.max_chunk_bytes = max_chunk_bytes
+        self.permission_index: "PermissionIndex | None" = None
+
+    @classmethod
+    def from_dense(cls, matrix: np.ndarray) -> "PackedUPA":
+        matrix = np.asarray(matrix)
+        covered = None
+        if np.any(matrix == 2):
+            covered = pack_rows(matrix == 2)
+        return cls(pack_rows(matrix), matrix.shape[1], covered)
+
+    @classmethod
+    def from_assignments(
+        cls, users: np.ndarray, permissions: np.ndarray, shape: Tuple[int, int]
+    ) -> "PackedUPA":
+        # users and permissions are zero-based indices of the assigned cells
+        num_of_users, num_of_permissions = shape
+        words = np.zeros(
+            (num_of_users, get_num_of_words(num_of_permissions)), dtype=np.uint64
+        )
+        permissions = np.asarray(permissions, dtype=np.uint64)
+        bits = np.left_shift(np.uint64(1), permissions % np.uint64(WORD_BITS))
+        np.bitwise_or.at(
+            words,
+            (
+                np.asarray(users, dtype=np.intp),
+                (permissions // WORD_BITS).astype(np.intp),
+            ),
+            bits,
+        )
+        return cls(words, num_of_permissions)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.words.shape[0], self.num_of_permissions
+
+    @property
+    def size(self) -> int:
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        covered_nbytes = self.covered.nbytes if self.covered is not None else 0
+        return self.words.nbytes + covered_nbytes
+
+    def __len__(self) -> int:
+        return self.words.shape[0]
+
+    def __getitem__(self, rows) -> "PackedUPA":
+        words = self.words[rows]
+        if words.ndim == 1:
+            raise TypeError("PackedUPA rows must be selected by a slice or a mask")
+        covered = self.covered[rows] if self.covered is not None else None
+        return PackedUPA(words, self.num_of_permissions, covered, self.max_chunk_bytes)
+
+    def copy(self) -> "PackedUPA":
+        covered = self.covered.copy() if self.covered is not None else None
+        upa_copy = PackedUPA(
+            self.words.copy(), self.num_of_permissions, covered, self.max_chunk_bytes
+        )
+        upa_copy.permission_index = self.permission_index
+        return upa_copy
+
+    def to_dense(self) -> np.ndarray:
+        dense = unpack_rows(self.words, self.num_of_permissions).astype(int)
+        if self.covered is not None:
+            dense += unpack_rows(self.covered, self.num_of_permissions)
+        return dense
+
+    def to_dense_window(self, rows: slice, columns: slice) -> np.ndarray:
+        # Dense block of the matrix, only the words of the window are unpacked
+        start, stop, _ = columns.indices(self.num_of_permissions)
+        stop = max(start, stop)
+        first_word, end_word = start // WORD_BITS, get_num_of_words(stop)
+        offset = first_word * WORD_BITS
+
+        def unpack(words: np.ndarray) -> np.ndarray:
+            block = unpack_rows(
+                words[rows, first_word:end_word], (end_word - first_word) * WORD_BITS
+            )
+            return block[:, start - offset : stop - offset].astype(int)
+
+        window = unpack(self.words)
+        if self.covered is not None:
+            window += unpack(self.covered)
+        return window
+
+    def iter_rows(self) -> Iterator[np.ndarray]:
+        return iter(self.words)
+
+    def dense_row(self, row: np.ndarray) -> np.ndarray:
+        return unpack_rows(row, self.num_of_permissions)[0]
+
+    def iter_row_chunks(self) -> Iterator[slice]:
+        # Byte-sized temporaries of popcount and subset tests, per word
+        return iter_row_chunks(len(self), self.words.shape[1] * 8, self.max_chunk_bytes)
+
+    def row_counts(self) -> np.ndarray:
+        return np.concatenate(
+            [popcount(self.words[rows]) for rows in self.iter_row_chunks()]
+        )
+
+    def get_superset_rows(self, role: np.ndarray) -> np.ndarray:
+        # Boolean mask of the rows holding all the bits of the role
+        if self.permission_index is not None:
+            permissions = np.flatnonzero(self.dense_row(role))
+            return self.permission_index.get_superset_rows(permissions)
+        return np.concatenate(
+            [is_subset(self.words[rows], role) for rows in self.iter_row_chunks()]
+        )
+
+    def find_rows(self, role: np.ndarray) -> np.ndarray:
+        # Boolean mask of the rows equal to the role
+        return np.concatenate(
+            [
+                np.all(self.words[rows] == role, axis=1)
+                for rows in self.iter_row_chunks()
+            ]
+        )
+
+    def cover(self, users: np.ndarray, role: np.ndarray) -> "PackedUPA":
+        # Returns a copy where the role cells of the given users are covered
+        covered_upa = self.copy()
+        if covered_upa.covered is None:
+            covered_upa.covered = np.zeros_like(covered_upa.words)
+        covered_upa.covered[users] |= role
+        return covered_upa
+
+    def uncovered_words(self) -> np.ndarray:
+        if self.covered is None:
+            return self.words
+        return np.bitwise_and(self.words, np.invert(self.covered))
+
+    def uncovered_row_counts(self) -> np.ndarray:
+        if self.covered is None:
+            return self.row_counts()
+        return np.concatenate(
+            [
+                popcount(
+                    np.bitwise_and(self.words[rows], np.invert(self.covered[rows]))
+                )
+                for rows in self.iter_row_chunks()
+            ]
+        )
+
+    def count_uncovered(self) -> int:
+        return int(self.uncovered_row_counts().sum())
+
+    def count_cells_sum(self) -> int:
+        # Same as summing a dense UPA, where covered cells hold 2
+        total = int(self.row_counts().sum())
+        if self.covered is not None:
+            total += int(popcount(self.covered).sum())
+        return total
+
+
+def as_packed_upa(upa: np.ndarray | PackedUPA) -> PackedUPA:
+    if isinstance(upa, PackedUPA):
+        return upa
+    return PackedUPA.from_dense(upa)
@@ -0,0 +1,98 @@
+from typing import Tuple
+
+import numpy as np
+
+from dataset.packed_upa import (
+    WORD_BITS,
+    PackedUPA,
+    get_num_of_words,
+    pack_rows,
+    popcount,
+    unpack_rows,
+)
+from dataset.sparse_upa import SparseUPA
+
+# Users unpacked at once while building the index of a PackedUPA
+INDEX_BUILD_ROWS = 64 * WORD_BITS
+
+
+class PermissionIndex:
+    """
+    Inverted index of a UPA matrix: row p of `user_words` is the bitset of the
+    users holding permission p. The users holding a role are the AND of the
+    bitsets of its permissions, so a query reads one bitset per permission of
+    the role instead of the whole matrix.
+    """
+
+    def __init__(self, user_words: np.ndarray, num_of_users: int):
+        self.user_words = user_words
+        self.num_of_users = num_of_users
+
+    @classmethod
+    def from_assignments(
+        cls, users: np.ndarray, permissions: np.ndarray, shape: Tuple[int, int]
+    ) -> "PermissionIndex":
+        # users and permissions are zero-based indices of the assigned cells
+        num_of_users, num_of_permissions = shape
+        transposed = PackedUPA.from_assignments(
+            permissions, users, (num_of_permissions, num_of_users)
+        )
+        return cls(transposed.words, num_of_users)
+
+    @classmethod
+    def from_upa(cls, upa: np.ndarray | PackedUPA | SparseUPA) -> "PermissionIndex":
+        if isinstance(upa, SparseUPA):
+            return cls.from_assignments(upa.row_ids(), upa.indices, upa.shape)
+        if not isinstance(upa, PackedUPA):
+            return cls(pack_rows(np.asarray(upa).T), upa.shape[0])
+
+        # Blocks of whole words of users are transposed one at a time
+        num_of_users, num_of_permissions = upa.shape
+        user_words = np.zeros(
+            (num_of_permissions, get_num_of_words(num_of_users)), dtype=np.uint64
+        )
+        for start in range(0, num_of_users, INDEX_BUILD_ROWS):
+            block = unpack_rows(
+                upa.words[start : start + INDEX_BUILD_ROWS], num_of_permissions
+            )
+            first_word = start // WORD_BITS
+            user_words[:, first_word : first_word + get_num_of_words(len(block))] = (
+                pack_rows(block.T)
+            )
+        return cls(user_words, num_of_users)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.num_of_users, self.user_words.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.user_words.nbytes
+
+    def get_users(self, permissions: np.ndarray) -> np.ndarray:
+        # Bitset of the users holding all the given permissions
+        if len(permissions) == 0:
+            return pack_rows(np.ones(self.num_of_users, dtype=bool))[0]
+        return np.bitwise_and.reduce(self.user_words[permissions], axis=0)
+
+    def get_superset_rows(
+        self, permissions: np.ndarray, rows: slice = slice(None)
+    ) -> np.ndarray:
+        # Boolean mask of the users holding all the given permissions, for the
+        # given range of users only the words covering it are unpacked
+        start, stop, _ = rows.indices(self.num_of_users)
+        stop = max(start, stop)
+        first_word = start // WORD_BITS
+        users = self.get_users(permissions)[first_word : get_num_of_words(stop)]
+        offset = first_word * WORD_BITS
+        return unpack_rows(users, stop - offset)[0, start - offset :].astype(bool)
+
+    def count_superset_rows(self, permissions: np.ndarray) -> int:
+        return int(popcount(self.get_users(permissions)))
+
+
+def with_permission_index(upa: PackedUPA | SparseUPA) -> PackedUPA | SparseUPA:
+    # Builds the index of the UPA once, every later superset query reuses it
+    if upa.permission_index is None:
+        upa.permission_index = PermissionIndex.from_upa(upa)
+    return upa
@@ -0,0 +1,120 @@
+from typing import Tuple
+
+import numpy as np
+
+from dataset.packed_upa import (
+    PackedUPA,
+    as_packed_upa,
+    as_row_keys,
+    iter_row_chunks,
+    pack_rows,
+    unpack_rows,
+)
+from dataset.sparse_upa import SparseUPA
+
+# Memory of the unpacked roles expanded at once by expand_roles
+EXPAND_CHUNK_BYTES = 64 * 2**20
+
+
+def _get_groups(words: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # First occurrence of every distinct row, in first-occurrence order, and
+    # the distinct row of every row
+    _, first_rows, groups = np.unique(
+        as_row_keys(words), return_index=True, return_inverse=True
+    )
+    order = np.argsort(first_rows)
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(len(order))
+    return first_rows[order], ranks[groups.ravel()]
+
+
+class ReducedUPA:
+    """
+    Lossless reduction of a UPA matrix: users with identical rows are merged,
+    then permissions held by identical sets of users. `user_groups` and
+    `permission_groups` give the reduced row and column of every original
+    user and permission, and the weights are the sizes of these groups.
+
+    Reduced rows and columns keep the order of their first original user and
+    permission, so roles mined on the reduced matrix come in the same order
+    as on the original one, and expand back to the same roles.
+    """
+
+    def __init__(
+        self, upa: PackedUPA, user_groups: np.ndarray, permission_groups: np.ndarray
+    ):
+        self.upa = upa
+        self.user_groups = user_groups
+        self.permission_groups = permission_groups
+        self.user_weights = np.bincount(user_groups, minlength=len(upa))
+        self.permission_weights = np.bincount(
+            permission_groups, minlength=upa.num_of_permissions
+        )
+
+    @classmethod
+    def from_upa(cls, upa: np.ndarray | PackedUPA) -> "ReducedUPA":
+        upa = as_packed_upa(upa)
+        first_users, user_groups = _get_groups(upa.words)
+        distinct_rows = unpack_rows(upa.words[first_users], upa.num_of_permissions)
+        first_permissions, permission_groups = _get_groups(pack_rows(distinct_rows.T))
+        reduced_upa = PackedUPA(
+            pack_rows(distinct_rows[:, first_permissions]), len(first_permissions)
+        )
+        return cls(reduced_upa, user_groups, permission_groups)
+
+    @property
+    def original_shape(self) -> Tuple[int, int]:
+        return len(self.user_groups), len(self.permission_groups)
+
+    def expand_role(self, role: np.ndarray) -> np.ndarray:
+        # Dense role over the original permissions
+        return np.asarray(role)[self.permission_groups]
+
+    def expand_roles(self, roles: PackedUPA) -> PackedUPA:
+        num_of_permissions = len(self.permission_groups)
+        words = [
+            pack_rows(
+                unpack_rows(roles.words[rows], roles.num_of_permissions)[
+                    :, self.permission_groups
+                ]
+            )
+            for rows in iter_row_chunks(
+                len(roles), num_of_permissions, EXPAND_CHUNK_BYTES
+            )
+        ]
+        return PackedUPA(np.concatenate(words), num_of_permissions)
+
+    def reduce_roles(self, roles: np.ndarray | PackedUPA) -> PackedUPA | None:
+        """
+        Roles over the reduced permissions, None when a role holds only part
+        of a group of merged permissions and cannot be reduced.
+        """
+        roles = as_packed_upa(roles)
+        _, first_permissions = np.unique(self.permission_groups, return_index=True)
+        dense = unpack_rows(roles.words, roles.num_of_permissions)
+        reduced_roles = PackedUPA(
+            pack_rows(dense[:, first_permissions]), len(first_permissions)
+        )
+        if not np.array_equal(self.expand_roles(reduced_roles).words, roles.words):
+            return None
+        return reduced_roles
+
+    def expand_users(self, rows: np.ndarray) -> np.ndarray:
+        # Original users of the given reduced rows, in ascending order
+        return np.flatnonzero(np.isin(self.user_groups, rows))
+
+
+def reduce_upa(upa: np.ndarray | PackedUPA | SparseUPA) -> ReducedUPA | None:
+    """
+    Reduction of the UPA when it merges some users or permissions, None
+    otherwise. Sparse, out-of-core and partly covered UPAs are not reduced.
+    """
+    if isinstance(upa, SparseUPA) or 0 in upa.shape:
+        return None
+    packed_upa = as_packed_upa(upa)
+    if packed_upa.max_chunk_bytes is not None or packed_upa.covered is not None:
+        return None
+    reduction = ReducedUPA.from_upa(packed_upa)
+    if reduction.upa.shape == packed_upa.shape:
+        return None
+    return reduction
@@ -0,0 +1,239 @@
+from typing import TYPE_CHECKING, Iterator, Tuple
+
+import numpy as np
+
+from dataset.packed_upa import PackedUPA
+
+if TYPE_CHECKING:
+    from dataset.permission_index import PermissionIndex
+
+
+def get_indptr(row_ids: np.ndarray, num_of_rows: int) -> np.ndarray:
+    # row_ids must be sorted, returns the CSR row pointers of these rows
+    indptr = np.zeros(num_of_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row_ids, minlength=num_of_rows), out=indptr[1:])
+    return indptr
+
+
+def gather_slices(
+    indptr: np.ndarray, rows: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gathers the entries of the given compressed rows in a single pass.
+    Returns the positions of the entries and the index into `rows` of each one.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    starts, ends = indptr[rows], indptr[rows + 1]
+    lengths = ends - starts
+    owners = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    positions = np.repeat(starts, lengths) + offsets
+    return positions, owners
+
+
+class SparseUPA:
+    """
+    UPA matrix stored as CSR arrays: the permissions of user i are
+    indices[indptr[i]:indptr[i + 1]], sorted in ascending order.
+    The CSC arrays (users of every permission) are built on first use,
+    unless they are passed in as returned by get_csc().
+
+    While RMP runs, the optional `covered` flags (one per assignment, in CSR
+    order) mark the cells already covered by a chosen role.
+    Superset queries use the `permission_index` once one is attached.
+    """
+
+    def __init__(
+        self,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        num_of_permissions: int,
+        covered: np.ndarray | None = None,
+        csc: Tuple[np.ndarray, np.ndarray, np.ndarray] | None = None,
+    ):
+        self.indptr = indptr
+        self.indices = indices
+        self.num_of_permissions = num_of_permissions
+        self.covered = covered
+        self._csc = csc
+        self.permission_index: "PermissionIndex | None" = None
+
+    @classmethod
+    def from_assignments(
+        cls, users: np.ndarray, permissions: np.ndarray, shape: Tuple[int, int]
+    ) -> "SparseUPA":
+        # users and permissions are zero-based indices of the assigned cells
+        num_of_users, num_of_permissions = shape
+        cells = np.unique(
+            np.asarray(users, dtype=np.int64) * num_of_permissions
+            + np.asarray(permissions, dtype=np.int64)
+        )
+        row_ids, indices = np.divmod(cells, num_of_permissions)
+        return cls(get_indptr(row_ids, num_of_users), indices, num_of_permissions)
+
+    @classmethod
+    def from_dense(cls, matrix: np.ndarray) -> "SparseUPA":
+        matrix = np.asarray(matrix)
+        row_ids, indices = np.nonzero(matrix)
+        covered = None
+        if np.any(matrix == 2):
+            covered = matrix[row_ids, indices] == 2
+        return cls(
+            get_indptr(row_ids, matrix.shape[0]),
+            indices.astype(np.int64),
+            matrix.shape[1],
+            covered,
+        )
+
+    @classmethod
+    def from_rows(cls, rows: list[np.ndarray], num_of_permissions: int) -> "SparseUPA":
+        lengths = np.array([len(r) for r in rows], dtype=np.int64)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        return cls(indptr, indices.astype(np.int64), num_of_permissions)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.indptr) - 1, self.num_of_permissions
+
+    @property
+    def size(self) -> int:
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    @property
+    def nbytes(self) -> int:
+        covered_nbytes = self.covered.nbytes if self.covered is not None else 0
+        return self.indptr.nbytes + self.indices.nbytes + covered_nbytes
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, rows) -> "SparseUPA":
+        rows = np.arange(self.shape[0])[rows]
+        if np.ndim(rows) == 0:
+            raise TypeError("SparseUPA rows must be selected by a slice or a mask")
+        positions, owners = gather_slices(self.indptr, rows)
+        covered = self.covered[positions] if self.covered is not None else None
+        return SparseUPA(
+            get_indptr(owners, len(rows)),
+            self.indices[positions],
+            self.num_of_permissions,
+            covered,
+        )
+
+    def copy(self) -> "SparseUPA":
+        covered = self.covered.copy() if self.covered is not None else None
+        upa_copy = SparseUPA(
+            self.indptr.copy(), self.indices.copy(), self.num_of_permissions, covered
+        )
+        upa_copy.permission_index = self.permission_index
+        return upa_copy
+
+    def row(self, i: int) -> np.ndarray:
+        return self.indices[self.indptr[i] : self.indptr[i + 1]]
+
+    def iter_rows(self) -> Iterator[np.ndarray]:
+        for i in range(self.shape[0]):
+            yield self.row(i)
+
+    def dense_row(self, row: np.ndarray) -> np.ndarray:
+        dense = np.zeros(self.num_of_permissions, dtype=np.uint8)
+        dense[row] = 1
+        return dense
+
+    def row_ids(self) -> np.ndarray:
+        # The row (user) of every assignment, in CSR order
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    def row_counts(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.shape, dtype=int)
+        dense[self.row_ids(), self.indices] = 1
+        if self.covered is not None:
+            dense[self.row_ids()[self.covered], self.indices[self.covered]] = 2
+        return dense
+
+    def get_csc(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns (col_indptr, col_row_ids, col_positions): the users holding
+        permission p are col_row_ids[col_indptr[p]:col_indptr[p + 1]], and
+        col_positions maps these entries back to their CSR positions.
+        """
+        if self._csc is None:
+            col_positions = np.argsort(self.indices, kind="stable")
+            self._csc = (
+                get_indptr(self.indices[col_positions], self.num_of_permissions),
+                self.row_ids()[col_positions],
+                col_positions,
+            )
+        return self._csc
+
+    def gather_columns(self, permissions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Users and CSR positions of every assignment of the given permissions
+        col_indptr, col_row_ids, col_positions = self.get_csc()
+        positions, _ = gather_slices(col_indptr, permissions)
+        return col_row_ids[positions], col_positions[positions]
+
+    def get_superset_rows(self, permissions: np.ndarray) -> np.ndarray:
+        # Boolean mask of the rows holding all the given permissions
+        if self.permission_index is not None:
+            return self.permission_index.get_superset_rows(permissions)
+        rows, _ = self.gather_columns(permissions)
+        return np.bincount(rows, minlength=self.shape[0]) == len(permissions)
+
+    def find_rows(self, permissions: np.ndarray) -> np.ndarray:
+        # Boolean mask of the rows equal to the given permissions
+        mask = self.row_counts() == len(permissions)
+        for i in np.flatnonzero(mask):
+            mask[i] = np.array_equal(self.row(i), permissions)
+        return mask
+
+    def cover(self, users: np.ndarray, permissions: np.ndarray) -> "SparseUPA":
+        # Returns a copy where the given permissions of the given users are covered
+        rows, positions = self.gather_columns(permissions)
+        selected = np.zeros(self.shape[0], dtype=bool)
+        selected[users] = True
+
+        covered_upa = SparseUPA(self.indptr, self.indices, self.num_of_permissions)
+        covered_upa._csc = self._csc
+        covered_upa.permission_index = self.permission_index
+        covered_upa.covered = (
+            self.covered.copy()
+            if self.covered is not None
+            else np.zeros(self.nnz, dtype=bool)
+        )
+        covered_upa.covered[positions[selected[rows]]] = True
+        return covered_upa
+
+    def uncovered_row_counts(self) -> np.ndarray:
+        if self.covered is None:
+            return self.row_counts()
+        return np.bincount(self.row_ids()[~self.covered], minlength=self.shape[0])
+
+    def count_uncovered(self) -> int:
+        if self.covered is None:
+            return self.nnz
+        return int(np.count_nonzero(~self.covered))
+
+    def count_cells_sum(self) -> int:
+        # Same as summing a dense UPA, where covered cells hold 2
+        if self.covered is None:
+            return self.nnz
+        return self.nnz + int(np.count_nonzero(self.covered))
+
+
+def as_sparse_upa(upa: np.ndarray | PackedUPA | SparseUPA) -> SparseUPA:
+    if isinstance(upa, SparseUPA):
+        return upa
+    if isinstance(upa, PackedUPA):
+        upa = upa.to_dense()
+    return SparseUPA.from_dense(upa)
@@ -0,0 +1,217 @@
+import configparser
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from dataset.packed_upa import WORD_BITS, PackedUPA, get_num_of_words
+from dataset.sparse_upa import SparseUPA
+from dataset.upa_matrix import (
+    ONE2ONE_CHUNK_LINES,
+    get_one2one_shape,
+    iter_one2one_assignments,
+    load_sparse_upa_from_one2one_file,
+)
+
+config = configparser.ConfigParser()
+config.read("config.ini")
+
+CACHE_DIR = config.get("cache", "directory", fallback="dataset/.upa_cache")
+# Working set of the row chunks of an out-of-core UPA
+WORKING_SET_BYTES = (
+    config.getint("out_of_core", "working_set_megabytes", fallback=256) * 2**20
+)
+CACHE_FORMAT_VERSION = 1
+
+# Arrays stored for every kind of cached UPA
+CACHE_ARRAYS = {"packed": ("words",), "sparse": ("indptr", "indices")}
+
+
+def get_file_sha256(filename: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def get_cache_paths(filename: str, kind: str, cache_dir: str) -> dict[str, str]:
+    # The source path is part of the name so equal file names do not collide
+    source = os.path.abspath(filename)
+    name = os.path.splitext(os.path.basename(source))[0]
+    prefix = os.path.join(
+        cache_dir, f"{name}-{hashlib.sha1(source.encode()).hexdigest()[:8]}.{kind}"
+    )
+    paths = {array: f"{prefix}.{array}.npy" for array in CACHE_ARRAYS[kind]}
+    paths["header"] = f"{prefix}.json"
+    return paths
+
+
+def _read_header(path: str) -> dict | None:
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomically(path: str, write) -> None:
+    # Readers in other processes never see a partially written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        write(file)
+    os.replace(tmp_path, path)
+
+
+def _write_header(path: str, header: dict) -> None:
+    _write_atomically(path, lambda file: file.write(json.dumps(header).encode()))
+
+
+def _is_header_valid(
+    header: dict | None, filename: str, kind: str, stat: os.stat_result
+) -> bool:
+    if (
+        header is None
+        or header.get("version") != CACHE_FORMAT_VERSION
+        or header.get("kind") != kind
+    ):
+        return False
+
+    if stat.st_size != header["source_size"]:
+        return False
+    if stat.st_mtime_ns == header["source_mtime_ns"]:
+        return True
+
+    # Touched but maybe not changed: the content hash decides
+    return get_file_sha256(filename) == header["source_sha256"]
+
+
+def stream_packed_upa_to_file(
+    filename: str, path: str, chunk_lines: int = ONE2ONE_CHUNK_LINES
+) -> tuple[int, int]:
+    """
+    Builds the packed words of a one2one file directly in a memory-mapped .npy
+    file, reading the file twice in chunks of lines: first for the shape,
+    then to set the bits. Only one chunk is held in memory. Returns the shape.
+    """
+    shape = get_one2one_shape(filename, chunk_lines)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    words = np.lib.format.open_memmap(
+        tmp_path,
+        mode="w+",
+        dtype=np.uint64,
+        shape=(shape[0], get_num_of_words(shape[1])),
+    )
+    for users, permissions in iter_one2one_assignments(filename, chunk_lines):
+        permissions = permissions.astype(np.uint64)
+        bits = np.left_shift(np.uint64(1), permissions % np.uint64(WORD_BITS))
+        np.bitwise_or.at(
+            words, (users, (permissions // WORD_BITS).astype(np.intp)), bits
+        )
+    words.flush()
+    del words
+    os.replace(tmp_path, path)
+    return shape
+
+
+def build_upa_cache(
+    filename: str, kind: str = "packed", cache_dir: str = CACHE_DIR
+) -> None:
+    stat = os.stat(filename)
+    os.makedirs(cache_dir, exist_ok=True)
+    paths = get_cache_paths(filename, kind, cache_dir)
+
+    if kind == "packed":
+        # Streamed to disk, so files larger than memory can be cached
+        shape = stream_packed_upa_to_file(filename, paths["words"])
+    else:
+        upa = load_sparse_upa_from_one2one_file(filename)
+        shape = upa.shape
+        for array in CACHE_ARRAYS[kind]:
+            _write_atomically(
+                paths[array],
+                lambda file, values=getattr(upa, array): np.save(file, values),
+            )
+
+    # The header is written last, it marks the arrays as complete
+    header = {
+        "version": CACHE_FORMAT_VERSION,
+        "kind": kind,
+        "shape": list(shape),
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "source_sha256": get_file_sha256(filename),
+    }
+    _write_header(paths["header"], header)
+
+
+def _load_array(path: str) -> np.ndarray:
+    # Memory-mapped read only, so processes loading the same dataset share pages
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # Empty arrays cannot be mapped
+        return np.load(path)
+
+
+def _get_valid_header(filename: str, kind: str, cache_dir: str) -> dict:
+    # Returns the header of an up-to-date cache, building the cache if needed
+    if kind not in CACHE_ARRAYS:
+        raise ValueError(f"Unknown UPA cache kind: {kind}")
+
+    header_path = get_cache_paths(filename, kind, cache_dir)["header"]
+    stat = os.stat(filename)
+    header = _read_header(header_path)
+    if header is None or not _is_header_valid(header, filename, kind, stat):
+        build_upa_cache(filename, kind, cache_dir)
+        header = _read_header(header_path)
+        assert header is not None
+    elif stat.st_mtime_ns != header["source_mtime_ns"]:
+        # Same content with a new mtime, skip hashing on the next load
+        header["source_mtime_ns"] = stat.st_mtime_ns
+        _write_header(header_path, header)
+
+    return header
+
+
+def get_source_hash(
+    filename: str, kind: str = "packed", cache_dir: str = CACHE_DIR
+) -> str:
+    # Content hash of the source file, without re-reading it while unchanged
+    return _get_valid_header(filename, kind, cache_dir)["source_sha256"]
+
+
+def load_cached_upa(
+    filename: str, kind: str = "packed", cache_dir: str = CACHE_DIR
+) -> PackedUPA | SparseUPA:
+    """
+    Loads a one2one file through its compiled binary cache, rebuilding the
+    cache when the source size, mtime and content hash no longer match.
+    """
+    header = _get_valid_header(filename, kind, cache_dir)
+    paths = get_cache_paths(filename, kind, cache_dir)
+
+    num_of_permissions = header["shape"][1]
+    if kind == "packed":
+        return PackedUPA(_load_array(paths["words"]), num_of_permissions)
+    return SparseUPA(
+        _load_array(paths["indptr"]), _load_array(paths["indices"]), num_of_permissions
+    )
+
+
+def load_out_of_core_upa(
+    filename: str,
+    working_set_bytes: int = WORKING_SET_BYTES,
+    cache_dir: str = CACHE_DIR,
+) -> PackedUPA:
+    """
+    Loads a one2one file as packed words memory-mapped from the binary cache,
+    the cache being built without loading the file in memory. Row scans of
+    the returned UPA (and of the RMP coverage built on it) go in chunks whose
+    temporaries fit in working_set_bytes.
+    """
+    upa = load_cached_upa(filename, "packed", cache_dir)
+    assert isinstance(upa, PackedUPA)
+    upa.max_chunk_bytes = working_set_bytes
+    return upa
@@ -0,0 +1,113 @@
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+from dataset.packed_upa import PackedUPA, unpack_rows
+from dataset.sparse_upa import SparseUPA
+
+
+class UPAComponent(NamedTuple):
+    # Zero-based original users and permissions of the component, ascending
+    users: np.ndarray
+    permissions: np.ndarray
+    # Assignments of the component, in its own user and permission order
+    upa: PackedUPA | SparseUPA
+
+
+def get_assignments(upa: PackedUPA | SparseUPA) -> Tuple[np.ndarray, np.ndarray]:
+    # Zero-based users and permissions of every assigned cell
+    if isinstance(upa, SparseUPA):
+        return upa.row_ids(), upa.indices
+    users, permissions = [], []
+    for rows in upa.iter_row_chunks():
+        chunk_users, chunk_permissions = np.nonzero(
+            unpack_rows(upa.words[rows], upa.num_of_permissions)
+        )
+        users.append(chunk_users + rows.start)
+        permissions.append(chunk_permissions)
+    return np.concatenate(users), np.concatenate(permissions)
+
+
+def _find_roots(parent: np.ndarray) -> np.ndarray:
+    # Pointer jumping until every node points to the root of its tree
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent = grandparent
+
+
+def get_component_roots(
+    users: np.ndarray, permissions: np.ndarray, shape: Tuple[int, int]
+) -> np.ndarray:
+    """
+    Vectorized union-find over the user-permission graph: users are the nodes
+    0 to m - 1 and permissions the nodes m to m + n - 1. Every round hooks
+    the larger root of each assignment under the smaller one, then compresses
+    all the paths, until both ends of every assignment share a root.
+    The root of a component is its smallest node, i.e. its first user.
+    """
+    num_of_users, num_of_permissions = shape
+    parent = np.arange(num_of_users + num_of_permissions)
+    user_nodes, permission_nodes = users, permissions + num_of_users
+    while True:
+        user_roots, permission_roots = parent[user_nodes], parent[permission_nodes]
+        if np.array_equal(user_roots, permission_roots):
+            return parent
+        np.minimum.at(
+            parent,
+            np.maximum(user_roots, permission_roots),
+            np.minimum(user_roots, permission_roots),
+        )
+        parent = _find_roots(parent)
+
+
+def _pack_components(groups: List[np.ndarray], max_parts: int) -> List[np.ndarray]:
+    # Largest components first, each one into the part with fewest cells so far
+    loads = np.zeros(max_parts, dtype=np.int64)
+    parts: List[List[np.ndarray]] = [[] for _ in range(max_parts)]
+    for k in sorted(range(len(groups)), key=lambda k: -len(groups[k])):
+        part = int(np.argmin(loads))
+        parts[part].append(groups[k])
+        loads[part] += len(groups[k])
+    return [np.concatenate(part) for part in parts if part]
+
+
+def split_upa(
+    upa: PackedUPA | SparseUPA, max_parts: int | None = None
+) -> List[UPAComponent]:
+    """
+    Connected components of the UPA holding at least one assignment, in the
+    order of their first user. Users and permissions without assignments
+    belong to no component. With max_parts, small components are packed
+    together so that there are at most max_parts parts of balanced sizes,
+    a part is still a union of whole components.
+    """
+    users, permissions = get_assignments(upa)
+    roots = get_component_roots(users, permissions, upa.shape)
+
+    # Assignments grouped by component
+    assignment_roots = roots[users]
+    order = np.argsort(assignment_roots, kind="stable")
+    _, starts = np.unique(assignment_roots[order], return_index=True)
+    groups = np.split(order, starts[1:])
+    if max_parts is not None and len(groups) > max_parts:
+        groups = _pack_components(groups, max_parts)
+        groups.sort(key=lambda cells: users[cells].min())
+
+    upa_type = SparseUPA if isinstance(upa, SparseUPA) else PackedUPA
+    components = []
+    for cells in groups:
+        component_users = np.unique(users[cells])
+        component_permissions = np.unique(permissions[cells])
+        shape = (len(component_users), len(component_permissions))
+        local_users = np.searchsorted(component_users, users[cells])
+        local_permissions = np.searchsorted(component_permissions, permissions[cells])
+        components.append(
+            UPAComponent(
+                component_users,
+                component_permissions,
+                upa_type.from_assignments(local_users, local_permissions, shape),
+            )
+        )
+    return components
@@ -1,44 +1,99 @@
 import configparser
 import random
-import re
 import time
+import warnings
+from itertools import islice
+from typing import Iterator, Tuple
 
 import numpy as np
 
+from dataset.packed_upa import PackedUPA
+from dataset.sparse_upa import SparseUPA
+
 config = configparser.ConfigParser()
 config.read("config.ini")
 
 MIN_PERMISSIONS_PER_ROLE = config.getint("permissions", "min_per_role")
 
+# Lines parsed at once when a one2one file is streamed
+ONE2ONE_CHUNK_LINES = 1_000_000
 
-def load_upa_from_one2one_file(filename: str) -> np.ndarray:
-    # Using a set to hold unique user and permission numbers for calculating the size of the matrix
-    user_set, permission_set = set(), set()
 
-    with open(filename, "r") as file:
-        for line in file:
-            user_num, permission_num = map(
-                int, re.sub(r"\s+", " ", line.strip()).split(" ")
-            )
-            user_set.add(user_num)
-            permission_set.add(permission_num)
-    if not user_set or not permission_set:
-        return np.zeros((0, 0), dtype=int)
-    num_of_users = max(user_set)
-    num_of_permissions = max(permission_set)
+def _parse_one2one(source, filename: str) -> Tuple[np.ndarray, np.ndarray]:
+    # source is a file name or a list of lines, both are parsed by np.loadtxt
+    with warnings.catch_warnings():
+        # An empty file is a valid empty dataset
+        warnings.filterwarnings("ignore", message=".*input contained no data")
+        assignments = np.loadtxt(source, dtype=np.int64, ndmin=2)
+
+    if assignments.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    if assignments.shape[1] != 2:
+        raise ValueError(f"{filename}: expected '<user> <permission>' lines")
+
+    return assignments[:, 0] - 1, assignments[:, 1] - 1
 
-    upa_matrix = np.zeros((num_of_users, num_of_permissions), dtype=int)
 
+def read_one2one_assignments(filename: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parses a one2one file ("<user> <permission>" per line, 1-based) in a single
+    bulk pass and returns the zero-based user and permission index arrays.
+    """
+    return _parse_one2one(filename, filename)
+
+
+def iter_one2one_assignments(
+    filename: str, chunk_lines: int = ONE2ONE_CHUNK_LINES
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # Streams a one2one file as zero-based arrays of at most chunk_lines
+    # assignments, the whole file is never held in memory
     with open(filename, "r") as file:
-        for line in file:
-            user_num, permission_num = map(
-                int, re.sub(r"\s+", " ", line.strip()).split(" ")
-            )
-            upa_matrix[user_num - 1][permission_num - 1] = 1
+        while lines := list(islice(file, chunk_lines)):
+            yield _parse_one2one(lines, filename)
+
+
+def get_one2one_shape(
+    filename: str, chunk_lines: int = ONE2ONE_CHUNK_LINES
+) -> Tuple[int, int]:
+    # Shape of the UPA of a one2one file, computed in a streaming pass
+    num_of_users = num_of_permissions = 0
+    for users, permissions in iter_one2one_assignments(filename, chunk_lines):
+        if users.size:
+            num_of_users = max(num_of_users, int(users.max()) + 1)
+            num_of_permissions = max(num_of_permissions, int(permissions.max()) + 1)
+    return num_of_users, num_of_permissions
+
+
+def load_upa_from_one2one_file(filename: str) -> np.ndarray:
+    users, permissions = read_one2one_assignments(filename)
+    if users.size == 0:
+        return np.zeros((0, 0), dtype=int)
+
+    # The matrix size is given by the largest user and permission numbers
+    upa_matrix = np.zeros((users.max() + 1, permissions.max() + 1), dtype=int)
+    upa_matrix[users, permissions] = 1
 
     return upa_matrix
 
 
+def load_packed_upa_from_one2one_file(filename: str) -> PackedUPA:
+    users, permissions = read_one2one_assignments(filename)
+    if users.size == 0:
+        return PackedUPA(np.zeros((0, 0), dtype=np.uint64), 0)
+
+    shape = (int(users.max()) + 1, int(permissions.max()) + 1)
+    return PackedUPA.from_assignments(users, permissions, shape)
+
+
+def load_sparse_upa_from_one2one_file(filename: str) -> SparseUPA:
+    users, permissions = read_one2one_assignments(filename)
+    if users.size == 0:
+        return SparseUPA(np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64), 0)
+
+    shape = (int(users.max()) + 1, int(permissions.max()) + 1)
+    return SparseUPA.from_assignments(users, permissions, shape)
+
+
 def generate_upa_matrix(
     *,
     num_of_roles: int,
@@ -1,12 +1,28 @@
+import configparser
 import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterator
 
 import dash
 import numpy as np
-from dash import Dash, Input, Output, State, callback_context
-
-from algorithms.fast_miner import get_fast_miner_result_with_metadata
-from algorithms.rmp import basic_rmp
-from dataset import upa_matrix
+from dash import Dash, Input, Output, Patch, State, callback_context
+
+from algorithms.fast_miner import (
+    get_fast_miner_result,
+    get_fast_miner_result_with_metadata,
+)
+from algorithms.rmp import basic_rmp_result, get_rmp_result, iter_basic_rmp
+from algorithms.rmp_result import RMPResult
+from algorithms.rmp_verification import RMPVerification, verify_rmp_result
+from dataset import upa_cache
+from dataset.packed_upa import PackedUPA
+from dataset.permission_index import with_permission_index
+from interface.candidate_store import CandidateStore
+from interface.jobs import JobManager
+from interface.result_cache import ResultCache
+
+config = configparser.ConfigParser()
+config.read("config.ini")
 
 DATASET_MAPPING = {
     "simple_dataset": "dataset/test_datasets/simple_dataset.txt",
@@ -23,13 +39,343 @@ DATASET_MAPPING = {
 }
 
 
-def get_data(dataset: str) -> np.ndarray:
+# Worker processes scoring candidate roles, 1 keeps the mining serial
+NUM_OF_WORKERS = config.getint("parallel", "workers", fallback=1)
+
+# Loaded datasets and mining results shared by all the callbacks
+RESULT_CACHE = ResultCache(
+    max_bytes=config.getint("result_cache", "max_megabytes", fallback=512) * 2**20
+)
+
+# Mining runs that are not cached yet go to background job processes
+JOBS = JobManager()
+
+PAGE_SIZE = 20
+
+# Page count, page, sort and filter of an empty FastMiner table
+EMPTY_FM_PAGES = (0, 0, [], "")
+
+PA_COLUMNS = [
+    {"name": "Role", "id": "Role"},
+    {"name": "Permissions", "id": "Permissions"},
+]
+UA_COLUMNS = [
+    {"name": "User", "id": "User"},
+    {"name": "Roles", "id": "Roles"},
+]
+
+# Permission columns of the UPA table sent at once
+UPA_WINDOW_COLUMNS = 50
+
+
+def get_cache_key(dataset: str, algorithm: str, *parameters) -> tuple:
+    # The content hash makes entries of a changed dataset file unreachable
+    source_hash = upa_cache.get_source_hash(DATASET_MAPPING[dataset])
+    return dataset, source_hash, algorithm, parameters
+
+
+def get_data(dataset: str) -> np.ndarray | PackedUPA:
     data = np.array([])  # Default to an empty array if no dataset is selected
     if dataset in DATASET_MAPPING:
-        data = upa_matrix.load_upa_from_one2one_file(DATASET_MAPPING[dataset])
+        # Memory-mapped from the binary cache, the text file is parsed only
+        # when it changes. The permission index is built once with it.
+        data = RESULT_CACHE.get_or_compute(
+            get_cache_key(dataset, "upa"),
+            lambda: with_permission_index(
+                upa_cache.load_cached_upa(DATASET_MAPPING[dataset])
+            ),
+        )
     return data
 
 
+def compute_fast_miner_metadata(
+    dataset: str, progress: Callable[..., None] | None = None
+) -> tuple:
+    return get_fast_miner_result_with_metadata(
+        get_data(dataset), NUM_OF_WORKERS, progress
+    )
+
+
+def get_fast_miner_metadata(dataset: str) -> tuple:
+    return RESULT_CACHE.get_or_compute(
+        get_cache_key(dataset, "fast_miner_metadata"),
+        lambda: compute_fast_miner_metadata(dataset),
+    )
+
+
+def get_cached_candidate_store(dataset: str) -> CandidateStore | None:
+    # Server side rows of the FastMiner table, None until FastMiner has run
+    metadata = RESULT_CACHE.get(get_cache_key(dataset, "fast_miner_metadata"))
+    if metadata is None:
+        return None
+    return RESULT_CACHE.get_or_compute(
+        get_cache_key(dataset, "fast_miner_store"),
+        lambda: CandidateStore.from_fm_result(metadata[0]),
+    )
+
+
+def get_cached_fast_miner_candidates(
+    dataset: str,
+) -> np.ndarray | PackedUPA | None:
+    # Candidates found by an earlier RMP job or FastMiner run, None until
+    # FastMiner has run on the dataset
+    candidates = RESULT_CACHE.get(get_cache_key(dataset, "fast_miner_candidates"))
+    if candidates is None:
+        metadata = RESULT_CACHE.get(get_cache_key(dataset, "fast_miner_metadata"))
+        if metadata is not None:
+            candidates = metadata[0].roles.as_upa()
+    return candidates
+
+
+def compute_basic_rmp_result(
+    dataset: str,
+    delta_factor: int,
+    gen_roles_list=None,
+    progress: Callable[..., None] | None = None,
+) -> tuple:
+    # FastMiner runs first when its candidates are not given
+    start_time = time.time()
+    result = basic_rmp_result(
+        get_data(dataset), delta_factor, gen_roles_list, NUM_OF_WORKERS, progress
+    )
+    return result, time.time() - start_time
+
+
+def run_fast_miner_job(report: Callable[..., None], dataset: str) -> tuple:
+    return compute_fast_miner_metadata(dataset, report)
+
+
+def run_basic_rmp_job(
+    report: Callable[..., None], dataset: str, delta_factor: int, gen_roles_list
+) -> Iterator[tuple]:
+    """
+    Streams the rows of every chosen role: its PA row, then (index, row, new)
+    for the UA rows it changes, new rows being appended in role order. Returns
+    the same result as compute_basic_rmp_result and the FastMiner candidates,
+    which the next delta factors reuse.
+    """
+    start_time = time.time()
+    data = get_data(dataset)
+    if gen_roles_list is None:
+        report(stage="fast_miner")
+        gen_roles_list = get_fast_miner_result(data, NUM_OF_WORKERS)
+
+    steps = []
+    # Row of every user in the streamed UA table, and its roles
+    ua_rows: Dict[int, int] = {}
+    ua_roles: Dict[int, list] = defaultdict(list)
+    for step in iter_basic_rmp(data, delta_factor, gen_roles_list, NUM_OF_WORKERS):
+        steps.append(step)
+        report(num_of_roles=len(steps), num_of_uncovered=step.num_of_uncovered)
+
+        ua_updates = []
+        for user in step.users:
+            is_new = user not in ua_rows
+            ua_rows.setdefault(user, len(ua_rows))
+            ua_roles[user].append(step.role_name)
+            row = {"User": f"U{user}", "Roles": ", ".join(ua_roles[user])}
+            ua_updates.append((ua_rows[user], row, is_new))
+        pa_row = {
+            "Role": step.role_name,
+            "Permissions": step.role_label.replace(",", ", "),
+        }
+        yield pa_row, ua_updates
+
+    calc_time = time.time() - start_time
+    return (get_rmp_result(steps, data.shape), calc_time), gen_roles_list
+
+
+def get_fm_progress_message(progress: dict) -> str:
+    stage = progress.get("stage")
+    if stage == "candidates":
+        return f"Generating candidates of {progress['num_of_init_roles']} roles..."
+    if stage == "supports":
+        return f"Counting the users of {progress['num_of_candidates']} candidates..."
+    return "Finding the distinct users..."
+
+
+def get_rmp_verification(
+    dataset: str, delta_factor: int, result: RMPResult
+) -> RMPVerification:
+    # UA x PA checked against the UPA once per RMP result
+    return RESULT_CACHE.get_or_compute(
+        get_cache_key(dataset, "rmp_verification", delta_factor),
+        lambda: verify_rmp_result(get_data(dataset), result),
+    )
+
+
+def get_rmp_summary(
+    dataset: str, delta_factor: int, result: RMPResult, calc_time: float
+) -> str:
+    verification = get_rmp_verification(dataset, delta_factor, result)
+    if verification.is_exact:
+        reconstruction = "exact reconstruction"
+    else:
+        reconstruction = (
+            f"{verification.num_of_missed} missed, "
+            f"{verification.num_of_over_granted} over-granted assignments"
+        )
+    return f"RMP Calculation Time: {calc_time:.2f} seconds ({reconstruction})"
+
+
+def get_rmp_progress_message(progress: dict) -> str:
+    if "num_of_roles" in progress:
+        return (
+            f"{progress['num_of_roles']} roles chosen, "
+            f"{progress['num_of_uncovered']} assignments left to cover..."
+        )
+    if progress.get("stage") == "fast_miner":
+        return "Running FastMiner..."
+    return "Starting RMP..."
+
+
+FM_COLUMNS = [
+    {"name": "Label", "id": "label"},
+    {"name": "Original Count", "id": "original_count"},
+    {"name": "Total Count", "id": "total_count"},
+]
+
+
+def get_fm_table(
+    store: CandidateStore,
+    page: int = 0,
+    sort_by: list | None = None,
+    filter_query: str | None = None,
+) -> tuple:
+    """
+    Columns, rows of one page and page count of the FastMiner table. Sorting
+    and filtering are done by the store, the table only gets the page.
+    """
+    rows, num_of_rows = store.get_page(page, PAGE_SIZE, sort_by, filter_query)
+    fm_columns = FM_COLUMNS if len(store) else []
+    return fm_columns, rows, -(-num_of_rows // PAGE_SIZE)
+
+
+def get_upa_window(data: PackedUPA, page: int, column_start: int) -> tuple:
+    """
+    Columns and rows of one page of the UPA table, limited to a window of
+    UPA_WINDOW_COLUMNS permissions. Column ids are p_<permission number>.
+    """
+    row_start = page * PAGE_SIZE
+    column_end = min(column_start + UPA_WINDOW_COLUMNS, data.shape[1])
+    window = data.to_dense_window(
+        slice(row_start, row_start + PAGE_SIZE), slice(column_start, column_end)
+    )
+    column_ids = [f"p_{j + 1}" for j in range(column_start, column_end)]
+
+    columns = [{"name": "U/P", "id": "p_0"}]
+    columns.extend(
+        {"name": f"P{j + 1}", "id": f"p_{j + 1}"}
+        for j in range(column_start, column_end)
+    )
+    data_list = [
+        {"p_0": f"U{row_start + index + 1}", **dict(zip(column_ids, row))}
+        for index, row in enumerate(window.tolist())
+    ]
+    return columns, data_list
+
+
+def get_role_styles(
+    data: PackedUPA, permissions: list, page: int, column_start: int
+) -> list:
+    """
+    Highlights the role cells of the users holding the role, for the visible
+    page and permission window only. The users come from the permission index,
+    and a single rule covers all their cells since every holder has them all.
+    """
+    row_start = page * PAGE_SIZE
+    holders = data.permission_index.get_superset_rows(
+        permissions, slice(row_start, row_start + PAGE_SIZE)
+    )
+    column_end = column_start + UPA_WINDOW_COLUMNS
+    columns = [f"p_{p + 1}" for p in permissions if column_start <= p < column_end]
+    if not np.any(holders) or not columns:
+        return []
+    return [
+        {
+            "if": {
+                "row_index": np.flatnonzero(holders).tolist(),
+                "column_id": columns,
+            },
+            "backgroundColor": "#FFDDC1",
+            "color": "black",
+        }
+    ]
+
+
+def get_columns_label(data: PackedUPA, column_start: int) -> str:
+    column_end = min(column_start + UPA_WINDOW_COLUMNS, data.shape[1])
+    return f"P{column_start + 1}-P{column_end} of {data.shape[1]}"
+
+
+def get_page_order(
+    keys: Dict[str, np.ndarray], num_of_rows: int, page: int, sort_by: list | None
+) -> np.ndarray:
+    # Rows of one page, in the order of the first sorted column if any, equal
+    # keys keep their row order
+    start, end = page * PAGE_SIZE, (page + 1) * PAGE_SIZE
+    if not sort_by or sort_by[0]["column_id"] not in keys:
+        return np.arange(start, min(end, num_of_rows))
+    values = keys[sort_by[0]["column_id"]]
+    if sort_by[0]["direction"] != "asc":
+        values = -values
+    return np.argsort(values, kind="stable")[start:end]
+
+
+def get_pa_page(result: RMPResult, page: int, sort_by: list | None) -> list:
+    # Roles are sorted by index or by number of permissions
+    roles = np.arange(result.num_of_roles)
+    keys = {"Role": roles, "Permissions": result.get_role_sizes()}
+    return result.get_pa_rows(get_page_order(keys, len(roles), page, sort_by))
+
+
+def get_ua_page(result: RMPResult, page: int, sort_by: list | None) -> list:
+    # Users holding a role, sorted by index or by number of roles
+    users = result.get_users()
+    keys = {"User": users, "Roles": result.get_user_sizes()[users]}
+    return result.get_ua_rows(users[get_page_order(keys, len(users), page, sort_by)])
+
+
+def get_rmp_tables(result: RMPResult) -> tuple:
+    # First pages of the PA and UA tables, and the paging of both tables
+    return (
+        PA_COLUMNS,
+        get_pa_page(result, 0, None),
+        UA_COLUMNS,
+        get_ua_page(result, 0, None),
+    ) + get_rmp_paging(result)
+
+
+def get_rmp_paging(result: RMPResult | None) -> tuple:
+    """
+    Page action, page count, page and sort of the PA and UA tables: streamed
+    rows are paged by the tables themselves, a finished result is paged on
+    the server so that only the labels of the visible rows are built.
+    """
+    if result is None:
+        return ("native", None, 0, []) * 2
+    return (
+        "custom",
+        -(-result.num_of_roles // PAGE_SIZE),
+        0,
+        [],
+        "custom",
+        -(-len(result.get_users()) // PAGE_SIZE),
+        0,
+        [],
+    )
+
+
+def get_shown_rmp_result(shown: dict | None) -> RMPResult | None:
+    # Result of the RMP tables, None while it runs or once it left the cache
+    if not shown or shown["dataset"] not in DATASET_MAPPING:
+        return None
+    cached = RESULT_CACHE.get(
+        get_cache_key(shown["dataset"], "basic_rmp", shown["delta_factor"])
+    )
+    return cached[0] if cached is not None else None
+
+
 def register_control_callbacks(app: Dash) -> None:
     @app.callback(
         [
@@ -41,6 +387,10 @@ def register_control_callbacks(app: Dash) -> None:
                 "children",
                 allow_duplicate=True,
             ),
+            Output("upa-table", "page_current", allow_duplicate=True),
+            Output("upa-table", "page_count", allow_duplicate=True),
+            Output("upa-column-start", "data", allow_duplicate=True),
+            Output("upa-columns-label", "children", allow_duplicate=True),
         ],
         [Input("show-upa-button", "n_clicks")],
         [State("dataset-dropdown", "value")],
@@ -52,47 +402,62 @@ def register_control_callbacks(app: Dash) -> None:
             data = get_data(dataset)
 
             if data.size == 0:
-                return [], [], [], "Warning: Dataset must be selected"
-
-            # Generate columns dynamically based on the data
-            columns = [{"name": "U/P", "id": "p_0"}]
-            columns.extend(
-                [
-                    {"name": f"P{i + 1}", "id": f"p_{i + 1}"}
-                    for i in range(data.shape[1])
-                ]
-            )
-
-            # Convert ndarray to list of dictionaries for Dash DataTable
-            data_list = [
-                {
-                    **{"p_0": f"U{index + 1}"},
-                    **dict(zip([f"p_{i + 1}" for i in range(data.shape[1])], row)),
-                }
-                for index, row in enumerate(data)
-            ]
-
-            # Add padding rows to ensure the table always has 50 rows per page
-            page_size = 20
-            if len(data_list) > page_size and len(data_list) % page_size != 0:
-                # Calculate how many padding rows are needed
-                padding_rows = page_size - len(data_list) % page_size
-                # Add empty rows for padding
-                data_list.extend(
-                    [
-                        {"p_0": "", **{f"p_{i + 1}": "" for i in range(data.shape[1])}}
-                        for _ in range(padding_rows)
-                    ]
-                )
+                return [], [], [], "Warning: Dataset must be selected", 0, 0, 0, ""
 
-            # Update the table data, columns
+            # Only the first page of the first permission window is sent
+            columns, data_list = get_upa_window(data, 0, 0)
             return (
                 columns,
                 data_list,
                 [],
                 "",
+                0,
+                -(-data.shape[0] // PAGE_SIZE),
+                0,
+                get_columns_label(data, 0),
             )
-        return [], [], [], ""
+        return [], [], [], "", 0, 0, 0, ""
+
+    @app.callback(
+        [
+            Output("upa-table", "columns", allow_duplicate=True),
+            Output("upa-table", "data", allow_duplicate=True),
+            Output("upa-columns-label", "children", allow_duplicate=True),
+        ],
+        [Input("upa-table", "page_current"), Input("upa-column-start", "data")],
+        [State("dataset-dropdown", "value")],
+        prevent_initial_call=True,
+    )
+    def page_upa(page_current, column_start, dataset):
+        data = get_data(dataset)
+        if data.size == 0:
+            return dash.no_update, dash.no_update, dash.no_update
+        columns, data_list = get_upa_window(data, page_current or 0, column_start or 0)
+        return columns, data_list, get_columns_label(data, column_start or 0)
+
+    @app.callback(
+        Output("upa-column-start", "data", allow_duplicate=True),
+        [
+            Input("prev-columns-button", "n_clicks"),
+            Input("next-columns-button", "n_clicks"),
+        ],
+        [State("upa-column-start", "data"), State("dataset-dropdown", "value")],
+        prevent_initial_call=True,
+    )
+    def move_upa_columns(prev_clicks, next_clicks, column_start, dataset):
+        data = get_data(dataset)
+        if data.size == 0:
+            return dash.no_update
+        triggered_id = callback_context.triggered[0]["prop_id"].split(".")[0]
+        step = (
+            UPA_WINDOW_COLUMNS
+            if triggered_id == "next-columns-button"
+            else -(UPA_WINDOW_COLUMNS)
+        )
+        new_start = (column_start or 0) + step
+        if new_start < 0 or new_start >= data.shape[1]:
+            return dash.no_update
+        return new_start
 
     @app.callback(
         [
@@ -105,6 +470,13 @@ def register_control_callbacks(app: Dash) -> None:
             Output("fm-result-table", "data", allow_duplicate=True),
             Output("fm-result-table", "selected_rows", allow_duplicate=True),
             Output("calc-time", "children", allow_duplicate=True),
+            Output("fm-job", "data", allow_duplicate=True),
+            Output("fm-job-interval", "disabled", allow_duplicate=True),
+            Output("fm-progress", "children", allow_duplicate=True),
+            Output("fm-result-table", "page_count", allow_duplicate=True),
+            Output("fm-result-table", "page_current", allow_duplicate=True),
+            Output("fm-result-table", "sort_by", allow_duplicate=True),
+            Output("fm-result-table", "filter_query", allow_duplicate=True),
         ],
         [Input("show-fm-button", "n_clicks")],
         [State("dataset-dropdown", "value")],
@@ -116,44 +488,152 @@ def register_control_callbacks(app: Dash) -> None:
             data = get_data(dataset)
 
             if data.size == 0:
-                return "Warning: Dataset must be selected", [], [], [], ""
-
-            fm_result, fm_time = get_fast_miner_result_with_metadata(data)
-            fm_result_table_data = [row for row in fm_result.values()]
-
-            page_size = 20
-            if (
-                len(fm_result_table_data) > page_size
-                and len(fm_result_table_data) % page_size != 0
-            ):
-                # Calculate how many padding rows are needed
-                padding_rows = page_size - len(fm_result_table_data) % page_size
-                # Add empty rows
-                fm_result_table_data.extend(
-                    [{"label": "", "original_count": "", "total_count": ""}]
-                    * padding_rows
-                )
-
-            fm_columns = (
-                [
-                    {"name": "Label", "id": "label"},
-                    {"name": "Original Count", "id": "original_count"},
-                    {"name": "Total Count", "id": "total_count"},
-                ]
-                if fm_result
-                else []
+                return (
+                    "Warning: Dataset must be selected",
+                    [],
+                    [],
+                    [],
+                    "",
+                    None,
+                    True,
+                    "",
+                ) + EMPTY_FM_PAGES
+
+            # A cached result is shown at once, otherwise FastMiner runs as a
+            # background job polled by fm-job-interval
+            cache_key = get_cache_key(dataset, "fast_miner_metadata")
+            cached = RESULT_CACHE.get(cache_key)
+            if cached is None:
+                job_id = JOBS.submit(run_fast_miner_job, dataset, key=cache_key)
+                return (
+                    "",
+                    [],
+                    [],
+                    [],
+                    "",
+                    {"id": job_id, "dataset": dataset},
+                    False,
+                    ("Starting FastMiner..."),
+                ) + EMPTY_FM_PAGES
+
+            _, fm_time = cached
+            fm_columns, fm_result_table_data, page_count = get_fm_table(
+                get_cached_candidate_store(dataset)
             )
 
-            # Update the table data, columns
+            # Update the table columns and first page, sorting and filtering
+            # start over
             return (
                 "",
                 fm_columns,
                 fm_result_table_data,
                 [],
                 f"Calculation Time: {fm_time} seconds",
+                None,
+                True,
+                "",
+            ) + (page_count, 0, [], "")
+
+        return ("", [], [], [], "", None, True, "") + EMPTY_FM_PAGES
+
+    @app.callback(
+        [
+            Output("fm-result-table", "columns", allow_duplicate=True),
+            Output("fm-result-table", "data", allow_duplicate=True),
+            Output("fm-result-table", "selected_rows", allow_duplicate=True),
+            Output("calc-time", "children", allow_duplicate=True),
+            Output("fm-job-interval", "disabled", allow_duplicate=True),
+            Output("fm-progress", "children", allow_duplicate=True),
+            Output("warning-message", "children", allow_duplicate=True),
+            Output("fm-result-table", "page_count", allow_duplicate=True),
+            Output("fm-result-table", "page_current", allow_duplicate=True),
+            Output("fm-result-table", "sort_by", allow_duplicate=True),
+            Output("fm-result-table", "filter_query", allow_duplicate=True),
+        ],
+        [Input("fm-job-interval", "n_intervals")],
+        [State("fm-job", "data")],
+        prevent_initial_call=True,
+    )
+    def poll_fm_job(n_intervals, job):
+        status = JOBS.poll(job["id"]) if job else None
+        if status is None:
+            return (
+                (dash.no_update,) * 4
+                + (True, dash.no_update, dash.no_update)
+                + (dash.no_update,) * 4
+            )
+        if status.state == "running":
+            return (
+                (dash.no_update,) * 4
+                + (False, get_fm_progress_message(status.progress), dash.no_update)
+                + (dash.no_update,) * 4
+            )
+        if status.state == "failed":
+            return (
+                (dash.no_update,) * 4
+                + (True, "", f"FastMiner failed: {status.error}")
+                + (dash.no_update,) * 4
             )
 
-        return "", [], [], [], ""
+        RESULT_CACHE.put(
+            get_cache_key(job["dataset"], "fast_miner_metadata"), status.result
+        )
+        _, fm_time = status.result
+        fm_columns, fm_result_table_data, page_count = get_fm_table(
+            get_cached_candidate_store(job["dataset"])
+        )
+        return (
+            fm_columns,
+            fm_result_table_data,
+            [],
+            f"Calculation Time: {fm_time} seconds",
+            True,
+            "",
+            "",
+        ) + (page_count, 0, [], "")
+
+    @app.callback(
+        [
+            Output("fm-result-table", "data", allow_duplicate=True),
+            Output("fm-result-table", "page_count", allow_duplicate=True),
+            Output("fm-result-table", "selected_rows", allow_duplicate=True),
+            Output("warning-message", "children", allow_duplicate=True),
+        ],
+        [
+            Input("fm-result-table", "page_current"),
+            Input("fm-result-table", "sort_by"),
+            Input("fm-result-table", "filter_query"),
+        ],
+        [State("dataset-dropdown", "value")],
+        prevent_initial_call=True,
+    )
+    def page_fm_result(page_current, sort_by, filter_query, dataset):
+        # Only the requested page of the sorted and filtered candidates is sent
+        store = get_cached_candidate_store(dataset) if dataset else None
+        if store is None:
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+        try:
+            _, fm_result_table_data, page_count = get_fm_table(
+                store, page_current or 0, sort_by, filter_query
+            )
+        except ValueError as e:
+            return dash.no_update, dash.no_update, dash.no_update, f"Warning: {e}"
+        return fm_result_table_data, page_count, [], ""
+
+    @app.callback(
+        [
+            Output("fm-job-interval", "disabled", allow_duplicate=True),
+            Output("fm-progress", "children", allow_duplicate=True),
+        ],
+        [Input("cancel-fm-button", "n_clicks")],
+        [State("fm-job", "data")],
+        prevent_initial_call=True,
+    )
+    def cancel_fm_job(n_clicks, job):
+        # A job that already finished is left to its poll, which shows it
+        if not job or not JOBS.cancel(job["id"]):
+            return dash.no_update, dash.no_update
+        return True, "FastMiner cancelled"
 
     @app.callback(
         Output(
@@ -161,49 +641,55 @@ def register_control_callbacks(app: Dash) -> None:
             "style_data_conditional",
             allow_duplicate=True,
         ),
-        [Input("fm-result-table", "selected_rows")],
-        [State("fm-result-table", "data"), State("upa-table", "data")],
+        [
+            Input("fm-result-table", "selected_rows"),
+            Input("upa-table", "page_current"),
+            Input("upa-column-start", "data"),
+        ],
+        [
+            State("fm-result-table", "data"),
+            State("upa-table", "page_count"),
+            State("dataset-dropdown", "value"),
+        ],
         prevent_initial_call="initial_duplicate",
     )
-    def update_styles(selected_rows, dict_data, upa_data):
-        style_data_conditional = []
-
-        if selected_rows and dict_data and upa_data:
-            selected_row = dict_data[selected_rows[0]]
-            selected_permissions = selected_row["label"].split(",")
-            selected_columns = [f"p_{int(perm[1:])}" for perm in selected_permissions]
-
-            for upa_row in upa_data:
-                if all(upa_row.get(col) == 1 for col in selected_columns):
-                    for col in selected_columns:
-                        style_data_conditional.append(
-                            {
-                                "if": {
-                                    "filter_query": "{"
-                                    + col
-                                    + "} = 1 && "
-                                    + "{p_0} = "
-                                    + upa_row["p_0"],
-                                    "column_id": col,
-                                },
-                                "backgroundColor": "#FFDDC1",
-                                "color": "black",
-                            }
-                        )
-        return style_data_conditional
+    def update_styles(
+        selected_rows, page_current, column_start, dict_data, page_count, dataset
+    ):
+        if selected_rows and dict_data and page_count and dataset in DATASET_MAPPING:
+            label = dict_data[selected_rows[0]]["label"]
+            if label:
+                permissions = [int(perm[1:]) - 1 for perm in label.split(",")]
+                return get_role_styles(
+                    get_data(dataset), permissions, page_current or 0, column_start or 0
+                )
+        return []
+
+    # Columns and first pages of the RMP tables, then their paging
+    rmp_table_outputs = [
+        Output(table, prop, allow_duplicate=True)
+        for table in ("pa-matrix-table", "ua-matrix-table")
+        for prop in ("columns", "data")
+    ] + [
+        Output(table, prop, allow_duplicate=True)
+        for table in ("pa-matrix-table", "ua-matrix-table")
+        for prop in ("page_action", "page_count", "page_current", "sort_by")
+    ]
+    no_rmp_tables = ([], [], [], []) + get_rmp_paging(None)
 
     @app.callback(
-        [
-            Output("pa-matrix-table", "columns", allow_duplicate=True),
-            Output("pa-matrix-table", "data", allow_duplicate=True),
-            Output("ua-matrix-table", "columns", allow_duplicate=True),
-            Output("ua-matrix-table", "data", allow_duplicate=True),
+        rmp_table_outputs
+        + [
             Output("rmp-calc-time", "children", allow_duplicate=True),
             Output(
                 "warning-message",
                 "children",
                 allow_duplicate=True,
             ),
+            Output("rmp-job", "data", allow_duplicate=True),
+            Output("rmp-job-interval", "disabled", allow_duplicate=True),
+            Output("rmp-progress", "children", allow_duplicate=True),
+            Output("rmp-result", "data", allow_duplicate=True),
         ],
         [Input("show-brmp-button", "n_clicks")],
         [State("d-factor-input", "value"), State("dataset-dropdown", "value")],
@@ -215,54 +701,167 @@ def register_control_callbacks(app: Dash) -> None:
             data = get_data(dataset)
 
             if data.size == 0:
-                return [], [], [], [], "", "Warning: Dataset must be selected"
-
-            # Run the RMP algorithm
-            start_time = time.time()
-            pa_matrix, ua_matrix = basic_rmp(data, delta_factor)
-            calc_time = time.time() - start_time
-
-            # Prepare PA matrix data for display
-            pa_matrix_data = [
-                {"Role": k, "Permissions": ", ".join(v)} for k, v in pa_matrix.items()
-            ]
-            pa_columns = [
-                {"name": "Role", "id": "Role"},
-                {"name": "Permissions", "id": "Permissions"},
-            ]
-
-            # Prepare UA matrix data for display
-            ua_matrix_data = [
-                {"User": k, "Roles": ", ".join(v)} for k, v in ua_matrix.items()
-            ]
-            ua_columns = [
-                {"name": "User", "id": "User"},
-                {"name": "Roles", "id": "Roles"},
-            ]
-
-            page_size = 20
-            if len(ua_matrix_data) > page_size and len(ua_matrix_data) % page_size != 0:
-                # Calculate how many padding rows are needed
-                padding_rows = page_size - len(ua_matrix_data) % page_size
-                # Add empty rows
-                ua_matrix_data.extend([{"User": "", "Roles": ""}] * padding_rows)
-
-            if len(pa_matrix_data) > page_size and len(pa_matrix_data) % page_size != 0:
-                # Calculate how many padding rows are needed
-                padding_rows = page_size - len(pa_matrix_data) % page_size
-                # Add empty rows
-                pa_matrix_data.extend([{"Role": "", "Permissions": ""}] * padding_rows)
+                return no_rmp_tables + (
+                    "",
+                    "Warning: Dataset must be selected",
+                    None,
+                    True,
+                    "",
+                    None,
+                )
 
+            # Reuse the result of an earlier click, otherwise run the RMP
+            # algorithm as a background job polled by rmp-job-interval
+            cache_key = get_cache_key(dataset, "basic_rmp", delta_factor)
+            cached = RESULT_CACHE.get(cache_key)
+            if cached is None:
+                job_id = JOBS.submit(
+                    run_basic_rmp_job,
+                    dataset,
+                    delta_factor,
+                    get_cached_fast_miner_candidates(dataset),
+                    key=cache_key,
+                )
+                job = {"id": job_id, "dataset": dataset, "delta_factor": delta_factor}
+                # Rows are appended to the tables while the job runs
+                return (
+                    (PA_COLUMNS, [], UA_COLUMNS, [])
+                    + get_rmp_paging(None)
+                    + ("", "", job, False, "Starting RMP...", None)
+                )
+
+            result, calc_time = cached
+            return get_rmp_tables(result) + (
+                get_rmp_summary(dataset, delta_factor, result, calc_time),
+                "",
+                None,
+                True,
+                "",
+                {"dataset": dataset, "delta_factor": delta_factor},
+            )
+
+        return no_rmp_tables + ("", "", None, True, "", None)
+
+    @app.callback(
+        rmp_table_outputs
+        + [
+            Output("rmp-calc-time", "children", allow_duplicate=True),
+            Output("rmp-job-interval", "disabled", allow_duplicate=True),
+            Output("rmp-progress", "children", allow_duplicate=True),
+            Output("warning-message", "children", allow_duplicate=True),
+            Output("rmp-result", "data", allow_duplicate=True),
+        ],
+        [Input("rmp-job-interval", "n_intervals")],
+        [State("rmp-job", "data")],
+        prevent_initial_call=True,
+    )
+    def poll_rmp_job(n_intervals, job):
+        status = JOBS.poll(job["id"]) if job else None
+        unchanged_tables = (dash.no_update,) * len(rmp_table_outputs)
+        if status is None:
+            return unchanged_tables + (
+                dash.no_update,
+                True,
+                dash.no_update,
+                dash.no_update,
+                dash.no_update,
+            )
+        if status.state == "running":
+            # Only the rows of the roles chosen since the last poll are sent
+            pa_patch, ua_patch = Patch(), Patch()
+            for pa_row, ua_updates in status.items:
+                pa_patch.append(pa_row)
+                for index, row, is_new in ua_updates:
+                    if is_new:
+                        ua_patch.append(row)
+                    else:
+                        ua_patch[index] = row
             return (
-                pa_columns,
-                pa_matrix_data,
-                ua_columns,
-                ua_matrix_data,
-                f"RMP Calculation Time: {calc_time:.2f} seconds",
+                (
+                    dash.no_update,
+                    pa_patch if status.items else dash.no_update,
+                    dash.no_update,
+                    ua_patch if status.items else dash.no_update,
+                )
+                + unchanged_tables[4:]
+                + (
+                    dash.no_update,
+                    False,
+                    get_rmp_progress_message(status.progress),
+                    dash.no_update,
+                    dash.no_update,
+                )
+            )
+        if status.state == "failed":
+            return unchanged_tables + (
+                dash.no_update,
+                True,
                 "",
+                f"RMP failed: {status.error}",
+                dash.no_update,
             )
 
-        return [], [], [], [], "", ""
+        (result, calc_time), gen_roles_list = status.result
+        RESULT_CACHE.put(
+            get_cache_key(job["dataset"], "basic_rmp", job["delta_factor"]),
+            (result, calc_time),
+        )
+        RESULT_CACHE.put(
+            get_cache_key(job["dataset"], "fast_miner_candidates"), gen_roles_list
+        )
+        return get_rmp_tables(result) + (
+            get_rmp_summary(job["dataset"], job["delta_factor"], result, calc_time),
+            True,
+            "",
+            "",
+            {"dataset": job["dataset"], "delta_factor": job["delta_factor"]},
+        )
+
+    @app.callback(
+        Output("pa-matrix-table", "data", allow_duplicate=True),
+        [
+            Input("pa-matrix-table", "page_current"),
+            Input("pa-matrix-table", "sort_by"),
+        ],
+        [State("rmp-result", "data")],
+        prevent_initial_call=True,
+    )
+    def page_pa_matrix(page_current, sort_by, shown):
+        # Pages of a finished result are built on the server
+        result = get_shown_rmp_result(shown)
+        if result is None:
+            return dash.no_update
+        return get_pa_page(result, page_current or 0, sort_by)
+
+    @app.callback(
+        Output("ua-matrix-table", "data", allow_duplicate=True),
+        [
+            Input("ua-matrix-table", "page_current"),
+            Input("ua-matrix-table", "sort_by"),
+        ],
+        [State("rmp-result", "data")],
+        prevent_initial_call=True,
+    )
+    def page_ua_matrix(page_current, sort_by, shown):
+        result = get_shown_rmp_result(shown)
+        if result is None:
+            return dash.no_update
+        return get_ua_page(result, page_current or 0, sort_by)
+
+    @app.callback(
+        [
+            Output("rmp-job-interval", "disabled", allow_duplicate=True),
+            Output("rmp-progress", "children", allow_duplicate=True),
+        ],
+        [Input("cancel-rmp-button", "n_clicks")],
+        [State("rmp-job", "data")],
+        prevent_initial_call=True,
+    )
+    def cancel_rmp_job(n_clicks, job):
+        # A job that already finished is left to its poll, which shows it
+        if not job or not JOBS.cancel(job["id"]):
+            return dash.no_update, dash.no_update
+        return True, "RMP cancelled"
 
         # Callback to clear the dataset selection
 
@@ -283,11 +882,24 @@ def register_control_callbacks(app: Dash) -> None:
             Output("ua-matrix-table", "columns", allow_duplicate=True),
             Output("ua-matrix-table", "data", allow_duplicate=True),
             Output("rmp-calc-time", "children", allow_duplicate=True),
+            Output("fm-job-interval", "disabled", allow_duplicate=True),
+            Output("fm-progress", "children", allow_duplicate=True),
+            Output("rmp-job-interval", "disabled", allow_duplicate=True),
+            Output("rmp-progress", "children", allow_duplicate=True),
+            Output("upa-table", "page_count", allow_duplicate=True),
+            Output("upa-columns-label", "children", allow_duplicate=True),
+            Output("fm-result-table", "page_count", allow_duplicate=True),
+            Output("rmp-result", "data", allow_duplicate=True),
         ],
         [Input("clear-button", "n_clicks"), Input("dataset-dropdown", "value")],
+        [
+            State("fm-job", "data"),
+            State("rmp-job", "data"),
+            State("rmp-result", "data"),
+        ],
         prevent_initial_call="initial_duplicate",
     )
-    def clear_dataset(n_clicks, selected_value):
+    def clear_dataset(n_clicks, selected_value, fm_job, rmp_job, shown_rmp):
         ctx = callback_context  # Get the callback context
 
         if not ctx.triggered:
@@ -297,6 +909,16 @@ def register_control_callbacks(app: Dash) -> None:
         # Determine which input triggered the callback
         triggered_id = ctx.triggered[0]["prop_id"].split(".")[0]
 
+        # Jobs of the previous selection are not needed anymore
+        for job in (fm_job, rmp_job):
+            if job and not JOBS.cancel(job["id"]):
+                # Already finished, its result is dropped with the selection
+                JOBS.poll(job["id"])
+        # Labels of the RMP result that was shown are not needed anymore
+        shown_result = get_shown_rmp_result(shown_rmp)
+        if shown_result is not None:
+            shown_result.clear_label_cache()
+
         if triggered_id == "clear-button" and n_clicks > 0:
             # Clear button was clicked
             return (
@@ -315,9 +937,33 @@ def register_control_callbacks(app: Dash) -> None:
                 [],  # Clear UA matrix table columns
                 [],  # Clear UA matrix table data
                 "",  # Clear rmp-calc-time
+                True,  # Stop polling the FastMiner job
+                "",  # Clear FastMiner progress
+                True,  # Stop polling the RMP job
+                "",  # Clear RMP progress
+                0,  # Clear UPA table pages
+                "",  # Clear UPA permission window
+                0,  # Clear FM result table pages
+                None,  # Forget the shown RMP result
             )
         elif triggered_id == "dataset-dropdown" and selected_value is not None:
             # Dropdown value was changed
-            return selected_value, 0, "", [], [], [], [], [], [], "", [], [], [], [], ""
+            return (
+                selected_value,
+                0,
+                "",
+                [],
+                [],
+                [],
+                [],
+                [],
+                [],
+                "",
+                [],
+                [],
+                [],
+                [],
+                "",
+            ) + (True, "", True, "", 0, "", 0, None)
 
         return dash.no_update
@@ -0,0 +1,188 @@
+import heapq
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from algorithms.fast_miner import FastMinerResult
+from algorithms.role_registry import RoleRegistry
+
+# Filter expressions of a DataTable: "{column} operator value" parts joined
+# by "&&", e.g. "{total_count} >= 10 && {label} contains P3"
+_FILTER_PART = re.compile(
+    r"^\{(?P<column>\w+)\}\s+"
+    r"(?P<operator>s?(?:>=|<=|!=|=|>|<|eq|ne|ge|le|gt|lt|contains))\s+"
+    r"(?P<value>.+)$"
+)
+
+_COMPARISONS = {
+    "=": np.equal,
+    "eq": np.equal,
+    "!=": np.not_equal,
+    "ne": np.not_equal,
+    ">=": np.greater_equal,
+    "ge": np.greater_equal,
+    "<=": np.less_equal,
+    "le": np.less_equal,
+    ">": np.greater,
+    "gt": np.greater,
+    "<": np.less,
+    "lt": np.less,
+}
+
+
+def _parse_filter_part(part: str) -> Tuple[str, str, str]:
+    match = _FILTER_PART.match(part.strip())
+    if match is None:
+        raise ValueError(f"Unsupported filter: {part}")
+    value = match["value"].strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in "\"'`":
+        value = value[1:-1]
+    # Text operators of the table are prefixed with "s"
+    return match["column"], match["operator"].lstrip("s"), value
+
+
+class CandidateStore:
+    """
+    FastMiner candidates kept as NumPy columns on the server, so the table
+    only receives the rows of the visible page.
+
+    The orders of the sortable columns (the label is sorted by its number of
+    permissions) are stable argsorts computed once. A filtered page near the
+    top is picked with a heap of its first rows, deeper pages follow the
+    precomputed order. Candidates are the roles of a registry, their labels
+    are built for the rows of a page, or on the fly by a label filter.
+    """
+
+    SORTABLE_COLUMNS = ("label", "original_count", "total_count")
+
+    def __init__(
+        self,
+        roles: RoleRegistry,
+        original_counts: np.ndarray,
+        total_counts: np.ndarray,
+    ):
+        self.roles = roles
+        self.values: Dict[str, np.ndarray] = {
+            "label": roles.get_sizes(),
+            "original_count": np.asarray(original_counts, dtype=np.int64),
+            "total_count": np.asarray(total_counts, dtype=np.int64),
+        }
+        # Ascending and descending orders, equal values stay in candidate order
+        self._orders = {
+            (column, ascending): np.argsort(
+                values if ascending else -values, kind="stable"
+            )
+            for column, values in self.values.items()
+            for ascending in (True, False)
+        }
+
+    @classmethod
+    def from_fm_result(cls, fm_result: FastMinerResult) -> "CandidateStore":
+        return cls(fm_result.roles, fm_result.original_count, fm_result.total_count)
+
+    def __len__(self) -> int:
+        return len(self.roles)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [*self.values.values(), *self._orders.values()]
+        return self.roles.nbytes + sum(array.nbytes for array in arrays)
+
+    def get_rows(self, indices: np.ndarray) -> List[Dict]:
+        return [
+            {
+                "label": self.roles.get_label(i),
+                "original_count": int(self.values["original_count"][i]),
+                "total_count": int(self.values["total_count"][i]),
+            }
+            for i in indices.tolist()
+        ]
+
+    def filter(self, filter_query: str | None) -> np.ndarray | None:
+        # Boolean mask of the matching candidates, None when nothing is filtered
+        if not filter_query:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for part in filter_query.split(" && "):
+            column, operator, value = _parse_filter_part(part)
+            if column == "label":
+                if operator == "contains":
+                    matches = np.fromiter(
+                        (value in label for label in self.roles.iter_labels()),
+                        dtype=bool,
+                        count=len(self),
+                    )
+                elif operator in ("=", "eq", "!=", "ne"):
+                    matches = np.fromiter(
+                        (label == value for label in self.roles.iter_labels()),
+                        dtype=bool,
+                        count=len(self),
+                    )
+                    if operator in ("!=", "ne"):
+                        matches = ~matches
+                else:
+                    raise ValueError(f"Unsupported label filter: {part}")
+            elif column in self.values and operator in _COMPARISONS:
+                matches = _COMPARISONS[operator](self.values[column], float(value))
+            else:
+                raise ValueError(f"Unsupported filter: {part}")
+            mask &= matches
+        return mask
+
+    def top_k(
+        self,
+        column: str,
+        k: int,
+        ascending: bool = False,
+        indices: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        The k first candidates (of the given indices) in the order of a column,
+        ties in candidate order, from a heap of k candidates.
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        values = self.values[column]
+        sign = 1 if ascending else -1
+        return np.array(
+            heapq.nsmallest(
+                k, indices.tolist(), key=lambda i: (sign * int(values[i]), i)
+            ),
+            dtype=np.intp,
+        )
+
+    def get_page(
+        self,
+        page: int,
+        page_size: int,
+        sort_by: List[Dict] | None = None,
+        filter_query: str | None = None,
+    ) -> Tuple[List[Dict], int]:
+        """
+        Rows of one page of the sorted and filtered candidates, and the number
+        of matching candidates. sort_by is the sort_by of a DataTable, only its
+        first column is used.
+        """
+        mask = self.filter(filter_query)
+        start, end = page * page_size, (page + 1) * page_size
+
+        if not sort_by or sort_by[0]["column_id"] not in self.SORTABLE_COLUMNS:
+            indices = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+            return self.get_rows(indices[start:end]), len(indices)
+
+        column = sort_by[0]["column_id"]
+        ascending = sort_by[0]["direction"] == "asc"
+        if mask is None:
+            order = self._orders[column, ascending]
+            return self.get_rows(order[start:end]), len(self)
+
+        matching = np.flatnonzero(mask)
+        if len(matching) * 16 <= len(self):
+            # Few matches, a heap over them is cheaper than a pass over the
+            # whole order, only the rows up to the page are ordered
+            order = self.top_k(column, end, ascending, matching)
+        else:
+            order = self._orders[column, ascending]
+            order = order[mask[order]]
+        return self.get_rows(order[start:end]), len(matching)
@@ -0,0 +1,160 @@
+import atexit
+import multiprocessing
+import queue
+import signal
+import threading
+import uuid
+from collections.abc import Generator
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List
+
+# Jobs start from a fresh interpreter, forking the threaded server could copy
+# locks held by other request threads
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _cancel_job(signum, frame) -> None:
+    # Raised where the job is, so its with blocks run, e.g. the process pool
+    # and the shared memory of a ParallelExecutor are closed
+    raise JobCancelled()
+
+
+def _run_job(target: Callable, messages, args: tuple) -> None:
+    # Runs in the job process, every message is a (state, payload) pair
+    def report(**progress) -> None:
+        messages.put(("running", progress))
+
+    signal.signal(signal.SIGTERM, _cancel_job)
+    try:
+        result = target(report, *args)
+        if isinstance(result, Generator):
+            # Partial results are streamed, the return value is the result
+            while True:
+                try:
+                    messages.put(("item", next(result)))
+                except StopIteration as stop:
+                    result = stop.value
+                    break
+        messages.put(("done", result))
+    except JobCancelled:
+        # Nobody reads the messages of a cancelled job anymore
+        messages.cancel_join_thread()
+    except Exception as e:
+        messages.put(("failed", f"{type(e).__name__}: {e}"))
+
+
+@dataclass
+class JobStatus:
+    # state is one of "running", "done", "failed" or "cancelled"
+    state: str = "running"
+    progress: Dict[str, Any] = field(default_factory=dict)
+    # Items yielded by a generator job since the previous poll
+    items: List[Any] = field(default_factory=list)
+    result: Any = None
+    error: str = ""
+
+
+@dataclass
+class _Job:
+    key: Hashable
+    process: Any
+    messages: Any
+    status: JobStatus = field(default_factory=JobStatus)
+
+
+class JobManager:
+    """
+    Runs mining jobs in their own processes, so a long run does not block the
+    request thread or hit its timeout. A job calls report(**progress) as it
+    goes, and a generator job streams the items it yields. poll() returns the
+    latest progress, the new items and finally the result, and cancel()
+    stops the job process, which cleans up before exiting.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, _Job] = {}
+        self._lock = threading.Lock()
+        # Job processes are not daemonic, they would be waited for at exit
+        atexit.register(self.cancel_all)
+
+    def submit(self, target: Callable, *args, key: Hashable = None) -> str:
+        """
+        Starts target(report, *args) in a new process and returns the job id.
+        A job still running with the same key is reused, e.g. on a second click.
+        """
+        with self._lock:
+            for job_id, job in self._jobs.items():
+                if key is not None and job.key == key:
+                    return job_id
+
+            messages = _CONTEXT.Queue()
+            # Not daemonic, a job may start the process pool of its miner
+            process = _CONTEXT.Process(target=_run_job, args=(target, messages, args))
+            process.start()
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = _Job(key, process, messages)
+            return job_id
+
+    def poll(self, job_id: str) -> JobStatus | None:
+        """
+        Latest status of a job, None for an unknown job. A finished job is
+        forgotten once its final status has been returned.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+
+            # The process is checked first, so all its messages are queued
+            exited = not job.process.is_alive()
+            job.status.items = []
+            while job.status.state == "running":
+                try:
+                    state, payload = job.messages.get_nowait()
+                except queue.Empty:
+                    break
+                if state == "running":
+                    job.status.progress = payload
+                elif state == "item":
+                    job.status.items.append(payload)
+                elif state == "done":
+                    job.status.state, job.status.result = state, payload
+                else:
+                    job.status.state, job.status.error = state, payload
+
+            if job.status.state == "running" and exited:
+                job.status.state = "failed"
+                job.status.error = f"Job exited with code {job.process.exitcode}"
+
+            if job.status.state != "running":
+                self._remove(job_id)
+            return job.status
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Stops a running job and returns True, or False when there is nothing
+        to stop. A job whose process has exited is left for poll() to return
+        its result. SIGTERM raises JobCancelled in the job, which exits once
+        it has cleaned up.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.process.is_alive():
+                return False
+            job.process.terminate()
+            job.status.state = "cancelled"
+            self._remove(job_id)
+            return True
+
+    def cancel_all(self) -> None:
+        for job_id in list(self._jobs):
+            self.cancel(job_id)
+
+    def _remove(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id)
+        job.process.join(timeout=1)
+        job.messages.close()
@@ -15,22 +15,30 @@ def get_fast_miner_result_layout():
                         data=[],
                         row_selectable="single",
                         style_cell={"textAlign": "left"},
-                        sort_action="native",
+                        # Rows are paged, sorted and filtered on the server
+                        page_action="custom",
+                        sort_action="custom",
+                        sort_mode="single",
+                        filter_action="custom",
+                        page_current=0,
                         page_size=20,
-                        virtualization=True,
-                        style_data_conditional=[
-                            {
-                                "if": {
-                                    "filter_query": '{label} = ""'
-                                },  # Apply to empty rows
-                                "backgroundColor": "#f9f9f9",
-                                "color": "#f9f9f9",
-                            }
-                        ],
+                        page_count=0,
                     ),
                     html.Div(id="calc-time", style={"marginTop": "20px"}),
                 ],
             ),
+            # Progress of a running FastMiner job, polled by the interval
+            html.Div(
+                [
+                    html.Span(id="fm-progress"),
+                    html.Button(
+                        "Cancel", id="cancel-fm-button", style={"margin-left": "10px"}
+                    ),
+                ],
+                style={"marginTop": "10px"},
+            ),
+            dcc.Interval(id="fm-job-interval", interval=500, disabled=True),
+            dcc.Store(id="fm-job"),
         ],
         style={
             "minWidth": "100%",
@@ -18,18 +18,13 @@ def get_rmp_results_layout():
                                 columns=[],  # Will be populated dynamically
                                 data=[],  # Will be populated dynamically
                                 style_cell={"textAlign": "left"},
-                                sort_action="native",
+                                # Streamed rows are paged by the table, a
+                                # finished result on the server
+                                page_action="native",
+                                sort_action="custom",
+                                sort_mode="single",
+                                page_current=0,
                                 page_size=20,
-                                virtualization=True,
-                                style_data_conditional=[
-                                    {
-                                        "if": {
-                                            "filter_query": '{Role} = ""'
-                                        },  # Apply to empty rows
-                                        "backgroundColor": "#f9f9f9",
-                                        "color": "#f9f9f9",
-                                    }
-                                ],
                             ),
                         ],
                         style={"marginBottom": "20px"},
@@ -43,18 +38,13 @@ def get_rmp_results_layout():
                                 columns=[],  # Will be populated dynamically
                                 data=[],  # Will be populated dynamically
                                 style_cell={"textAlign": "left"},
-                                sort_action="native",
+                                # Streamed rows are paged by the table, a
+                                # finished result on the server
+                                page_action="native",
+                                sort_action="custom",
+                                sort_mode="single",
+                                page_current=0,
                                 page_size=20,
-                                virtualization=True,
-                                style_data_conditional=[
-                                    {
-                                        "if": {
-                                            "filter_query": '{User} = ""'
-                                        },  # Apply to empty rows
-                                        "backgroundColor": "#f9f9f9",
-                                        "color": "#f9f9f9",
-                                    }
-                                ],
                             ),
                         ]
                     ),
@@ -62,6 +52,20 @@ def get_rmp_results_layout():
                     html.Div(id="rmp-calc-time", style={"marginTop": "20px"}),
                 ],
             ),
+            # Progress of a running RMP job, polled by the interval
+            html.Div(
+                [
+                    html.Span(id="rmp-progress"),
+                    html.Button(
+                        "Cancel", id="cancel-rmp-button", style={"margin-left": "10px"}
+                    ),
+                ],
+                style={"marginTop": "10px"},
+            ),
+            dcc.Interval(id="rmp-job-interval", interval=500, disabled=True),
+            dcc.Store(id="rmp-job"),
+            # Dataset and delta factor of the result shown in the tables
+            dcc.Store(id="rmp-result"),
         ],
         style={
             "minWidth": "100%",
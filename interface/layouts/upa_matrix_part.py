@@ -29,11 +29,23 @@ def get_upa_matrix_layout():
                                 "width": "85px",
                             }
                         ],
+                        # Pages and permission windows are sliced on the server
+                        page_action="custom",
+                        page_current=0,
                         page_size=20,
-                        virtualization=True,
+                        page_count=0,
                     ),
                 ],
             ),
+            html.Div(
+                [
+                    html.Button("< Permissions", id="prev-columns-button"),
+                    html.Span(id="upa-columns-label", style={"margin": "0 10px"}),
+                    html.Button("Permissions >", id="next-columns-button"),
+                ],
+                style={"marginTop": "10px"},
+            ),
+            dcc.Store(id="upa-column-start", data=0),
         ],
         style={
             "minWidth": "100%",
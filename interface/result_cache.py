@@ -0,0 +1,106 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import numpy as np
+
+from algorithms.fast_miner import FastMinerResult
+from algorithms.rmp_result import RMPResult
+from dataset.packed_upa import PackedUPA
+from dataset.permission_index import PermissionIndex
+from dataset.sparse_upa import SparseUPA
+from interface.candidate_store import CandidateStore
+
+_MISSING = object()
+
+
+def get_nbytes(value: Any) -> int:
+    """
+    Approximate memory held by a cached value. Memory-mapped arrays are backed
+    by the page cache, only their object header is counted.
+    """
+    if isinstance(value, (CandidateStore, FastMinerResult, RMPResult)):
+        return value.nbytes
+    if isinstance(value, np.memmap):
+        return sys.getsizeof(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (PackedUPA, SparseUPA, PermissionIndex)):
+        return sum(
+            get_nbytes(array)
+            for array in vars(value).values()
+            if isinstance(array, (np.ndarray, PermissionIndex))
+        )
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            get_nbytes(k) + get_nbytes(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(get_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache bounded by the approximate memory of its values.
+    Keys are (dataset, content hash, algorithm, parameters) tuples.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        nbytes = get_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                # Never cache a value that would evict everything else
+                return
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_nbytes
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key, default=_MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+        }
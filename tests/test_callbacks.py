@@ -0,0 +1,50 @@
+import numpy as np
+
+from interface import callbacks
+
+
+def test__get_upa_window__slices_one_page_and_permission_window():
+    data = callbacks.get_data("healthcare")
+    dense = data.to_dense()
+
+    columns, rows = callbacks.get_upa_window(data, 1, 40)
+    assert [c["id"] for c in columns] == ["p_0"] + [f"p_{j}" for j in range(41, 47)]
+    assert len(rows) == callbacks.PAGE_SIZE
+    assert rows[0]["p_0"] == f"U{callbacks.PAGE_SIZE + 1}"
+    assert [rows[0][f"p_{j}"] for j in range(41, 47)] == dense[
+        callbacks.PAGE_SIZE, 40:46
+    ].tolist()
+    assert callbacks.get_columns_label(data, 40) == "P41-P46 of 46"
+
+
+def test__get_role_styles__limited_to_the_visible_window():
+    data = callbacks.get_data("healthcare")
+    dense = data.to_dense()
+    # The first and last permissions of the first user of page 1
+    first, last = np.flatnonzero(dense[callbacks.PAGE_SIZE])[[0, -1]].tolist()
+
+    (style,) = callbacks.get_role_styles(data, [first, last], 1, last)
+    holders = np.all(
+        dense[callbacks.PAGE_SIZE : 2 * callbacks.PAGE_SIZE, [first, last]], axis=1
+    )
+    assert style["if"]["row_index"] == np.flatnonzero(holders).tolist()
+    assert style["if"]["column_id"] == [f"p_{last + 1}"]
+
+    assert callbacks.get_role_styles(data, [first, last], 1, last + 1) == []
+
+
+def test__get_ua_page__sorts_users_with_roles_on_the_server():
+    result, _ = callbacks.compute_basic_rmp_result("healthcare", 0)
+    sizes = result.get_user_sizes()
+    users = result.get_users()
+    expected = users[np.argsort(-sizes[users], kind="stable")]
+
+    rows = callbacks.get_ua_page(
+        result, 1, [{"column_id": "Roles", "direction": "desc"}]
+    )
+    assert rows == result.get_ua_rows(
+        expected[callbacks.PAGE_SIZE : 2 * callbacks.PAGE_SIZE]
+    )
+    assert callbacks.get_pa_page(result, 0, None) == result.get_pa_rows(
+        range(min(callbacks.PAGE_SIZE, result.num_of_roles))
+    )
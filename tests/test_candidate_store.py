@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from algorithms.fast_miner import get_fast_miner_result_with_metadata
+from dataset.upa_matrix import load_upa_from_one2one_file
+from interface.candidate_store import CandidateStore
+
+
+def get_store_and_rows():
+    upa = load_upa_from_one2one_file("dataset/real_datasets/healthcare.txt")
+    fm_result, _ = get_fast_miner_result_with_metadata(upa)
+    rows = fm_result.get_rows(np.arange(len(fm_result)))
+    return CandidateStore.from_fm_result(fm_result), rows
+
+
+def test__candidate_store__pages_follow_python_sort():
+    store, rows = get_store_and_rows()
+    for column in ("original_count", "total_count"):
+        for direction in ("asc", "desc"):
+            expected = sorted(
+                rows, key=lambda row: row[column], reverse=direction == "desc"
+            )
+            page, num_of_rows = store.get_page(
+                1, 20, [{"column_id": column, "direction": direction}]
+            )
+            assert num_of_rows == len(rows)
+            assert page == expected[20:40]
+
+
+def test__candidate_store__filters_before_paging():
+    store, rows = get_store_and_rows()
+    query = "{total_count} >= 10 && {label} contains P1"
+    expected = [
+        row for row in rows if row["total_count"] >= 10 and "P1" in row["label"]
+    ]
+    expected.sort(key=lambda row: row["total_count"])
+    page, num_of_rows = store.get_page(
+        0, 20, [{"column_id": "total_count", "direction": "asc"}], query
+    )
+    assert num_of_rows == len(expected)
+    assert page == expected[:20]
+
+    with pytest.raises(ValueError):
+        store.filter("{total_count} between 1")
+
+
+def test__candidate_store__top_k_matches_the_precomputed_order():
+    store, _ = get_store_and_rows()
+    matching = np.flatnonzero(store.values["original_count"] > 0)
+    top = store.top_k("total_count", 15, ascending=False, indices=matching)
+    order = store._orders["total_count", False]
+    order = order[np.isin(order, matching)]
+    assert top.tolist() == order[:15].tolist()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from algorithms.coverage_state import CoverageState
+from algorithms.miner_utils import get_role_cover_area
+from dataset.packed_upa import PackedUPA
+from dataset.sparse_upa import SparseUPA
+
+
+def test__coverage_state__same_as_covered_upa():
+    matrix = np.random.randint(0, 2, size=(60, 25))
+    dense_roles = [matrix[i] & matrix[i + 1] for i in range(0, 20, 2)]
+
+    for upa in (PackedUPA.from_dense(matrix), SparseUPA.from_dense(matrix)):
+        coverage = CoverageState(upa)
+        roles = [
+            (
+                PackedUPA.from_dense(r[None]).words[0]
+                if isinstance(upa, PackedUPA)
+                else np.flatnonzero(r)
+            )
+            for r in dense_roles
+        ]
+        for role in roles:
+            for other_role in roles:
+                assert (
+                    coverage.get_role_cover_area(other_role)
+                    == get_role_cover_area(upa, other_role)[1]
+                )
+
+            expected_users = np.flatnonzero(
+                upa.get_superset_rows(role) & (upa.uncovered_row_counts() > 0)
+            )
+            assert np.array_equal(coverage.cover(role), expected_users)
+            upa = upa.cover(expected_users, role)
+
+            assert coverage.count_uncovered() == upa.count_uncovered()
+            assert coverage.count_cells_sum() == upa.count_cells_sum()
+            assert np.array_equal(
+                coverage.uncovered_row_counts, upa.uncovered_row_counts()
+            )
@@ -0,0 +1,42 @@
+import numpy as np
+
+from algorithms.fast_miner import get_fast_miner_result_with_metadata
+from algorithms.incremental import IncrementalMiner
+from algorithms.rmp import basic_rmp
+from dataset.upa_matrix import load_upa_from_one2one_file
+
+
+def test__incremental_miner__same_result_as_full_recompute():
+    upa = load_upa_from_one2one_file("dataset/real_datasets/healthcare.txt")
+    rng = np.random.default_rng(0)
+    state = IncrementalMiner(upa, basic_rmp(upa))
+    assert state.verify()
+
+    for _ in range(5):
+        assigned = np.argwhere(state.upa.to_dense())
+        removed = assigned[rng.choice(len(assigned), 10, replace=False)]
+        added = np.stack(
+            [rng.integers(0, len(state.upa), 10), rng.integers(0, 46, 10)], axis=1
+        )
+        state.apply_delta(added, removed)
+        assert state.verify()
+
+    expected, _ = get_fast_miner_result_with_metadata(state.upa.to_dense())
+    assert state.get_fast_miner_result().matches(expected)
+    ids = expected.roles.get_ids(state.gen_roles.words)
+    assert np.array_equal(state.total_count, expected.total_count[ids])
+    assert np.array_equal(state.original_count, expected.original_count[ids])
+
+
+def test__incremental_miner__delta_extends_the_upa():
+    upa = load_upa_from_one2one_file("dataset/test_datasets/simple_dataset.txt")
+    state = IncrementalMiner(upa, basic_rmp(upa))
+
+    # A new user holding a new permission past the first word
+    state.apply_delta(added=[(upa.shape[0] + 1, 70), (0, 1)], removed=[(0, 0)])
+    assert state.upa.shape == (upa.shape[0] + 2, 71)
+    assert state.verify()
+
+    pa_matrix, ua_matrix = state.get_rmp_result()
+    assert [pa_matrix[r] for r in ua_matrix[f"U{upa.shape[0] + 2}"]] == [["P71"]]
+    assert f"U{upa.shape[0] + 1}" not in ua_matrix
@@ -0,0 +1,159 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from algorithms.parallel import ParallelExecutor
+from interface import callbacks
+from interface.jobs import JobManager
+
+
+def count_to(report, n):
+    for i in range(n):
+        report(done=i + 1)
+    return n
+
+
+def wait_forever(report):
+    report(started=True)
+    while True:
+        time.sleep(0.1)
+
+
+def fail(report):
+    raise ValueError("bad input")
+
+
+def wait_for(jobs, job_id, state, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = jobs.poll(job_id)
+        if status.state == state or status.state != "running":
+            return status
+        time.sleep(0.05)
+    raise TimeoutError(state)
+
+
+def test__job_manager__returns_progress_and_result():
+    jobs = JobManager()
+    job_id = jobs.submit(count_to, 3, key="count")
+    assert jobs.submit(count_to, 3, key="count") == job_id
+
+    status = wait_for(jobs, job_id, "done")
+    assert status.state == "done"
+    assert status.result == 3
+    assert status.progress == {"done": 3}
+    assert jobs.poll(job_id) is None
+
+    status = wait_for(jobs, jobs.submit(fail), "failed")
+    assert status.state == "failed"
+    assert status.error == "ValueError: bad input"
+
+
+def test__job_manager__cancel_terminates_the_job():
+    jobs = JobManager()
+    job_id = jobs.submit(wait_forever)
+    deadline = time.time() + 60
+    while not jobs.poll(job_id).progress and time.time() < deadline:
+        time.sleep(0.05)
+
+    process = jobs._jobs[job_id].process
+    assert jobs.cancel(job_id)
+    process.join(timeout=10)
+    assert not process.is_alive()
+    assert jobs.poll(job_id) is None
+    assert not jobs.cancel(job_id)
+
+    # A finished job is not cancelled, its result is still returned
+    job_id = jobs.submit(count_to, 3)
+    jobs._jobs[job_id].process.join(timeout=60)
+    assert not jobs.cancel(job_id)
+    assert jobs.poll(job_id).result == 3
+
+
+def count_and_yield(report, n):
+    for i in range(n):
+        report(done=i + 1)
+        yield i
+    return n
+
+
+def test__job_manager__streams_generator_items():
+    jobs = JobManager()
+    job_id = jobs.submit(count_and_yield, 5)
+    items = []
+    status = jobs.poll(job_id)
+    while status.state == "running":
+        items.extend(status.items)
+        time.sleep(0.05)
+        status = jobs.poll(job_id)
+    items.extend(status.items)
+
+    assert status.state == "done"
+    assert status.result == 5
+    assert items == [0, 1, 2, 3, 4]
+
+
+def test__run_basic_rmp_job__streamed_rows_build_the_result():
+    job = callbacks.run_basic_rmp_job(lambda **_: None, "healthcare", 0, None)
+    pa_rows, ua_rows = [], []
+    try:
+        while True:
+            pa_row, ua_updates = next(job)
+            pa_rows.append(pa_row)
+            for index, row, is_new in ua_updates:
+                if is_new:
+                    ua_rows.append(row)
+                else:
+                    ua_rows[index] = row
+    except StopIteration as stop:
+        (result, _), gen_roles_list = stop.value
+
+    assert pa_rows == result.get_pa_rows(range(result.num_of_roles))
+    assert sorted(ua_rows, key=lambda row: int(row["User"][1:])) == (
+        result.get_ua_rows(result.get_users())
+    )
+
+    # The returned candidates spare FastMiner on the next run
+    stages = []
+    job = callbacks.run_basic_rmp_job(
+        lambda **progress: stages.append(progress.get("stage")),
+        "healthcare",
+        0,
+        gen_roles_list,
+    )
+    try:
+        while True:
+            next(job)
+    except StopIteration as stop:
+        (rerun_result, _), _ = stop.value
+    assert "fast_miner" not in stages
+    assert rerun_result.get_pa_rows(range(rerun_result.num_of_roles)) == pa_rows
+
+
+def share_and_wait(report):
+    with ParallelExecutor(2) as executor:
+        spec = executor._share_array(np.arange(10))
+        # The pool starts its workers with the first task
+        executor._pool.submit(abs, -1).result()
+        report(block=spec[0])
+        while True:
+            time.sleep(0.1)
+
+
+def test__job_manager__cancel_closes_the_parallel_executor():
+    jobs = JobManager()
+    job_id = jobs.submit(share_and_wait)
+    deadline = time.time() + 60
+    while not jobs.poll(job_id).progress and time.time() < deadline:
+        time.sleep(0.05)
+    block = jobs.poll(job_id).progress["block"]
+    shared_memory.SharedMemory(name=block).close()
+
+    process = jobs._jobs[job_id].process
+    assert jobs.cancel(job_id)
+    process.join(timeout=30)
+    assert process.exitcode == 0
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=block)
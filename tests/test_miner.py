@@ -1,13 +1,26 @@
 import numpy as np
 
-from algorithms.fast_miner import get_fast_miner_result_with_metadata
+from algorithms.fast_miner import (
+    get_fast_miner_result,
+    get_fast_miner_result_with_metadata,
+)
 from algorithms.miner_utils import (
-    get_fm_candidate_roles_total_count,
+    LazyGreedySelector,
+    cover_with_role,
+    get_fm_candidate_roles_support,
     get_fm_gen_roles,
     get_init_roles,
+    get_max_cover_role,
 )
 from algorithms.rmp import basic_rmp
-from dataset.upa_matrix import load_upa_from_one2one_file
+from dataset.packed_upa import PackedUPA
+from dataset.permission_index import with_permission_index
+from dataset.sparse_upa import SparseUPA
+from dataset.upa_matrix import (
+    load_packed_upa_from_one2one_file,
+    load_sparse_upa_from_one2one_file,
+    load_upa_from_one2one_file,
+)
 
 
 def test__fast_miner__simple__dataset():
@@ -15,12 +28,7 @@ def test__fast_miner__simple__dataset():
         "INIT_ROLES": np.array(
             [[1, 1, 0, 1], [0, 1, 1, 0], [0, 1, 1, 1], [0, 0, 0, 1]]
         ),
-        "ORIGINAL_COUNT": {
-            (1, 1, 0, 1): 5,
-            (0, 1, 1, 0): 3,
-            (0, 1, 1, 1): 3,
-            (0, 0, 0, 1): 2,
-        },
+        "ORIGINAL_COUNT": [5, 3, 3, 2],
         "GEN_ROLES": np.array(
             [
                 [1, 1, 0, 1],
@@ -31,14 +39,7 @@ def test__fast_miner__simple__dataset():
                 [0, 1, 1, 1],
             ]
         ),
-        "TOTAL_COUNT": {
-            (1, 1, 0, 1): 5,
-            (0, 1, 0, 0): 11,
-            (0, 1, 0, 1): 8,
-            (0, 0, 0, 1): 10,
-            (0, 1, 1, 0): 6,
-            (0, 1, 1, 1): 3,
-        },
+        "TOTAL_COUNT": [5, 11, 8, 10, 6, 3],
     }
 
     upa = load_upa_from_one2one_file("dataset/test_datasets/simple_dataset.txt")
@@ -46,24 +47,22 @@ def test__fast_miner__simple__dataset():
     init_roles, original_count = get_init_roles(upa)
     assert init_roles is not None
     assert np.array_equal(init_roles, test_data["INIT_ROLES"])
-    for role_label, count in original_count.items():
-        assert role_label in test_data["ORIGINAL_COUNT"]
-        assert count == test_data["ORIGINAL_COUNT"][role_label]
+    assert original_count.tolist() == test_data["ORIGINAL_COUNT"]
 
     gen_roles = get_fm_gen_roles(init_roles)
     assert gen_roles is not None
     assert np.array_equal(gen_roles, test_data["GEN_ROLES"])
 
-    total_count = get_fm_candidate_roles_total_count(upa, gen_roles)
-    for role_label, count in total_count.items():
-        assert role_label in test_data["TOTAL_COUNT"]
-        assert count == test_data["TOTAL_COUNT"][role_label]
+    total_count = get_fm_candidate_roles_support(upa, gen_roles)
+    assert total_count.tolist() == test_data["TOTAL_COUNT"]
 
 
 def test__get_fm_result():
     upa = load_upa_from_one2one_file("dataset/test_datasets/simple_dataset.txt")
     result, runtime = get_fast_miner_result_with_metadata(upa)
-    assert result == {
+    assert result.original_count.tolist() == [5, 0, 0, 2, 3, 3]
+    assert result.total_count.tolist() == [5, 11, 8, 10, 6, 3]
+    assert result.to_dict() == {
         (1, 1, 0, 1): {"label": "P1,P2,P4", "original_count": 5, "total_count": 5},
         (0, 1, 0, 0): {"label": "P2", "original_count": 0, "total_count": 11},
         (0, 1, 0, 1): {"label": "P2,P4", "original_count": 0, "total_count": 8},
@@ -161,3 +160,113 @@ def test__basic_rmp__identity_matrix__all_delta_factors():
         pa, ua = basic_rmp(upa, delta_factor=delta_factor)
         assert len(pa) == max_delta_factor - delta_factor
         assert len(ua) == max_delta_factor - delta_factor
+
+
+def test__packed_upa__same_results_as_dense():
+    filename = "dataset/test_datasets/simple_dataset.txt"
+    upa = load_upa_from_one2one_file(filename)
+    packed_upa = load_packed_upa_from_one2one_file(filename)
+
+    init_roles, original_count = get_init_roles(packed_upa)
+    dense_init_roles, dense_original_count = get_init_roles(upa)
+    assert np.array_equal(init_roles.to_dense(), dense_init_roles)
+    assert np.array_equal(original_count, dense_original_count)
+
+    gen_roles = get_fm_gen_roles(init_roles)
+    assert np.array_equal(gen_roles.to_dense(), get_fm_gen_roles(dense_init_roles))
+    assert np.array_equal(
+        get_fm_candidate_roles_support(packed_upa, gen_roles),
+        get_fm_candidate_roles_support(upa, get_fm_gen_roles(dense_init_roles)),
+    )
+
+    for delta_factor in range(3):
+        assert basic_rmp(packed_upa, delta_factor) == basic_rmp(upa, delta_factor)
+
+
+def test__sparse_upa__same_results_as_dense():
+    filename = "dataset/test_datasets/simple_dataset.txt"
+    upa = load_upa_from_one2one_file(filename)
+    sparse_upa = load_sparse_upa_from_one2one_file(filename)
+
+    init_roles, original_count = get_init_roles(sparse_upa)
+    dense_init_roles, dense_original_count = get_init_roles(upa)
+    assert np.array_equal(init_roles.to_dense(), dense_init_roles)
+    assert np.array_equal(original_count, dense_original_count)
+
+    gen_roles = get_fm_gen_roles(init_roles)
+    assert np.array_equal(gen_roles.to_dense(), get_fm_gen_roles(dense_init_roles))
+    sparse_result, _ = get_fast_miner_result_with_metadata(sparse_upa)
+    assert sparse_result == get_fast_miner_result_with_metadata(upa)[0]
+
+    for delta_factor in range(3):
+        assert basic_rmp(sparse_upa, delta_factor) == basic_rmp(upa, delta_factor)
+
+
+def test__get_fm_gen_roles__blocked_tiles_keep_role_order():
+    upa = load_upa_from_one2one_file("dataset/real_datasets/healthcare.txt")
+    init_roles, _ = get_init_roles(upa)
+    gen_roles = get_fm_gen_roles(init_roles)
+
+    # Every candidate once, whatever the tile size
+    assert len({tuple(r) for r in gen_roles}) == len(gen_roles)
+    for block_size in (1, 5, 64):
+        assert np.array_equal(get_fm_gen_roles(init_roles, block_size), gen_roles)
+
+
+def test__get_fm_candidate_roles_support__chunked_supports():
+    upa = load_upa_from_one2one_file("dataset/real_datasets/domino.txt")
+    init_roles, _ = get_init_roles(upa)
+    gen_roles = get_fm_gen_roles(init_roles)
+
+    expected = [
+        int(np.sum(np.all(np.bitwise_and(upa, r) == r, axis=1))) for r in gen_roles
+    ]
+    for mining_upa in (
+        upa,
+        load_packed_upa_from_one2one_file("dataset/real_datasets/domino.txt"),
+        load_sparse_upa_from_one2one_file("dataset/real_datasets/domino.txt"),
+    ):
+        # A tiny budget forces one role per chunk
+        for max_chunk_bytes in (1, 2**20):
+            total_count = get_fm_candidate_roles_support(
+                mining_upa, gen_roles, max_chunk_bytes
+            )
+            assert total_count.tolist() == expected
+
+
+def test__get_fm_candidate_roles_support__permission_index():
+    upa = load_upa_from_one2one_file("dataset/real_datasets/firewall-2.txt")
+    gen_roles = get_fm_gen_roles(get_init_roles(upa)[0])
+    expected = get_fm_candidate_roles_support(upa, gen_roles)
+
+    for mining_upa in (PackedUPA.from_dense(upa), SparseUPA.from_dense(upa)):
+        with_permission_index(mining_upa)
+        total_count = get_fm_candidate_roles_support(mining_upa, gen_roles)
+        assert np.array_equal(total_count, expected)
+
+
+def test__lazy_greedy_selector__same_roles_as_get_max_cover_role():
+    upa = load_packed_upa_from_one2one_file("dataset/real_datasets/firewall-1.txt")
+    gen_roles = get_fast_miner_result(upa)
+
+    for delta_factor in (0, 5):
+        expected = []
+        updated_upa, list_of_roles, prev_covered_areas = upa, gen_roles, {}
+        while updated_upa.count_uncovered() > delta_factor:
+            role, updated_upa, list_of_roles, _, prev_covered_areas = (
+                get_max_cover_role(
+                    updated_upa, list_of_roles, prev_covered_areas, delta_factor
+                )
+            )
+            expected.append(role)
+
+        roles = []
+        updated_upa, selector = upa, LazyGreedySelector(gen_roles)
+        while updated_upa.count_uncovered() > delta_factor:
+            role_row = selector.pop_max_cover_role(updated_upa, delta_factor)
+            role, updated_upa, _ = cover_with_role(updated_upa, role_row)
+            roles.append(role)
+
+        assert roles == expected
+        # Most areas are never recomputed after the first iteration
+        assert selector.num_of_evaluations < len(gen_roles) + 20 * len(roles)
@@ -0,0 +1,68 @@
+import numpy as np
+
+from dataset import upa_matrix
+from dataset.packed_upa import (
+    PackedUPA,
+    get_unique_rows,
+    pack_rows,
+    popcount,
+    unpack_rows,
+)
+
+
+def test__pack_rows__round_trip():
+    matrix = np.random.randint(0, 2, size=(7, 130))
+    words = pack_rows(matrix)
+    assert words.dtype == np.uint64
+    assert words.shape == (7, 3)
+    assert np.array_equal(unpack_rows(words, 130), matrix)
+    assert np.array_equal(popcount(words), matrix.sum(axis=1))
+
+
+def test__packed_upa__covered_cells_round_trip():
+    matrix = np.array([[1, 2, 0], [0, 1, 2]])
+    packed = PackedUPA.from_dense(matrix)
+    assert packed.shape == (2, 3)
+    assert packed.count_uncovered() == 2
+    assert packed.count_cells_sum() == matrix.sum()
+    assert np.array_equal(packed.to_dense(), matrix)
+
+
+def test__load_packed_upa_from_one2one_file__simple_dataset():
+    filename = "dataset/test_datasets/simple_dataset.txt"
+    packed = upa_matrix.load_packed_upa_from_one2one_file(filename)
+    dense = upa_matrix.load_upa_from_one2one_file(filename)
+    assert packed.shape == dense.shape
+    assert np.array_equal(packed.to_dense(), dense)
+
+
+def test__load_packed_upa_from_one2one_file__empty_file():
+    packed = upa_matrix.load_packed_upa_from_one2one_file(
+        "dataset/test_datasets/empty_dataset.txt"
+    )
+    assert packed.shape == (0, 0)
+
+
+def test__get_unique_rows__first_occurrence_order_and_counts():
+    matrix = np.array([[0, 1], [1, 1], [0, 1], [0, 0], [1, 1], [0, 1]])
+    first_rows, counts = get_unique_rows(pack_rows(matrix))
+    assert np.array_equal(first_rows, [0, 1, 3])
+    assert np.array_equal(counts, [3, 2, 1])
+
+
+def test__get_unique_rows__single_bit_rows_do_not_collide():
+    words = pack_rows(np.eye(200, dtype=int))
+    first_rows, counts = get_unique_rows(np.concatenate([words, words[::-1]]))
+    assert np.array_equal(first_rows, np.arange(200))
+    assert np.all(counts == 2)
+
+
+def test__packed_upa__to_dense_window():
+    matrix = np.random.randint(0, 3, size=(50, 200))
+    upa = PackedUPA.from_dense(matrix)
+    for rows, columns in [
+        (slice(3, 20), slice(60, 130)),
+        (slice(40, 80), slice(190, 300)),
+        (slice(0, 0), slice(5, 5)),
+    ]:
+        assert np.array_equal(upa.to_dense_window(rows, columns), matrix[rows, columns])
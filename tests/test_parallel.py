@@ -0,0 +1,65 @@
+import numpy as np
+
+from algorithms.fast_miner import (
+    get_fast_miner_result,
+    get_fast_miner_result_with_metadata,
+)
+from algorithms.miner_utils import get_fm_candidate_roles_support, get_max_cover_role
+from algorithms.parallel import ParallelExecutor
+from algorithms.rmp import basic_rmp
+from dataset.upa_matrix import (
+    load_packed_upa_from_one2one_file,
+    load_sparse_upa_from_one2one_file,
+)
+
+
+def test__parallel_executor__same_results_as_serial():
+    filename = "dataset/real_datasets/firewall-2.txt"
+    for upa in (
+        load_packed_upa_from_one2one_file(filename),
+        load_sparse_upa_from_one2one_file(filename),
+    ):
+        gen_roles = get_fast_miner_result(upa)
+        with ParallelExecutor(2) as executor:
+            total_count = get_fm_candidate_roles_support(
+                upa, gen_roles, executor=executor
+            )
+            role, _, _, ua_dict, _ = get_max_cover_role(
+                upa, gen_roles, {}, executor=executor
+            )
+
+        expected_role, _, _, expected_ua_dict, _ = get_max_cover_role(
+            upa, gen_roles, {}
+        )
+        assert np.array_equal(
+            total_count, get_fm_candidate_roles_support(upa, gen_roles)
+        )
+        assert role == expected_role
+        assert ua_dict == expected_ua_dict
+        assert basic_rmp(upa, 0, gen_roles, num_of_workers=2) == basic_rmp(
+            upa, 0, gen_roles
+        )
+
+
+def test__parallel_fast_miner__same_result_for_any_worker_count():
+    filename = "dataset/real_datasets/domino.txt"
+    for upa in (
+        load_packed_upa_from_one2one_file(filename),
+        load_sparse_upa_from_one2one_file(filename),
+    ):
+        expected, _ = get_fast_miner_result_with_metadata(upa)
+        for num_of_workers in (2, 3):
+            result, _ = get_fast_miner_result_with_metadata(upa, num_of_workers)
+            assert result == expected
+
+
+def test__parallel_executor__releases_the_upa_of_every_greedy_step():
+    upa = load_packed_upa_from_one2one_file("dataset/real_datasets/healthcare.txt")
+    gen_roles = get_fast_miner_result(upa)
+    with ParallelExecutor(2) as executor:
+        for _ in range(3):
+            _, upa, gen_roles, _, _ = get_max_cover_role(
+                upa, gen_roles, {}, executor=executor
+            )
+            # Each step covers a fresh copy of the UPA, none of them is kept
+            assert executor._shared == {}
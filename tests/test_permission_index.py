@@ -0,0 +1,53 @@
+import numpy as np
+
+from dataset import permission_index
+from dataset.packed_upa import PackedUPA
+from dataset.permission_index import PermissionIndex, with_permission_index
+from dataset.sparse_upa import SparseUPA
+
+
+def test__permission_index__same_index_for_all_representations(monkeypatch):
+    # Small blocks so the packed build spans several blocks of users
+    monkeypatch.setattr(permission_index, "INDEX_BUILD_ROWS", 64)
+    matrix = np.random.randint(0, 2, size=(300, 70))
+
+    index = PermissionIndex.from_upa(matrix)
+    assert index.shape == (300, 70)
+    for upa in (PackedUPA.from_dense(matrix), SparseUPA.from_dense(matrix)):
+        assert np.array_equal(
+            PermissionIndex.from_upa(upa).user_words, index.user_words
+        )
+
+
+def test__permission_index__superset_rows():
+    matrix = np.random.randint(0, 2, size=(130, 20))
+    index = PermissionIndex.from_upa(matrix)
+
+    for permissions in ([], [3], [0, 5], [1, 2, 7, 19]):
+        expected = np.all(matrix[:, permissions] == 1, axis=1)
+        assert np.array_equal(index.get_superset_rows(np.array(permissions)), expected)
+        assert index.count_superset_rows(np.array(permissions)) == expected.sum()
+
+
+def test__with_permission_index__shared_by_covered_copies():
+    matrix = np.random.randint(0, 2, size=(40, 10))
+    upa = with_permission_index(PackedUPA.from_dense(matrix))
+    role = PackedUPA.from_dense(matrix[:1]).words[0]
+
+    covered = upa.cover(np.array([0]), role)
+    assert covered.permission_index is upa.permission_index
+    assert np.array_equal(
+        covered.get_superset_rows(role),
+        np.all(matrix[:, matrix[0] == 1] == 1, axis=1),
+    )
+
+
+def test__permission_index__superset_rows_of_a_user_range():
+    matrix = np.random.randint(0, 2, size=(300, 20))
+    index = PermissionIndex.from_upa(matrix)
+    permissions = np.array([2, 5])
+    expected = np.all(matrix[:, permissions] == 1, axis=1)
+    for rows in (slice(None), slice(70, 130), slice(250, 400), slice(10, 10)):
+        assert np.array_equal(
+            index.get_superset_rows(permissions, rows), expected[rows]
+        )
@@ -0,0 +1,63 @@
+import numpy as np
+
+from algorithms.coverage_state import CoverageState
+from algorithms.fast_miner import (
+    get_fast_miner_result,
+    get_fast_miner_result_with_metadata,
+)
+from algorithms.rmp import basic_rmp
+from dataset.packed_upa import PackedUPA
+from dataset.reduced_upa import ReducedUPA, reduce_upa
+from dataset.upa_matrix import (
+    load_packed_upa_from_one2one_file,
+    load_sparse_upa_from_one2one_file,
+)
+
+
+def test__reduced_upa__expands_back_to_the_original():
+    upa = load_packed_upa_from_one2one_file("dataset/real_datasets/firewall-1.txt")
+    reduction = ReducedUPA.from_upa(upa)
+    dense = upa.to_dense()
+
+    assert reduction.original_shape == upa.shape
+    assert reduction.upa.shape == (90, 86)
+    expanded = reduction.expand_roles(reduction.upa).to_dense()
+    assert np.array_equal(expanded[reduction.user_groups], dense)
+    assert reduction.user_weights.sum() == upa.shape[0]
+    assert reduction.permission_weights.sum() == upa.shape[1]
+
+    # Weighted counts of the reduced UPA are the counts of the original one
+    coverage = CoverageState(
+        reduction.upa,
+        user_weights=reduction.user_weights,
+        permission_weights=reduction.permission_weights,
+    )
+    assert coverage.count_uncovered() == dense.sum()
+
+    roles = reduction.reduce_roles(get_fast_miner_result(upa))
+    assert roles is not None
+    assert reduction.reduce_roles(PackedUPA.from_dense(np.eye(1, 709))) is None
+
+
+def test__reduce_upa__skips_matrices_without_duplicates():
+    assert reduce_upa(np.eye(4, dtype=int)) is None
+    sparse_upa = load_sparse_upa_from_one2one_file(
+        "dataset/real_datasets/firewall-2.txt"
+    )
+    assert reduce_upa(sparse_upa) is None
+
+
+def test__reduced_upa__same_results_as_the_full_matrix():
+    for name in ("healthcare", "firewall-1", "firewall-2"):
+        filename = f"dataset/real_datasets/{name}.txt"
+        upa = load_packed_upa_from_one2one_file(filename)
+        # Sparse UPAs are mined without reduction
+        sparse_upa = load_sparse_upa_from_one2one_file(filename)
+
+        result, _ = get_fast_miner_result_with_metadata(upa)
+        assert result == get_fast_miner_result_with_metadata(sparse_upa)[0]
+        for delta_factor in (0, 5):
+            assert basic_rmp(upa, delta_factor) == basic_rmp(sparse_upa, delta_factor)
+        # Candidates computed beforehand are reduced too
+        gen_roles = get_fast_miner_result(upa)
+        assert basic_rmp(upa, 0, gen_roles) == basic_rmp(sparse_upa)
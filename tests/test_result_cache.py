@@ -0,0 +1,48 @@
+import numpy as np
+
+from interface import callbacks
+from interface.result_cache import ResultCache
+
+
+def test__result_cache__evicts_least_recently_used_by_memory():
+    cache = ResultCache(max_bytes=2500)
+    cache.put("a", np.zeros(1000, dtype=np.uint8))
+    cache.put("b", np.zeros(1000, dtype=np.uint8))
+    assert cache.get("a") is not None  # "a" becomes the most recently used
+    cache.put("c", np.zeros(1000, dtype=np.uint8))
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.current_bytes == 2000
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test__result_cache__skips_values_larger_than_the_cache():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a", np.zeros(1000, dtype=np.uint8))
+    assert len(cache) == 0
+    assert cache.get("a") is None
+    assert cache.misses == 1
+
+
+def test__result_cache__get_or_compute_runs_once():
+    cache = ResultCache(max_bytes=1000)
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute("key", lambda: calls.append(1) or 42) == 42
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test__get_cached_fast_miner_candidates__reuses_the_fast_miner_result():
+    callbacks.RESULT_CACHE.clear()
+    assert callbacks.get_cached_fast_miner_candidates("simple_dataset") is None
+
+    # Candidates of the FastMiner table, in candidate order
+    fm_result, _ = callbacks.get_fast_miner_metadata("simple_dataset")
+    candidates = callbacks.get_cached_fast_miner_candidates("simple_dataset")
+    assert np.array_equal(candidates.words, fm_result.roles.words)
+
+    result, _ = callbacks.compute_basic_rmp_result("simple_dataset", 0, candidates)
+    expected, _ = callbacks.compute_basic_rmp_result("simple_dataset", 0)
+    assert result.to_matrices() == expected.to_matrices()
@@ -0,0 +1,40 @@
+import pickle
+
+import numpy as np
+
+from algorithms.rmp import basic_rmp, basic_rmp_result
+from algorithms.rmp_result import RMPResult
+from dataset.upa_matrix import load_upa_from_one2one_file
+
+
+def test__rmp_result__same_matrices_as_basic_rmp():
+    upa = load_upa_from_one2one_file("dataset/real_datasets/firewall-1.txt")
+    for delta_factor in (0, 5):
+        result = basic_rmp_result(upa, delta_factor)
+        assert result.to_matrices() == basic_rmp(upa, delta_factor)
+        assert result.shape == upa.shape
+        assert result.get_user_sizes().sum() == len(result.ua_indices)
+
+        # Every user holds the permissions of its roles
+        for user in result.get_users()[::10].tolist():
+            for role in result.get_user_roles(user).tolist():
+                assert np.all(upa[user, result.get_role_permissions(role)] == 1)
+
+
+def test__rmp_result__labels_are_built_lazily_in_a_bounded_cache():
+    choices = [([0, 2], [1, 3]), ([1], [0, 1]), ([3, 4], [3])]
+    result = RMPResult.from_choices((4, 5), choices, label_cache_size=2)
+    assert result.get_user_roles(1).tolist() == [0, 1]
+    assert result.get_users().tolist() == [0, 1, 3]
+    assert len(result.label_cache) == 0
+
+    assert result.get_pa_rows(range(3)) == [
+        {"Role": "R1", "Permissions": "P1, P3"},
+        {"Role": "R2", "Permissions": "P2"},
+        {"Role": "R3", "Permissions": "P4, P5"},
+    ]
+    assert result.get_ua_rows([3]) == [{"User": "U4", "Roles": "R1, R3"}]
+    assert len(result.label_cache) == 2
+    assert len(pickle.loads(pickle.dumps(result)).label_cache) == 0
+    result.clear_label_cache()
+    assert len(result.label_cache) == 0
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from algorithms.rmp import basic_rmp_result, iter_basic_rmp
+from algorithms.rmp_result import RMPResult
+from algorithms.rmp_verification import reconstruct_upa, verify_rmp_result
+from dataset.packed_upa import PackedUPA
+from dataset.sparse_upa import SparseUPA
+from dataset.upa_matrix import load_upa_from_one2one_file
+from interface import callbacks
+
+
+def get_dense_product(result: RMPResult) -> np.ndarray:
+    pa = np.zeros((result.num_of_roles, result.shape[1]), dtype=bool)
+    for role in range(result.num_of_roles):
+        pa[role, result.get_role_permissions(role)] = True
+    ua = np.zeros((result.shape[0], result.num_of_roles), dtype=bool)
+    for user in range(result.shape[0]):
+        ua[user, result.get_user_roles(user)] = True
+    return (ua.astype(np.int64) @ pa.astype(np.int64)) > 0
+
+
+@pytest.mark.parametrize("name", ["healthcare", "firewall-2", "domino"])
+def test__verify_rmp_result__exact_without_delta(name):
+    upa = load_upa_from_one2one_file(f"dataset/real_datasets/{name}.txt")
+    result = basic_rmp_result(upa, 0)
+
+    assert np.array_equal(reconstruct_upa(result).to_dense(), upa)
+    assert np.array_equal(get_dense_product(result), upa == 1)
+    for data in (upa, PackedUPA.from_dense(upa), SparseUPA.from_dense(upa)):
+        verification = verify_rmp_result(data, result, max_chunk_bytes=1000)
+        assert verification.is_exact
+        assert verification.missed.shape == verification.over_granted.shape == (0, 2)
+
+
+def test__verify_rmp_result__missed_cells_are_the_uncovered_ones():
+    upa = load_upa_from_one2one_file("dataset/real_datasets/firewall-1.txt")
+    delta_factor = 50
+    steps = list(iter_basic_rmp(upa, delta_factor))
+    result = basic_rmp_result(upa, delta_factor)
+    verification = verify_rmp_result(upa, result)
+
+    assert verification.num_of_over_granted == 0
+    assert verification.num_of_missed == steps[-1].num_of_uncovered <= delta_factor
+    missed = (upa == 1) & (reconstruct_upa(result).to_dense() == 0)
+    assert verification.missed.tolist() == np.argwhere(missed).tolist()
+
+
+def test__verify_rmp_result__reports_over_granted_cells():
+    upa = load_upa_from_one2one_file("dataset/real_datasets/healthcare.txt")
+    result = basic_rmp_result(upa, 0)
+    # Every user holding the first role also gets its first missing permission
+    permission = np.flatnonzero(
+        ~np.isin(np.arange(upa.shape[1]), result.get_role_permissions(0))
+    )[0]
+    pa_indices = np.insert(result.pa_indices, result.pa_indptr[1], permission)
+    pa_indptr = result.pa_indptr + np.r_[0, np.ones(result.num_of_roles, np.int64)]
+    tampered = RMPResult(
+        result.shape, pa_indptr, pa_indices, result.ua_indptr, result.ua_indices
+    )
+
+    verification = verify_rmp_result(SparseUPA.from_dense(upa), tampered, 1000)
+    over_granted = get_dense_product(tampered) & (upa == 0)
+    assert verification.num_of_missed == 0
+    assert verification.num_of_over_granted == over_granted.sum() > 0
+    assert verification.over_granted.tolist() == np.argwhere(over_granted).tolist()
+
+    with pytest.raises(ValueError):
+        verify_rmp_result(upa[:-1], result)
+
+
+def test__get_rmp_summary__reports_the_reconstruction():
+    callbacks.RESULT_CACHE.clear()
+    result, calc_time = callbacks.compute_basic_rmp_result("simple_dataset", 0)
+    summary = callbacks.get_rmp_summary("simple_dataset", 0, result, calc_time)
+    assert summary.endswith("(exact reconstruction)")
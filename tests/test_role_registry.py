@@ -0,0 +1,43 @@
+import pickle
+
+import numpy as np
+
+from algorithms.fast_miner import get_fast_miner_result_with_metadata
+from algorithms.role_registry import RoleRegistry
+from dataset.packed_upa import PackedUPA
+from dataset.sparse_upa import SparseUPA
+from dataset.upa_matrix import load_upa_from_one2one_file
+
+
+def test__role_registry__interns_every_role_once():
+    roles = np.array([[0, 1, 1], [1, 0, 0], [0, 1, 1], [0, 0, 0]])
+    registry = RoleRegistry.from_roles(SparseUPA.from_dense(roles))
+    assert len(registry) == 3
+    assert np.array_equal(registry.as_upa().to_dense(), roles[[0, 1, 3]])
+
+    words = PackedUPA.from_dense(np.array([[1, 0, 0], [1, 1, 1], [0, 1, 1]])).words
+    assert registry.get_ids(words).tolist() == [1, -1, 0]
+    assert registry.add_rows(words).tolist() == [1, 3, 0]
+    assert [registry.get_label(i) for i in range(4)] == ["P2,P3", "P1", "", "P1,P2,P3"]
+    assert list(registry.iter_labels()) == ["P2,P3", "P1", "", "P1,P2,P3"]
+
+    # The lookup dict is rebuilt after unpickling
+    restored = pickle.loads(pickle.dumps(registry))
+    assert restored._ids is None
+    assert restored.get_ids(words).tolist() == [1, 3, 0]
+
+
+def test__fast_miner_result__counts_indexed_by_role_id():
+    upa = load_upa_from_one2one_file("dataset/real_datasets/healthcare.txt")
+    result, _ = get_fast_miner_result_with_metadata(upa)
+    candidates = result.roles.as_upa().to_dense()
+
+    for i in range(0, len(result), 7):
+        role = candidates[i]
+        holders = np.all(upa[:, role == 1] == 1, axis=1)
+        assert result.total_count[i] == holders.sum()
+        assert result.original_count[i] == np.all(upa == role, axis=1).sum()
+    assert result.original_count.sum() == len(upa)
+    assert [row["label"] for row in result.get_rows(np.arange(3))] == list(
+        result.roles.iter_labels()
+    )[:3]
@@ -0,0 +1,40 @@
+import numpy as np
+
+from dataset import upa_matrix
+from dataset.sparse_upa import SparseUPA
+
+
+def test__sparse_upa__dense_round_trip():
+    matrix = np.array([[1, 0, 2, 0], [0, 0, 0, 0], [0, 1, 1, 1]])
+    sparse = SparseUPA.from_dense(matrix)
+    assert sparse.shape == (3, 4)
+    assert sparse.nnz == 5
+    assert sparse.count_uncovered() == 4
+    assert sparse.count_cells_sum() == matrix.sum()
+    assert np.array_equal(sparse.row(2), [1, 2, 3])
+    assert np.array_equal(sparse.to_dense(), matrix)
+
+
+def test__sparse_upa__superset_rows():
+    sparse = SparseUPA.from_dense(np.array([[1, 1, 0], [0, 1, 1], [1, 1, 1]]))
+    assert np.array_equal(sparse.get_superset_rows(np.array([1])), [True] * 3)
+    assert np.array_equal(
+        sparse.get_superset_rows(np.array([0, 1])), [True, False, True]
+    )
+    assert np.array_equal(sparse.find_rows(np.array([1, 2])), [False, True, False])
+
+
+def test__load_sparse_upa_from_one2one_file__simple_dataset():
+    filename = "dataset/test_datasets/simple_dataset.txt"
+    sparse = upa_matrix.load_sparse_upa_from_one2one_file(filename)
+    dense = upa_matrix.load_upa_from_one2one_file(filename)
+    assert sparse.shape == dense.shape
+    assert sparse.nnz == dense.sum()
+    assert np.array_equal(sparse.to_dense(), dense)
+
+
+def test__load_sparse_upa_from_one2one_file__empty_file():
+    sparse = upa_matrix.load_sparse_upa_from_one2one_file(
+        "dataset/test_datasets/empty_dataset.txt"
+    )
+    assert sparse.shape == (0, 0)
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import numpy as np
+
+from algorithms.rmp import basic_rmp
+from dataset import upa_cache
+from dataset.packed_upa import unpack_rows
+from dataset.upa_matrix import load_upa_from_one2one_file
+
+
+def test__load_cached_upa__warm_load_is_memory_mapped(tmp_path):
+    filename = "dataset/test_datasets/simple_dataset.txt"
+    cache_dir = str(tmp_path / "cache")
+
+    cold = upa_cache.load_cached_upa(filename, cache_dir=cache_dir)
+    warm = upa_cache.load_cached_upa(filename, cache_dir=cache_dir)
+    assert isinstance(warm.words, np.memmap)
+    assert np.array_equal(cold.to_dense(), load_upa_from_one2one_file(filename))
+    assert np.array_equal(warm.to_dense(), cold.to_dense())
+
+    sparse = upa_cache.load_cached_upa(filename, kind="sparse", cache_dir=cache_dir)
+    assert np.array_equal(sparse.to_dense(), cold.to_dense())
+
+
+def test__load_cached_upa__rebuilds_when_source_changes(tmp_path):
+    filename = str(tmp_path / "upa.txt")
+    cache_dir = str(tmp_path / "cache")
+    shutil.copy("dataset/test_datasets/identity_matrix.txt", filename)
+    assert upa_cache.load_cached_upa(filename, cache_dir=cache_dir).shape == (5, 5)
+
+    with open(filename, "a") as file:
+        file.write("6 7\n")
+    assert upa_cache.load_cached_upa(filename, cache_dir=cache_dir).shape == (6, 7)
+
+
+def test__load_cached_upa__touched_source_keeps_cache(tmp_path):
+    filename = str(tmp_path / "upa.txt")
+    cache_dir = str(tmp_path / "cache")
+    shutil.copy("dataset/test_datasets/simple_dataset.txt", filename)
+    upa_cache.load_cached_upa(filename, cache_dir=cache_dir)
+    header_path = upa_cache.get_cache_paths(filename, "packed", cache_dir)["header"]
+    built_at = os.stat(header_path.replace(".json", ".words.npy")).st_mtime_ns
+
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    upa_cache.load_cached_upa(filename, cache_dir=cache_dir)
+    assert os.stat(header_path.replace(".json", ".words.npy")).st_mtime_ns == built_at
+
+
+def test__stream_packed_upa_to_file__same_words_as_loader(tmp_path):
+    filename = "dataset/real_datasets/healthcare.txt"
+    path = str(tmp_path / "words.npy")
+
+    shape = upa_cache.stream_packed_upa_to_file(filename, path, chunk_lines=100)
+    expected = load_upa_from_one2one_file(filename)
+    assert shape == expected.shape
+    assert np.array_equal(unpack_rows(np.load(path), shape[1]), expected)
+
+
+def test__load_out_of_core_upa__same_rmp_result_as_in_memory(tmp_path):
+    filename = "dataset/real_datasets/healthcare.txt"
+    upa = upa_cache.load_out_of_core_upa(
+        filename, working_set_bytes=64, cache_dir=str(tmp_path)
+    )
+    assert isinstance(upa.words, np.memmap)
+    assert upa.max_chunk_bytes == 64
+
+    assert basic_rmp(upa) == basic_rmp(load_upa_from_one2one_file(filename))
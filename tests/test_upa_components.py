@@ -0,0 +1,53 @@
+import numpy as np
+
+from algorithms.fast_miner import get_fast_miner_result
+from algorithms.rmp import basic_rmp
+from dataset.packed_upa import PackedUPA
+from dataset.sparse_upa import SparseUPA
+from dataset.upa_components import split_upa
+
+
+def get_block_upa() -> np.ndarray:
+    # Identical blocks tie on every cover area, shuffled so that components
+    # interleave in user and permission order
+    rng = np.random.default_rng(3)
+    block = rng.integers(0, 2, size=(6, 5))
+    block[:, 0] = 1
+    upa = np.kron(np.eye(4, dtype=int), block)
+    upa = np.vstack([upa, np.zeros((1, upa.shape[1]), dtype=int)])
+    users = rng.permutation(upa.shape[0])
+    permissions = rng.permutation(upa.shape[1])
+    return upa[users][:, permissions]
+
+
+def test__split_upa__finds_the_connected_components():
+    upa = get_block_upa()
+    for mining_upa in (PackedUPA.from_dense(upa), SparseUPA.from_dense(upa)):
+        components = split_upa(mining_upa)
+        assert len(components) == 4
+        assert [c.users[0] for c in components] == sorted(
+            c.users[0] for c in components
+        )
+        for component in components:
+            block = upa[component.users][:, component.permissions]
+            assert np.array_equal(component.upa.to_dense(), block)
+        assert sum(int(c.upa.row_counts().sum()) for c in components) == upa.sum()
+
+        parts = split_upa(mining_upa, max_parts=2)
+        assert len(parts) == 2
+        assert sorted(np.concatenate([p.users for p in parts]).tolist()) == sorted(
+            np.concatenate([c.users for c in components]).tolist()
+        )
+
+
+def test__basic_rmp__components_give_the_same_roles():
+    upa = get_block_upa()
+    gen_roles = get_fast_miner_result(upa)
+    for mining_upa in (upa, SparseUPA.from_dense(upa)):
+        for delta_factor in (0, 3, 8):
+            expected = basic_rmp(mining_upa, delta_factor)
+            for num_of_workers in (2, 3):
+                assert basic_rmp(mining_upa, delta_factor, None, num_of_workers) == (
+                    expected
+                )
+            assert basic_rmp(mining_upa, delta_factor, gen_roles, 2) == expected
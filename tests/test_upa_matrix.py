@@ -87,3 +87,11 @@ def test__generate_upa_matrix():
         assert sum(u) <= max_permissions_per_role
     roles_set = set([tuple(u) for u in upa])
     assert len(roles_set) <= num_of_roles
+
+
+def test__read_one2one_assignments__zero_based_indices():
+    users, permissions = upa_matrix.read_one2one_assignments(
+        "dataset/test_datasets/identity_matrix.txt"
+    )
+    assert np.array_equal(users, np.arange(5))
+    assert np.array_equal(permissions, np.arange(5))